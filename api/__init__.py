@@ -0,0 +1,6 @@
+import os
+from . import startup
+
+# Read straight from the environment: the timer has to be in place before anything else is imported
+if os.getenv("STARTUP_PROFILE"):
+    startup.install_import_timer()
@@ -0,0 +1,111 @@
+from typing import Optional, Tuple
+from fastapi import HTTPException, UploadFile, status
+from sqlalchemy import delete, func, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from .config import PPT_CONTENT_BUCKET
+from .database import AsyncSessionLocal
+from .storage import StoredFile, get_storage
+from . import models
+
+# Namespace for the per-file advisory locks (two-key form, separate from the change-log lock)
+CONTENT_LOCK_NAMESPACE = 7307102
+
+def content_key(sha256: str) -> str:
+    return f"sha256/{sha256[:2]}/{sha256}"
+
+def preview_key(sha256: str, slide_number: int) -> str:
+    return f"previews/{sha256[:2]}/{sha256}/slide-{slide_number}.jpg"
+
+async def lock_content(db: AsyncSession, sha256: str):
+    # Held until the transaction ends, so a file can't be released by one request
+    # while another is starting to reference it.
+    await db.execute(
+        text("SELECT pg_advisory_xact_lock(:namespace, hashtext(:hash))"),
+        {"namespace": CONTENT_LOCK_NAMESPACE, "hash": sha256}
+    )
+
+async def ref_count(db: AsyncSession, sha256: str) -> int:
+    return (await db.execute(
+        select(func.count()).select_from(models.PPT).where(models.PPT.content_hash == sha256)
+    )).scalar_one()
+
+STORE_ATTEMPTS = 3
+
+async def _put_content(file: UploadFile, digest: StoredFile) -> bool:
+    """Send the bytes to their content key unless they're already there; True if anything was sent"""
+    storage = get_storage()
+    key = content_key(digest.sha256)
+    # May already be there: referenced by another PPT, or left by a request that failed after uploading
+    if await storage.stat(PPT_CONTENT_BUCKET, key) is not None:
+        return False
+    await file.seek(0)
+    stored = await storage.upload(PPT_CONTENT_BUCKET, key, file)
+    if stored.sha256 != digest.sha256:
+        await storage.remove(PPT_CONTENT_BUCKET, [key])
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="File changed while it was being uploaded")
+    return True
+
+async def _claim_content(db: AsyncSession, sha256: str) -> bool:
+    # Under the lock a release can't remove the bytes any more; False if one did before we got here
+    await lock_content(db, sha256)
+    if await ref_count(db, sha256) > 0:
+        return True
+    return await get_storage().stat(PPT_CONTENT_BUCKET, content_key(sha256)) is not None
+
+async def store_content(db: AsyncSession, file: UploadFile, digest: StoredFile) -> Tuple[StoredFile, bool]:
+    """Make sure the upload's bytes (digest, from receive_upload) are in the content bucket.
+
+    The bytes are sent with no transaction open: db's current transaction is
+    committed first (it must not have pending writes), so neither a pool
+    connection nor the content lock is held during the upload. Returns with
+    the hash locked in a new, short transaction, in which the caller adds the
+    referencing PPT row and commits; on failure the caller should
+    release_content() the hash, which also removes an unreferenced upload.
+
+    Returns the stored file (path is its content key) and whether any bytes
+    were sent to storage.
+    """
+    stored = digest._replace(path=content_key(digest.sha256))
+    await db.commit()
+    uploaded = False
+    try:
+        for _ in range(STORE_ATTEMPTS):
+            uploaded = await _put_content(file, digest) or uploaded
+            if await _claim_content(db, digest.sha256):
+                return stored, uploaded
+            # Released by a delete between our upload and the lock; send it again
+            await db.commit()
+    except Exception:
+        if uploaded:
+            await db.rollback()
+            await release_content(digest.sha256)
+        raise
+    raise HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="The file was being deleted while it was stored, please retry",
+        headers={"Retry-After": "1"}
+    )
+
+async def release_content(sha256: str):
+    """Delete a stored file once no PPT references it. Runs in its own transaction, after the caller's commit."""
+    async with AsyncSessionLocal() as db:
+        await lock_content(db, sha256)
+        if await ref_count(db, sha256) == 0:
+            preview = await db.get(models.PPTPreview, sha256)
+            paths = [content_key(sha256)]
+            if preview is not None:
+                paths += [preview_key(sha256, number) for number in range(1, preview.thumbnail_count + 1)]
+                await db.execute(delete(models.PPTPreview).where(models.PPTPreview.content_hash == sha256))
+            await get_storage().remove(PPT_CONTENT_BUCKET, paths)
+        await db.commit()
+
+async def release_ppt_file(syllabus: str, file_path: str, content_hash: Optional[str]):
+    """Release the file a PPT row used to point at; failures only leave an orphaned object behind"""
+    try:
+        if content_hash is None:
+            # Stored before deduplication, under the syllabus bucket and owned by a single PPT
+            await get_storage().remove(syllabus.lower(), [file_path])
+        else:
+            await release_content(content_hash)
+    except Exception as e:
+        print(f"⚠️ Could not release {file_path}: {e}")
@@ -0,0 +1,66 @@
+from threading import Lock
+from typing import Dict, NamedTuple
+from cachetools import LRUCache
+from sqlalchemy.orm import Session
+from .config import QUIZ_CACHE_SIZE, ANSWER_KEY_CACHE_SIZE
+from . import models
+
+# Serialized GET /quizzes/by-subject payloads keyed by (subject, standard).
+# Each entry remembers the content version it was built for, so an entry left
+# behind by a write on another worker is never served once the version moves.
+_quiz_cache = LRUCache(maxsize=QUIZ_CACHE_SIZE)
+_quiz_cache_lock = Lock()
+
+def get_subject_quizzes(subject: str, standard: int, version: int):
+    with _quiz_cache_lock:
+        entry = _quiz_cache.get((subject, standard))
+    if entry is None or entry[0] != version:
+        return None
+    return entry[1]
+
+def set_subject_quizzes(subject: str, standard: int, version: int, payload: bytes):
+    with _quiz_cache_lock:
+        _quiz_cache[(subject, standard)] = (version, payload)
+
+def invalidate_subject_quizzes(subject: str, standard: int):
+    with _quiz_cache_lock:
+        _quiz_cache.pop((subject, standard), None)
+
+class AnswerKey(NamedTuple):
+    is_active: bool
+    chapter_id: int
+    subject_id: int
+    correct_options: Dict[int, str]  # question_id -> correct option
+
+# Answer keys for grading, keyed by quiz_id. Questions are never edited and quizzes
+# never move chapters once created, so entries stay valid.
+_answer_keys = LRUCache(maxsize=ANSWER_KEY_CACHE_SIZE)
+_answer_keys_lock = Lock()
+
+def get_answer_key(db: Session, quiz_id: int):
+    """Return the quiz's AnswerKey, or None if the quiz doesn't exist"""
+    with _answer_keys_lock:
+        key = _answer_keys.get(quiz_id)
+    if key is not None:
+        return key
+
+    rows = db.query(
+        models.Quiz.is_active, models.Quiz.chapter_id, models.Chapter.subject_id,
+        models.QuizQuestion.id, models.QuizQuestion.correct_option
+    ).join(models.Chapter, models.Chapter.id == models.Quiz.chapter_id).outerjoin(
+        models.QuizQuestion, models.QuizQuestion.quiz_id == models.Quiz.id
+    ).filter(models.Quiz.id == quiz_id).all()
+    if not rows:
+        return None
+
+    key = AnswerKey(
+        rows[0].is_active, rows[0].chapter_id, rows[0].subject_id,
+        {row.id: row.correct_option for row in rows if row.id is not None}
+    )
+    with _answer_keys_lock:
+        _answer_keys[quiz_id] = key
+    return key
+
+def invalidate_answer_key(quiz_id: int):
+    with _answer_keys_lock:
+        _answer_keys.pop(quiz_id, None)
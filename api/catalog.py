@@ -0,0 +1,254 @@
+import asyncio
+import time
+from bisect import bisect_right
+from dataclasses import dataclass
+from threading import Lock
+from typing import Dict, Optional, Tuple
+from sqlalchemy import event, select, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from .config import DATABASE_URL, CATALOG_TTL_SECONDS, CONTENT_VERSION_TTL_SECONDS
+from . import models
+
+# Every worker LISTENs here; writers NOTIFY in their transaction, so it's delivered on commit
+CATALOG_CHANNEL = "catalog_changed"
+
+@dataclass(frozen=True, slots=True)
+class CatalogSubject:
+    id: int
+    name: str
+    standard: int
+
+@dataclass(frozen=True, slots=True)
+class CatalogChapter:
+    id: int
+    name: str
+    subject_id: int
+
+class Catalog:
+    """A snapshot of every Subject and Chapter, indexed for the lookups the routes make"""
+
+    def __init__(self, subjects, chapters, versions: Dict[str, int]):
+        # Content versions read before the rows, so the rows are at least this new
+        self.versions = versions
+        self._subjects_by_key: Dict[Tuple[str, int], CatalogSubject] = {}
+        self._subjects_by_name: Dict[str, CatalogSubject] = {}
+        self._subjects_by_standard: Dict[int, list] = {}
+        self._chapters_by_key: Dict[Tuple[int, str], CatalogChapter] = {}
+        self._chapters_by_subject: Dict[int, list] = {}
+        # Rows arrive in id order, so setdefault keeps the oldest on duplicate names
+        for subject in subjects:
+            self._subjects_by_key.setdefault((subject.name, subject.standard), subject)
+            self._subjects_by_name.setdefault(subject.name, subject)
+            self._subjects_by_standard.setdefault(subject.standard, []).append(subject)
+        for chapter in chapters:
+            self._chapters_by_key.setdefault((chapter.subject_id, chapter.name), chapter)
+            self._chapters_by_subject.setdefault(chapter.subject_id, []).append(chapter)
+        self.subject_count = len(subjects)
+        self.chapter_count = len(chapters)
+
+    def subject(self, name: str, standard: int) -> Optional[CatalogSubject]:
+        return self._subjects_by_key.get((name, standard))
+
+    def subject_named(self, name: str) -> Optional[CatalogSubject]:
+        return self._subjects_by_name.get(name)
+
+    def subjects(self, standard: int) -> list:
+        return list(self._subjects_by_standard.get(standard, ()))
+
+    def chapter(self, subject_id: int, name: str) -> Optional[CatalogChapter]:
+        return self._chapters_by_key.get((subject_id, name))
+
+    def chapters(self, subject_id: int) -> list:
+        return list(self._chapters_by_subject.get(subject_id, ()))
+
+    # Keyset pages: up to `limit` rows with an id above after_id. The lists are in id
+    # order, so a page costs a binary search and a slice however long the list is.
+
+    def subjects_after(self, standard: int, after_id: int, limit: int) -> list:
+        subjects = self._subjects_by_standard.get(standard, [])
+        start = bisect_right(subjects, after_id, key=lambda subject: subject.id)
+        return subjects[start:start + limit]
+
+    def chapters_after(self, subject_id: int, after_id: int, limit: int) -> list:
+        chapters = self._chapters_by_subject.get(subject_id, [])
+        start = bisect_right(chapters, after_id, key=lambda chapter: chapter.id)
+        return chapters[start:start + limit]
+
+# The snapshot is dropped when this worker commits a catalog change or another
+# worker's NOTIFY arrives. If the listener is down (or DATABASE_URL is a
+# transaction-mode pooler, which can't LISTEN) it falls back to the same
+# staleness bound as the content version cache.
+_lock = Lock()
+_generation = 0
+_snapshot = None  # (generation, loaded_at, Catalog)
+_stats = {"loads": 0, "invalidations": 0}
+_listening = False
+_listener_task = None
+
+def invalidate_catalog():
+    global _generation
+    with _lock:
+        _generation += 1
+        _stats["invalidations"] += 1
+
+def _current(scope: Optional[str] = None, version: int = 0):
+    with _lock:
+        max_age = CATALOG_TTL_SECONDS if _listening else CONTENT_VERSION_TTL_SECONDS
+        if (
+            _snapshot is not None and _snapshot[0] == _generation
+            and time.monotonic() - _snapshot[1] < max_age
+            and (scope is None or _snapshot[2].versions.get(scope, 0) >= version)
+        ):
+            return _snapshot[2], _generation
+        return None, _generation
+
+def _load(db: Session, generation: int) -> Catalog:
+    global _snapshot
+    versions = dict(db.execute(select(models.ContentVersion.scope, models.ContentVersion.version)).all())
+    subjects = [
+        CatalogSubject(*row)
+        for row in db.execute(select(models.Subject.id, models.Subject.name, models.Subject.standard).order_by(models.Subject.id))
+    ]
+    chapters = [
+        CatalogChapter(*row)
+        for row in db.execute(select(models.Chapter.id, models.Chapter.name, models.Chapter.subject_id).order_by(models.Chapter.id))
+    ]
+    catalog = Catalog(subjects, chapters, versions)
+    with _lock:
+        _stats["loads"] += 1
+        # Don't keep it if a change was announced while it loaded
+        if generation == _generation:
+            _snapshot = (generation, time.monotonic(), catalog)
+    return catalog
+
+def get_catalog(db: Session) -> Catalog:
+    catalog, generation = _current()
+    return catalog if catalog is not None else _load(db, generation)
+
+async def get_catalog_async(db: AsyncSession, scope: Optional[str] = None, version: int = 0) -> Catalog:
+    """The catalog, reloaded first if it predates the given content version of scope,
+    so a response is never older than the ETag it goes out with"""
+    catalog, generation = _current(scope, version)
+    return catalog if catalog is not None else await db.run_sync(_load, generation)
+
+def find_subject(db: Session, name: str, standard: int) -> Optional[CatalogSubject]:
+    """Look up a subject in the catalog. A miss is checked against the database, so a
+    subject added on another worker a moment ago is never reported missing."""
+    subject = get_catalog(db).subject(name, standard)
+    if subject is None:
+        row = db.execute(select(models.Subject.id, models.Subject.name, models.Subject.standard).where(
+            models.Subject.name == name, models.Subject.standard == standard
+        ).order_by(models.Subject.id).limit(1)).first()
+        if row is not None:
+            invalidate_catalog()
+            subject = CatalogSubject(*row)
+    return subject
+
+def find_subject_named(db: Session, name: str) -> Optional[CatalogSubject]:
+    subject = get_catalog(db).subject_named(name)
+    if subject is None:
+        row = db.execute(select(models.Subject.id, models.Subject.name, models.Subject.standard).where(
+            models.Subject.name == name
+        ).order_by(models.Subject.id).limit(1)).first()
+        if row is not None:
+            invalidate_catalog()
+            subject = CatalogSubject(*row)
+    return subject
+
+def find_chapter(db: Session, subject_id: int, name: str) -> Optional[CatalogChapter]:
+    chapter = get_catalog(db).chapter(subject_id, name)
+    if chapter is None:
+        row = db.execute(select(models.Chapter.id, models.Chapter.name, models.Chapter.subject_id).where(
+            models.Chapter.subject_id == subject_id, models.Chapter.name == name
+        ).order_by(models.Chapter.id).limit(1)).first()
+        if row is not None:
+            invalidate_catalog()
+            chapter = CatalogChapter(*row)
+    return chapter
+
+def notify_catalog_changed(db: Session):
+    """Tell every worker to reload the catalog once the caller's transaction commits"""
+    if not db.info.get("catalog_changed"):
+        db.execute(text("SELECT pg_notify(:channel, '')"), {"channel": CATALOG_CHANNEL})
+        db.info["catalog_changed"] = True
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_committed_catalog(session):
+    # Don't wait for our own NOTIFY to come back: this worker's next read sees the change
+    if session.info.pop("catalog_changed", None):
+        invalidate_catalog()
+
+@event.listens_for(Session, "after_rollback")
+def _discard_rolled_back_catalog(session):
+    session.info.pop("catalog_changed", None)
+
+def _listener_dsn() -> str:
+    # A plain libpq URL for asyncpg, whatever driver DATABASE_URL names
+    return make_url(DATABASE_URL).set(drivername="postgresql").render_as_string(hide_password=False)
+
+def _on_notify(connection, pid, channel, payload):
+    invalidate_catalog()
+
+async def _listen():
+    global _listening
+    import asyncpg
+    from .database import AsyncSessionLocal
+
+    delay = 1
+    while True:
+        connection = None
+        try:
+            # A dedicated connection outside the pool: LISTEN needs a session of its own
+            connection = await asyncpg.connect(_listener_dsn(), statement_cache_size=0)
+            await connection.add_listener(CATALOG_CHANNEL, _on_notify)
+            # Anything may have changed while nothing was listening
+            invalidate_catalog()
+            with _lock:
+                _listening = True
+            delay = 1
+            async with AsyncSessionLocal() as db:
+                await get_catalog_async(db)
+            # Notifications arrive on their own; the ping is there to notice a dead connection
+            while True:
+                await asyncio.sleep(30)
+                await connection.fetchval("SELECT 1", timeout=10)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"⚠️ Catalog listener disconnected, retrying in {delay}s: {e}")
+        finally:
+            with _lock:
+                _listening = False
+            if connection is not None:
+                connection.terminate()
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, 60)
+
+def start_catalog_listener():
+    global _listener_task
+    if _listener_task is None:
+        _listener_task = asyncio.get_running_loop().create_task(_listen())
+
+async def stop_catalog_listener():
+    global _listener_task
+    if _listener_task is not None:
+        _listener_task.cancel()
+        try:
+            await _listener_task
+        except asyncio.CancelledError:
+            pass
+        _listener_task = None
+
+def catalog_metrics() -> dict:
+    with _lock:
+        snapshot = _snapshot
+        return {
+            "listening": _listening,
+            "subjects": snapshot[2].subject_count if snapshot else 0,
+            "chapters": snapshot[2].chapter_count if snapshot else 0,
+            "age_seconds": round(time.monotonic() - snapshot[1], 1) if snapshot else None,
+            "stale": snapshot is None or snapshot[0] != _generation,
+            **_stats,
+        }
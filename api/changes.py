@@ -0,0 +1,38 @@
+from typing import Iterable, Optional
+from sqlalchemy import insert, text
+from sqlalchemy.orm import Session
+from .catalog import notify_catalog_changed
+from .search_index import index_documents
+from . import models
+
+ENTITIES = ("subject", "chapter", "quiz", "quiz_question", "ppt")
+
+# Arbitrary key for the transaction-level advisory lock taken by content writes
+CHANGE_LOG_LOCK_KEY = 7307101
+
+def lock_change_log(db: Session):
+    # ChangeLog ids come from a sequence, so two concurrent writers could commit
+    # their rows out of id order and a client could move its cursor past a row
+    # that isn't visible yet. Serializing content writes (rare, teacher-only)
+    # keeps commit order equal to id order.
+    if not db.info.get("change_log_locked"):
+        db.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": CHANGE_LOG_LOCK_KEY})
+        db.info["change_log_locked"] = True
+
+def record_changes(db: Session, entity: str, entity_ids: Iterable[int], operation: str = "upsert", standard: Optional[int] = None):
+    """Append change-log rows and refresh search documents in the caller's transaction; ids must already be flushed"""
+    entity_ids = list(entity_ids)
+    rows = [
+        {"entity": entity, "entity_id": entity_id, "operation": operation, "standard": standard}
+        for entity_id in entity_ids
+    ]
+    if not rows:
+        return
+    lock_change_log(db)
+    db.execute(insert(models.ChangeLog), rows)
+    index_documents(db, entity, entity_ids, operation)
+    if entity in ("subject", "chapter"):
+        notify_catalog_changed(db)
+
+def record_change(db: Session, entity: str, entity_id: int, operation: str = "upsert", standard: Optional[int] = None):
+    record_changes(db, entity, [entity_id], operation, standard)
@@ -1,15 +1,166 @@
-from dotenv import load_dotenv
-from supabase import create_client, Client
 import os
+from functools import lru_cache
+from typing import Literal, Optional
+from dotenv import load_dotenv
+from pydantic import BaseModel, Field, ValidationError, field_validator, model_validator
+
+class ConfigError(RuntimeError):
+    pass
+
+class Settings(BaseModel):
+    """Everything the API reads from the environment, parsed and checked once.
+
+    Field names are the environment variable names.
+    """
+
+    DATABASE_URL: str
+    SUPABASE_URL: Optional[str] = None
+    SUPABASE_KEY: Optional[str] = None  # This should be the service_role key for server operations
+    SECRET_KEY: str
+    JWT_ALGORITHM: str
+    ACCESS_TOKEN_EXPIRE_DAYS: int
+    # Max number of verified tokens get_current_user keeps per worker
+    TOKEN_CACHE_SIZE: int = 10000
+
+    # Connection pools. Each worker process has a sync and an async engine, so by
+    # default the DB_MAX_CONNECTIONS budget is split evenly across
+    # WEB_CONCURRENCY workers and then across the two engines. Set DB_POOL_SIZE
+    # to size each engine's pool directly instead.
+    WEB_CONCURRENCY: int = Field(1, ge=1)
+    DB_MAX_CONNECTIONS: int = Field(10, ge=1)
+    DB_POOL_SIZE: Optional[int] = Field(None, ge=1)
+    DB_MAX_OVERFLOW: int = 0
+    DB_POOL_TIMEOUT: float = 20
+    DB_POOL_RECYCLE: int = 300
+    # asyncpg prepared statement cache; set to 0 when DATABASE_URL points at a transaction-mode pooler
+    ASYNC_DB_STATEMENT_CACHE_SIZE: int = 100
+
+    # Max number of (subject, standard) quiz bundles kept in memory per worker
+    QUIZ_CACHE_SIZE: int = 256
+    # Max number of quiz answer keys kept in memory per worker for grading
+    ANSWER_KEY_CACHE_SIZE: int = 4096
+
+    # Content versions back the ETags on catalog and quiz payloads. A worker may
+    # serve a version up to this many seconds old after another worker's write.
+    CONTENT_VERSION_TTL_SECONDS: int = 30
+    CONTENT_VERSION_CACHE_SIZE: int = 4096
+    # Each worker keeps Subjects and Chapters in memory, reloaded when a write is
+    # announced over LISTEN/NOTIFY (one extra connection per worker) and at
+    # least this often in case a notification was missed
+    CATALOG_TTL_SECONDS: int = 600
+
+    # Change-log rows returned per /sync page
+    SYNC_PAGE_SIZE: int = 500
+    SYNC_MAX_PAGE_SIZE: int = 5000
+
+    # list_courses, list_chapters and /quizzes/by-subject return everything unless
+    # asked for a page (?limit= or ?cursor=); this is the size of a page asked for
+    # by cursor alone
+    LIST_PAGE_SIZE: int = Field(100, ge=1)
+    LIST_MAX_PAGE_SIZE: int = 1000
+
+    # Results per /search page
+    SEARCH_PAGE_SIZE: int = 20
+    SEARCH_MAX_PAGE_SIZE: int = 100
+
+    # Where prebuilt, precompressed content packs are written
+    CONTENT_PACK_DIR: str = "content_packs"
+
+    # Largest JSON or CSV file accepted by /courses/import
+    CURRICULUM_IMPORT_MAX_BYTES: int = 5 * 1024 * 1024
+
+    # /quizzes/import validates and commits this many quizzes at a time
+    QUIZ_IMPORT_BATCH_SIZE: int = Field(200, ge=1)
+    QUIZ_IMPORT_MAX_LINE_BYTES: int = 1024 * 1024
+
+    # Teacher reports rank students from an in-memory leaderboard per subject. A
+    # worker applies its own submissions to it at once and reloads it this often
+    # to pick up everyone else's.
+    LEADERBOARD_TTL_SECONDS: int = 60
+    LEADERBOARD_SIZE: int = 10
+    LEADERBOARD_MAX_SIZE: int = 100
+
+    # Result exports stream this many rows per batch (one Parquet row group each).
+    # Every running export holds a pool connection, so only this many run at once.
+    EXPORT_BATCH_ROWS: int = Field(10000, ge=1)
+    EXPORT_MAX_CONCURRENT: int = Field(2, ge=1)
+
+    # Max offline-queued attempts accepted in one /quizzes/submit-bulk call
+    BULK_ATTEMPT_MAX: int = 200
+
+    # Password hashing runs on a dedicated process pool. Requests beyond
+    # HASH_MAX_PENDING queued hashes get a 503 instead of piling up.
+    HASH_WORKERS: int = Field(2, ge=1)
+    HASH_MAX_PENDING: int = 64
+    # Stored hashes with fewer rounds are upgraded on the next successful login
+    BCRYPT_ROUNDS: int = Field(12, ge=4, le=31)
+
+    # PPT uploads are streamed to storage in chunks, never read whole into memory
+    PPT_MAX_UPLOAD_BYTES: int = 200 * 1024 * 1024
+    UPLOAD_CHUNK_SIZE: int = Field(1024 * 1024, ge=1)
+    # Files above this size use Supabase's resumable (TUS) upload, which needs 6 MB chunks
+    RESUMABLE_UPLOAD_THRESHOLD: int = 6 * 1024 * 1024
+    RESUMABLE_MAX_RETRIES: int = 3
+    STORAGE_TIMEOUT_SECONDS: float = 60
+
+    # Where PPT files live: "supabase" (Supabase Storage) or "local" (served from this box)
+    STORAGE_BACKEND: Literal["supabase", "local"] = "supabase"
+    LOCAL_STORAGE_DIR: str = "storage"
+    # Public address of this API, used to build file URLs for the local backend
+    PUBLIC_BASE_URL: str = "http://localhost:8000"
+    STORAGE_MAX_CONNECTIONS: int = Field(20, ge=1)
+    # Shared bucket for PPT files stored under their SHA-256, deduplicated across syllabi
+    PPT_CONTENT_BUCKET: str = "ppts"
+
+    # Slide text and thumbnails are extracted off the request path in worker processes
+    PREVIEW_WORKERS: int = Field(default_factory=lambda: max(1, (os.cpu_count() or 2) // 2), ge=1)
+    PREVIEW_SLIDES: int = 3  # slides rendered as thumbnails
+    PREVIEW_WIDTH: int = Field(320, ge=16)  # thumbnail width in pixels
+
+    @field_validator("STORAGE_BACKEND", mode="before")
+    @classmethod
+    def _lowercase_backend(cls, value):
+        return value.lower() if isinstance(value, str) else value
+
+    @field_validator("PUBLIC_BASE_URL")
+    @classmethod
+    def _strip_trailing_slash(cls, value: str) -> str:
+        return value.rstrip("/")
+
+    @model_validator(mode="after")
+    def _check(self):
+        if self.DB_POOL_SIZE is None:
+            self.DB_POOL_SIZE = max(1, self.DB_MAX_CONNECTIONS // (self.WEB_CONCURRENCY * 2))
+        if self.STORAGE_BACKEND == "supabase":
+            missing = [name for name in ("SUPABASE_URL", "SUPABASE_KEY") if not getattr(self, name)]
+            if missing:
+                raise ValueError(f"{' and '.join(missing)} must be set when STORAGE_BACKEND is 'supabase'")
+        return self
 
-load_dotenv()
+@lru_cache(maxsize=1)
+def get_settings() -> Settings:
+    """Read and validate the environment on first use, reporting every bad variable at once"""
+    from .startup import step
+    with step("settings"):
+        load_dotenv()
+        # An empty variable means "use the default", as it did with os.getenv(...) or default
+        values = {name: os.environ[name] for name in Settings.model_fields if os.environ.get(name)}
+        try:
+            return Settings(**values)
+        except ValidationError as e:
+            problems = [
+                f"  {'.'.join(str(part) for part in error['loc']) or 'settings'}: {error['msg']}"
+                for error in e.errors()
+            ]
+            raise ConfigError("Invalid configuration:\n" + "\n".join(problems)) from None
 
-DATABASE_URL = os.getenv("DATABASE_URL")
-SUPABASE_URL = os.getenv("SUPABASE_URL")
-SUPABASE_KEY = os.getenv("SUPABASE_KEY")  # This should be the service_role key for server operations
-SECRET_KEY = os.getenv("SECRET_KEY")
-JWT_ALGORITHM = os.getenv("JWT_ALGORITHM")
-ACCESS_TOKEN_EXPIRE_DAYS = int(os.getenv("ACCESS_TOKEN_EXPIRE_DAYS"))
+# Fixed by Supabase's resumable upload protocol, not configurable
+RESUMABLE_CHUNK_SIZE = 6 * 1024 * 1024
+# Boards we build offline content packs for (also the PPT bucket names)
+SYLLABI = ["ncert", "pseb"]
 
-# Create Supabase client with service role key (bypasses RLS)
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
+def __getattr__(name: str):
+    # `from .config import DATABASE_URL` keeps working and reads the validated settings
+    if name in Settings.model_fields:
+        return getattr(get_settings(), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
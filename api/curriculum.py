@@ -0,0 +1,196 @@
+import csv
+import io
+import json
+from collections import defaultdict
+from typing import Dict, List, NamedTuple, Optional, Tuple
+from sqlalchemy import insert, select
+from sqlalchemy.orm import Session
+from .changes import lock_change_log, record_changes
+from .schemas import CurriculumChapterResult, CurriculumConflict, CurriculumImportResponse, CurriculumSubjectResult
+from .versioning import courses_scope, chapters_scope, bump_version
+from . import models
+
+MAX_REPORTED_ERRORS = 20
+
+class CurriculumError(ValueError):
+    """The file couldn't be read as a curriculum; carries every problem found"""
+
+    def __init__(self, errors: List[str]):
+        super().__init__("; ".join(errors))
+        self.errors = errors
+
+class Curriculum(NamedTuple):
+    # (standard, subject) -> chapter names in file order, without duplicates
+    subjects: Dict[Tuple[int, str], List[str]]
+
+def _add(subjects: dict, standard: int, subject: str, chapter: Optional[str]):
+    chapters = subjects.setdefault((standard, subject), [])
+    if chapter and chapter not in chapters:
+        chapters.append(chapter)
+
+def _clean(value) -> str:
+    return value.strip() if isinstance(value, str) else ""
+
+def parse_curriculum_json(data: bytes) -> Curriculum:
+    """{"9": {"Maths": ["Algebra", "Geometry"], ...}, ...}: standard -> subject -> chapters"""
+    try:
+        document = json.loads(data.decode("utf-8-sig"))
+    except (UnicodeDecodeError, json.JSONDecodeError) as e:
+        raise CurriculumError([f"Not valid JSON: {e}"])
+    if not isinstance(document, dict):
+        raise CurriculumError(["Expected an object mapping each standard to its subjects"])
+
+    errors, subjects = [], {}
+    for standard_key, standard_subjects in document.items():
+        try:
+            standard = int(standard_key)
+        except ValueError:
+            errors.append(f"Standard '{standard_key}' is not a number")
+            continue
+        if not isinstance(standard_subjects, dict):
+            errors.append(f"Standard {standard}: expected an object mapping each subject to its chapters")
+            continue
+        for subject_key, chapters in standard_subjects.items():
+            subject = _clean(subject_key)
+            if not subject:
+                errors.append(f"Standard {standard}: subject name is empty")
+                continue
+            if not isinstance(chapters, list) or not all(isinstance(chapter, str) for chapter in chapters):
+                errors.append(f"Standard {standard}, {subject}: chapters must be a list of names")
+                continue
+            _add(subjects, standard, subject, None)
+            for chapter in chapters:
+                _add(subjects, standard, subject, _clean(chapter))
+    if errors:
+        raise CurriculumError(errors[:MAX_REPORTED_ERRORS])
+    return Curriculum(subjects)
+
+def parse_curriculum_csv(data: bytes) -> Curriculum:
+    """Rows of standard,subject,chapter; leave chapter empty to add a subject on its own"""
+    try:
+        reader = csv.DictReader(io.StringIO(data.decode("utf-8-sig")))
+    except UnicodeDecodeError as e:
+        raise CurriculumError([f"Not UTF-8 text: {e}"])
+    columns = {_clean(name).lower(): name for name in reader.fieldnames or []}
+    missing = [name for name in ("standard", "subject") if name not in columns]
+    if missing:
+        raise CurriculumError([f"Missing column(s): {', '.join(missing)}. Expected standard,subject,chapter"])
+
+    errors, subjects = [], {}
+    for line, row in enumerate(reader, start=2):
+        raw_standard = _clean(row.get(columns["standard"]))
+        subject = _clean(row.get(columns["subject"]))
+        chapter = _clean(row.get(columns["chapter"])) if "chapter" in columns else ""
+        if not raw_standard and not subject and not chapter:
+            continue
+        try:
+            standard = int(raw_standard)
+        except ValueError:
+            errors.append(f"Line {line}: standard '{raw_standard}' is not a number")
+            continue
+        if not subject:
+            errors.append(f"Line {line}: subject is empty")
+            continue
+        _add(subjects, standard, subject, chapter)
+    if errors:
+        raise CurriculumError(errors[:MAX_REPORTED_ERRORS])
+    return Curriculum(subjects)
+
+def import_curriculum(db: Session, curriculum: Curriculum) -> CurriculumImportResponse:
+    """Insert the subjects and chapters that don't exist yet, in the caller's transaction.
+
+    Existing rows are resolved in one query and the missing ones added with one
+    INSERT per table. Subject names are unique across standards, so a name
+    already used by another standard is reported as a conflict, not imported.
+    """
+    response = CurriculumImportResponse()
+    if not curriculum.subjects:
+        return response
+    # Serializes with other content writes, so nothing appears between the lookup and the inserts
+    lock_change_log(db)
+
+    names = {name for _, name in curriculum.subjects}
+    existing_subjects, existing_chapters = {}, defaultdict(dict)
+    for subject_id, name, standard, chapter_id, chapter_name in db.execute(
+        select(models.Subject.id, models.Subject.name, models.Subject.standard, models.Chapter.id, models.Chapter.name)
+        .outerjoin(models.Chapter, models.Chapter.subject_id == models.Subject.id)
+        .where(models.Subject.name.in_(names))
+        .order_by(models.Subject.id, models.Chapter.id)
+    ):
+        existing_subjects.setdefault(name, (subject_id, standard))
+        if chapter_id is not None:
+            existing_chapters[subject_id].setdefault(chapter_name, chapter_id)
+
+    # Subjects
+    subject_ids, new_subjects = {}, []
+    for standard, name in curriculum.subjects:
+        if name in existing_subjects:
+            subject_id, existing_standard = existing_subjects[name]
+            if existing_standard != standard:
+                response.conflicts.append(CurriculumConflict(
+                    standard=standard, subject=name,
+                    error=f"Subject name '{name}' is already used by standard {existing_standard}"
+                ))
+                continue
+            subject_ids[(standard, name)] = subject_id
+            response.skipped_subjects.append(CurriculumSubjectResult(id=subject_id, name=name, standard=standard))
+        else:
+            new_subjects.append((standard, name))
+
+    # The same name under two standards in one file: keep the first, like the unique constraint would
+    seen, unique_new = {}, []
+    for standard, name in new_subjects:
+        if name in seen:
+            response.conflicts.append(CurriculumConflict(
+                standard=standard, subject=name,
+                error=f"Subject name '{name}' is also listed under standard {seen[name]}"
+            ))
+        else:
+            seen[name] = standard
+            unique_new.append((standard, name))
+
+    if unique_new:
+        rows = db.execute(
+            insert(models.Subject).returning(models.Subject.id, models.Subject.name, models.Subject.standard),
+            [{"name": name, "standard": standard} for standard, name in unique_new]
+        ).all()
+        by_standard = defaultdict(list)
+        for subject_id, name, standard in rows:
+            subject_ids[(standard, name)] = subject_id
+            by_standard[standard].append(subject_id)
+            response.created_subjects.append(CurriculumSubjectResult(id=subject_id, name=name, standard=standard))
+        for standard, ids in by_standard.items():
+            record_changes(db, "subject", ids, standard=standard)
+            bump_version(db, courses_scope(standard))
+
+    # Chapters
+    new_chapters = []
+    for (standard, name), chapters in curriculum.subjects.items():
+        subject_id = subject_ids.get((standard, name))
+        if subject_id is None:
+            continue
+        for chapter in chapters:
+            chapter_id = existing_chapters[subject_id].get(chapter)
+            if chapter_id is not None:
+                response.skipped_chapters.append(CurriculumChapterResult(id=chapter_id, name=chapter, subject=name, standard=standard))
+            else:
+                new_chapters.append({"name": chapter, "subject_id": subject_id})
+
+    if new_chapters:
+        subjects_by_id = {subject_id: key for key, subject_id in subject_ids.items()}
+        rows = db.execute(
+            insert(models.Chapter).returning(models.Chapter.id, models.Chapter.name, models.Chapter.subject_id),
+            new_chapters
+        ).all()
+        by_standard, touched_subjects = defaultdict(list), set()
+        for chapter_id, chapter, subject_id in rows:
+            standard, name = subjects_by_id[subject_id]
+            by_standard[standard].append(chapter_id)
+            touched_subjects.add(name)
+            response.created_chapters.append(CurriculumChapterResult(id=chapter_id, name=chapter, subject=name, standard=standard))
+        for standard, ids in by_standard.items():
+            record_changes(db, "chapter", ids, standard=standard)
+        for name in touched_subjects:
+            bump_version(db, chapters_scope(name))
+
+    return response
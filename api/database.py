@@ -1,21 +1,148 @@
+import os
+import time
+from threading import Lock
 from sqlalchemy import create_engine
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine, async_sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
-from .config import DATABASE_URL
-
-if not DATABASE_URL:
-    raise ValueError("DATABASE_URL environment variable is not set.")
-
-# Create engine with better connection settings for Supabase
-engine = create_engine(
-    DATABASE_URL,
-    pool_pre_ping=True,  # Verify connections before use
-    pool_recycle=300,    # Recycle connections every 5 minutes
-    pool_timeout=20,     # Wait up to 20 seconds for connection
-    max_overflow=0       # Don't create more connections than pool_size
-)
-
-SessionLocal = sessionmaker(bind=engine, autocommit=False, autoflush=False)
+from sqlalchemy.orm import Session, sessionmaker
+from .config import get_settings
+from .startup import step
+
+class PoolStats:
+    """Checkout counters for one pool, to tell pool starvation apart from slow queries"""
+
+    def __init__(self):
+        self._lock = Lock()
+        self.waiting = 0
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    def start_wait(self):
+        with self._lock:
+            self.waiting += 1
+        return time.perf_counter()
+
+    def end_wait(self, started: float, timed_out: bool = False):
+        waited = time.perf_counter() - started
+        with self._lock:
+            self.waiting -= 1
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+            self.wait_seconds_total += waited
+            self.wait_seconds_max = max(self.wait_seconds_max, waited)
+
+    def snapshot(self, pool) -> dict:
+        with self._lock:
+            return {
+                "pool_size": pool.size(),
+                "checked_out": pool.checkedout(),
+                "checked_in": pool.checkedin(),
+                "overflow": max(pool.overflow(), 0),
+                "waiting": self.waiting,
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "wait_seconds_total": round(self.wait_seconds_total, 6),
+                "wait_seconds_max": round(self.wait_seconds_max, 6),
+                "wait_seconds_avg": round(self.wait_seconds_total / (self.checkouts + self.timeouts), 6) if self.checkouts + self.timeouts else 0.0,
+            }
+
+class _InstrumentedPoolMixin:
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stats = PoolStats()
+
+    def _do_get(self):
+        started = self.stats.start_wait()
+        try:
+            connection = super()._do_get()
+        except PoolTimeoutError:
+            self.stats.end_wait(started, timed_out=True)
+            raise
+        except BaseException:
+            self.stats.end_wait(started)
+            raise
+        self.stats.end_wait(started)
+        return connection
+
+class InstrumentedQueuePool(_InstrumentedPoolMixin, QueuePool):
+    pass
+
+class InstrumentedAsyncQueuePool(_InstrumentedPoolMixin, AsyncAdaptedQueuePool):
+    pass
+
+_engines = {}
+_engines_lock = Lock()
+
+def get_engine() -> Engine:
+    """The sync engine, created on first use rather than at import"""
+    engine = _engines.get("sync")
+    if engine is None:
+        with _engines_lock, step("sync engine"):
+            engine = _engines.get("sync")
+            if engine is None:
+                # Settings are read here rather than at import, so importing the models
+                # (as alembic does) doesn't need the app's whole environment
+                settings = get_settings()
+                # Create engine with better connection settings for Supabase
+                engine = _engines["sync"] = create_engine(
+                    settings.DATABASE_URL,
+                    poolclass=InstrumentedQueuePool,
+                    pool_pre_ping=True,                       # Verify connections before use
+                    pool_size=settings.DB_POOL_SIZE,          # Per worker process, see config.py
+                    max_overflow=settings.DB_MAX_OVERFLOW,    # Extra connections allowed above pool_size
+                    pool_recycle=settings.DB_POOL_RECYCLE,    # Recycle connections after this many seconds
+                    pool_timeout=settings.DB_POOL_TIMEOUT     # Wait this long for a connection before failing
+                )
+    return engine
+
+def async_database_url(url: str):
+    """Same database through asyncpg, which spells libpq's sslmode as ssl"""
+    url = make_url(url).set(drivername="postgresql+asyncpg")
+    if "sslmode" in url.query:
+        query = dict(url.query)
+        query["ssl"] = query.pop("sslmode")
+        url = url.set(query=query)
+    return url
+
+def get_async_engine() -> AsyncEngine:
+    """Async engine for the read-heavy routes, so a request waiting on Postgres
+    doesn't hold a threadpool worker. Created on first use."""
+    engine = _engines.get("async")
+    if engine is None:
+        with _engines_lock, step("async engine"):
+            engine = _engines.get("async")
+            if engine is None:
+                settings = get_settings()
+                engine = _engines["async"] = create_async_engine(
+                    async_database_url(settings.DATABASE_URL),
+                    poolclass=InstrumentedAsyncQueuePool,
+                    pool_pre_ping=True,
+                    pool_size=settings.DB_POOL_SIZE,
+                    max_overflow=settings.DB_MAX_OVERFLOW,
+                    pool_recycle=settings.DB_POOL_RECYCLE,
+                    pool_timeout=settings.DB_POOL_TIMEOUT,
+                    # Must be 0 behind a transaction-mode pooler such as Supabase's port 6543
+                    connect_args={"statement_cache_size": settings.ASYNC_DB_STATEMENT_CACHE_SIZE}
+                )
+    return engine
+
+class _LazySession(Session):
+    # Binds when the session first talks to the database, not when the module is imported
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        return get_engine()
+
+class _LazyAsyncSession(Session):
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        return get_async_engine().sync_engine
+
+SessionLocal = sessionmaker(class_=_LazySession, autocommit=False, autoflush=False)
 Base = declarative_base()
 
 def get_db():
@@ -24,3 +151,39 @@ def get_db():
         yield db
     finally:
         db.close()
+
+AsyncSessionLocal = async_sessionmaker(sync_session_class=_LazyAsyncSession, autoflush=False, expire_on_commit=False)
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+async def dispose_engines():
+    engine = _engines.pop("async", None)
+    if engine is not None:
+        await engine.dispose()
+    engine = _engines.pop("sync", None)
+    if engine is not None:
+        engine.dispose()
+
+def pool_metrics() -> dict:
+    """Stats for the pools this worker has opened so far"""
+    return {name: engine.pool.stats.snapshot(engine.pool) for name, engine in list(_engines.items())}
+
+MIGRATIONS_CONFIG = os.path.join(os.path.dirname(__file__), "alembic.ini")
+
+def check_schema_revision():
+    """Warn when the database isn't at the code's latest migration. The server never migrates it itself."""
+    # Imported here: alembic is only needed for this one check, off the startup path
+    from alembic.config import Config as AlembicConfig
+    from alembic.runtime.migration import MigrationContext
+    from alembic.script import ScriptDirectory
+
+    expected = set(ScriptDirectory.from_config(AlembicConfig(MIGRATIONS_CONFIG)).get_heads())
+    with get_engine().connect() as connection:
+        current = set(MigrationContext.configure(connection).get_current_heads())
+    if current != expected:
+        print(
+            f"⚠️ Database schema is at {sorted(current) or 'no revision'}, the code expects {sorted(expected)}. "
+            f"Run: alembic -c api/alembic.ini upgrade head"
+        )
@@ -0,0 +1,181 @@
+import asyncio
+from datetime import date, datetime, time, timedelta, UTC
+from threading import Lock
+from typing import AsyncIterator, List, Optional
+from fastapi import HTTPException, status
+from sqlalchemy import Select, select
+from .config import EXPORT_BATCH_ROWS, EXPORT_MAX_CONCURRENT
+from .database import AsyncSessionLocal
+from . import models
+
+MEDIA_TYPES = {"csv": "text/csv", "parquet": "application/vnd.apache.parquet"}
+
+# (column name, expression, Arrow type); types are named here because pyarrow is imported on first export
+ATTEMPT_COLUMNS = [
+    ("attempt_id", models.QuizAttempt.id, "int64"),
+    ("completed_at", models.QuizAttempt.completed_at, "timestamp"),
+    ("student_id", models.Student.id, "int64"),
+    ("student_name", models.Student.name, "string"),
+    ("standard", models.Subject.standard, "int32"),
+    ("subject", models.Subject.name, "string"),
+    ("chapter", models.Chapter.name, "string"),
+    ("quiz_id", models.Quiz.id, "int64"),
+    ("quiz_name", models.Quiz.quiz_name, "string"),
+    ("score", models.QuizAttempt.score, "int32"),
+    ("total_questions", models.QuizAttempt.total_questions, "int32"),
+]
+ANSWER_COLUMNS = ATTEMPT_COLUMNS + [
+    ("question_id", models.QuizQuestion.id, "int64"),
+    ("question_number", models.QuizQuestion.question_number, "int32"),
+    ("selected_option", models.StudentAnswer.selected_option, "string"),
+    ("is_correct", models.StudentAnswer.is_correct, "bool"),
+]
+DATASETS = {"attempts": ATTEMPT_COLUMNS, "answers": ANSWER_COLUMNS}
+
+_lock = Lock()
+_stats = {"active": 0, "started": 0, "rejected": 0, "rows": 0}
+
+def export_query(
+    dataset: str,
+    standard: Optional[int] = None,
+    subject: Optional[str] = None,
+    start: Optional[date] = None,
+    end: Optional[date] = None
+) -> Select:
+    """Completed attempts (or one row per answer) joined to their student, quiz, chapter and subject.
+
+    start and end are inclusive UTC dates of completion.
+    """
+    stmt = select(*[expression for _, expression, _ in DATASETS[dataset]]).select_from(models.QuizAttempt).join(
+        models.Student, models.Student.id == models.QuizAttempt.student_id
+    ).join(
+        models.Quiz, models.Quiz.id == models.QuizAttempt.quiz_id
+    ).join(
+        models.Chapter, models.Chapter.id == models.Quiz.chapter_id
+    ).join(
+        models.Subject, models.Subject.id == models.Chapter.subject_id
+    ).where(models.QuizAttempt.is_completed)
+    order = [models.QuizAttempt.id]
+    if dataset == "answers":
+        stmt = stmt.join(
+            models.StudentAnswer, models.StudentAnswer.attempt_id == models.QuizAttempt.id
+        ).join(
+            models.QuizQuestion, models.QuizQuestion.id == models.StudentAnswer.question_id
+        )
+        order.append(models.QuizQuestion.question_number)
+    if standard is not None:
+        stmt = stmt.where(models.Subject.standard == standard)
+    if subject is not None:
+        stmt = stmt.where(models.Subject.name == subject)
+    if start is not None:
+        stmt = stmt.where(models.QuizAttempt.completed_at >= datetime.combine(start, time.min, UTC))
+    if end is not None:
+        stmt = stmt.where(models.QuizAttempt.completed_at < datetime.combine(end + timedelta(days=1), time.min, UTC))
+    return stmt.order_by(*order)
+
+class ExportSlot:
+    """One of the EXPORT_MAX_CONCURRENT running exports; release() frees it, once"""
+
+    def __init__(self):
+        self._released = False
+
+    def release(self):
+        with _lock:
+            if not self._released:
+                self._released = True
+                _stats["active"] -= 1
+
+def reserve_export() -> ExportSlot:
+    # Each running export keeps a pool connection for as long as it streams, so only a
+    # few run at once. The slot is taken here, before the response starts, so the client
+    # gets a 503 and two requests can't both pass the check.
+    with _lock:
+        if _stats["active"] >= EXPORT_MAX_CONCURRENT:
+            _stats["rejected"] += 1
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Too many exports in progress, please retry shortly",
+                headers={"Retry-After": "30"}
+            )
+        _stats["active"] += 1
+        _stats["started"] += 1
+    return ExportSlot()
+
+class _Drain:
+    """Write-only file for the Arrow writers; hands back whatever was written since the last drain"""
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+async def stream_export(stmt: Select, dataset: str, file_format: str, slot: ExportSlot) -> AsyncIterator[bytes]:
+    """Yield the export as CSV or Parquet, EXPORT_BATCH_ROWS rows at a time, releasing slot when done.
+
+    Rows come through a server-side cursor on a session of its own, so memory holds one
+    batch whatever the size of the result, and every batch is sent before the next is read.
+    """
+    sink = _Drain()
+    writer = None
+    try:
+        # pyarrow takes a while to import and only exports need it
+        import pyarrow as pa
+        import pyarrow.csv
+        import pyarrow.parquet
+
+        types = {
+            "int32": pa.int32(), "int64": pa.int64(), "string": pa.string(), "bool": pa.bool_(),
+            "timestamp": pa.timestamp("us", tz="UTC"),
+        }
+        schema = pa.schema([(name, types[kind]) for name, _, kind in DATASETS[dataset]])
+        if file_format == "parquet":
+            # Each batch becomes a row group; the footer goes out last
+            writer = pyarrow.parquet.ParquetWriter(sink, schema, compression="zstd")
+        else:
+            writer = pyarrow.csv.CSVWriter(sink, schema)
+
+        def encode(rows: List[tuple]):
+            columns = list(zip(*rows))
+            writer.write_batch(pa.RecordBatch.from_arrays(
+                [pa.array(column, type=field.type) for column, field in zip(columns, schema)], schema=schema
+            ))
+
+        yield sink.drain()  # CSV header / Parquet magic
+        async with AsyncSessionLocal() as db:
+            result = await db.stream(stmt.execution_options(yield_per=EXPORT_BATCH_ROWS))
+            async for rows in result.partitions():
+                # Encoding and compression are CPU work; keep them off the event loop
+                await asyncio.to_thread(encode, rows)
+                with _lock:
+                    _stats["rows"] += len(rows)
+                yield sink.drain()
+        writer.close()
+        yield sink.drain()
+    finally:
+        # Also reached when the client goes away mid-export; closing twice is a no-op
+        if writer is not None:
+            writer.close()
+        slot.release()
+
+def export_metrics() -> dict:
+    with _lock:
+        return {**_stats, "max_concurrent": EXPORT_MAX_CONCURRENT}
@@ -0,0 +1,143 @@
+from datetime import datetime, UTC
+from typing import Dict, List, NamedTuple
+from fastapi import HTTPException, status
+from sqlalchemy import insert
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+from .cache import get_answer_key
+from .item_stats import record_attempt_stats
+from .progress import record_progress
+from .schemas import StudentAttemptSubmit
+from . import models
+
+VALID_OPTIONS = {"A", "B", "C", "D"}
+
+class GradedAttempt(NamedTuple):
+    quiz_id: int
+    score: int
+    total_questions: int
+    answers: List[dict]  # question_id, selected_option, is_correct
+    chapter_id: int
+    subject_id: int
+
+def grade_submission(db: Session, submission: StudentAttemptSubmit) -> GradedAttempt:
+    """Grade every answer against the cached answer key; unanswered questions count as wrong"""
+    answer_key = get_answer_key(db, submission.quiz_id)
+    if answer_key is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Quiz {submission.quiz_id} not found")
+
+    correct_options = answer_key.correct_options
+    if not answer_key.is_active:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Quiz {submission.quiz_id} is not active")
+
+    answers = []
+    seen = set()
+    for answer in submission.answers:
+        selected_option = answer.selected_option.upper()
+        if answer.question_id not in correct_options:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Question {answer.question_id} does not belong to quiz {submission.quiz_id}"
+            )
+        if answer.question_id in seen:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Question {answer.question_id} was answered more than once"
+            )
+        if selected_option not in VALID_OPTIONS:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Question {answer.question_id}: selected_option must be 'A', 'B', 'C', or 'D'. Got '{answer.selected_option}'"
+            )
+        seen.add(answer.question_id)
+        answers.append({
+            "question_id": answer.question_id,
+            "selected_option": selected_option,
+            "is_correct": selected_option == correct_options[answer.question_id]
+        })
+
+    score = sum(answer["is_correct"] for answer in answers)
+    return GradedAttempt(submission.quiz_id, score, len(correct_options), answers, answer_key.chapter_id, answer_key.subject_id)
+
+def save_attempt(db: Session, student_id: int, graded: GradedAttempt) -> models.QuizAttempt:
+    """Add the completed attempt and all its answers to the caller's transaction"""
+    attempt = models.QuizAttempt(
+        student_id=student_id,
+        quiz_id=graded.quiz_id,
+        score=graded.score,
+        total_questions=graded.total_questions,
+        is_completed=True,
+        completed_at=datetime.now(UTC)
+    )
+    db.add(attempt)
+    db.flush()
+
+    # One multi-row INSERT for every answer instead of one per question
+    if graded.answers:
+        db.execute(insert(models.StudentAnswer), [{"attempt_id": attempt.id, **answer} for answer in graded.answers])
+    record_attempt_stats(db, [graded])
+    record_progress(db, student_id, [(graded, attempt.completed_at)])
+    return attempt
+
+def save_queued_attempts(db: Session, student_id: int, graded_by_key: Dict[str, GradedAttempt]):
+    """Insert offline-queued attempts keyed by idempotency key in the caller's transaction.
+
+    Returns (created, existing), both mapping idempotency key to a row with id, quiz_id,
+    score, total_questions and is_completed. Keys already stored for the student are
+    left untouched and reported as existing.
+    """
+    if not graded_by_key:
+        return {}, {}
+
+    completed_at = datetime.now(UTC)
+    attempt_columns = (
+        models.QuizAttempt.id, models.QuizAttempt.client_attempt_id, models.QuizAttempt.quiz_id,
+        models.QuizAttempt.score, models.QuizAttempt.total_questions, models.QuizAttempt.is_completed
+    )
+
+    # A single multi-row INSERT; retries of attempts we already have are skipped by the unique key
+    inserted = db.execute(
+        pg_insert(models.QuizAttempt).values([
+            {
+                "student_id": student_id,
+                "quiz_id": graded.quiz_id,
+                "score": graded.score,
+                "total_questions": graded.total_questions,
+                "is_completed": True,
+                "completed_at": completed_at,
+                "client_attempt_id": key
+            }
+            for key, graded in graded_by_key.items()
+        ]).on_conflict_do_nothing(
+            constraint="unique_client_attempt_per_student"
+        ).returning(*attempt_columns)
+    ).all()
+    created = {row.client_attempt_id: row for row in inserted}
+
+    existing = {}
+    missing_keys = [key for key in graded_by_key if key not in created]
+    if missing_keys:
+        existing = {
+            row.client_attempt_id: row
+            for row in db.query(*attempt_columns).filter(
+                models.QuizAttempt.student_id == student_id,
+                models.QuizAttempt.client_attempt_id.in_(missing_keys)
+            ).all()
+        }
+
+    answer_rows = [
+        {"attempt_id": row.id, **answer}
+        for key, row in created.items()
+        for answer in graded_by_key[key].answers
+    ]
+    if answer_rows:
+        db.execute(
+            pg_insert(models.StudentAnswer).on_conflict_do_nothing(constraint="unique_answer_per_question_per_attempt"),
+            answer_rows
+        )
+    record_attempt_stats(db, [graded_by_key[key] for key in created])
+    # In id order, which is the order the device queued them in
+    record_progress(db, student_id, [
+        (graded_by_key[row.client_attempt_id], completed_at) for row in sorted(created.values(), key=lambda row: row.id)
+    ])
+    return created, existing
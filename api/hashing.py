@@ -0,0 +1,97 @@
+import asyncio
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from threading import Lock
+from typing import Optional, Tuple
+from fastapi import HTTPException, status
+from passlib.context import CryptContext
+from .config import HASH_WORKERS, HASH_MAX_PENDING, BCRYPT_ROUNDS
+
+# min_rounds makes verify_and_update flag hashes made with older, cheaper settings
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__rounds=BCRYPT_ROUNDS,
+    bcrypt__min_rounds=BCRYPT_ROUNDS
+)
+
+_executor = None
+_lock = Lock()
+_stats = {
+    "submitted": 0,
+    "completed": 0,
+    "rejected": 0,
+    "pending": 0,
+    "queue_seconds_total": 0.0,
+    "run_seconds_total": 0.0,
+}
+
+# These run inside the pool's worker processes
+
+def _hash(password: str) -> Tuple[str, float]:
+    started = time.perf_counter()
+    return pwd_context.hash(password), time.perf_counter() - started
+
+def _verify_and_update(password: str, hashed: str) -> Tuple[Tuple[bool, Optional[str]], float]:
+    started = time.perf_counter()
+    return pwd_context.verify_and_update(password, hashed), time.perf_counter() - started
+
+def start_hashing_pool():
+    """Create the pool up front so the first login doesn't pay for process startup"""
+    global _executor
+    with _lock:
+        if _executor is None:
+            # spawn, not fork: the server process already has threads and an event loop
+            _executor = ProcessPoolExecutor(max_workers=HASH_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+    return _executor
+
+def stop_hashing_pool():
+    global _executor
+    with _lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+async def _run(function, *args):
+    executor = start_hashing_pool()
+    with _lock:
+        if _stats["pending"] >= HASH_MAX_PENDING:
+            _stats["rejected"] += 1
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Too many logins in progress, please retry shortly",
+                headers={"Retry-After": "1"}
+            )
+        _stats["submitted"] += 1
+        _stats["pending"] += 1
+
+    started = time.perf_counter()
+    run_seconds = 0.0
+    try:
+        result, run_seconds = await asyncio.get_running_loop().run_in_executor(executor, function, *args)
+        return result
+    finally:
+        total_seconds = time.perf_counter() - started
+        with _lock:
+            _stats["pending"] -= 1
+            _stats["completed"] += 1
+            _stats["run_seconds_total"] += run_seconds
+            _stats["queue_seconds_total"] += max(total_seconds - run_seconds, 0.0)
+
+async def hash_password(password: str) -> str:
+    return await _run(_hash, password)
+
+async def verify_password(password: str, hashed: str) -> Tuple[bool, Optional[str]]:
+    """Return (valid, new_hash); new_hash is set when the stored hash should be replaced"""
+    return await _run(_verify_and_update, password, hashed)
+
+def hashing_metrics() -> dict:
+    with _lock:
+        stats = dict(_stats)
+    completed = stats["completed"]
+    stats["queue_seconds_avg"] = round(stats["queue_seconds_total"] / completed, 6) if completed else 0.0
+    stats["run_seconds_avg"] = round(stats["run_seconds_total"] / completed, 6) if completed else 0.0
+    stats["workers"] = HASH_WORKERS
+    stats["max_pending"] = HASH_MAX_PENDING
+    return stats
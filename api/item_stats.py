@@ -0,0 +1,150 @@
+from typing import Iterable, Optional, Tuple
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+from . import models
+
+OPTIONS = ("A", "B", "C", "D")
+_CHOSE = [f"chose_{option.lower()}" for option in OPTIONS]
+_SCORE_SUMS = [f"score_sum_{option.lower()}" for option in OPTIONS]
+COUNTER_COLUMNS = _CHOSE + _SCORE_SUMS + ["score_sq_sum"]
+
+# Classical test theory rules of thumb for flagging items
+MIN_RESPONSES = 20     # below this the numbers are too noisy to flag anything
+TOO_EASY = 0.90        # difficulty (share correct) above this
+TOO_HARD = 0.25        # difficulty below this
+LOW_DISCRIMINATION = 0.20
+
+def _increment(stmt, key: str, columns):
+    return stmt.on_conflict_do_update(
+        index_elements=[key],
+        set_={column: stmt.table.c[column] + stmt.excluded[column] for column in columns}
+    )
+
+def attempt_sums(attempts: Iterable) -> Tuple[dict, dict]:
+    """What completed attempts (GradedAttempts) add to QuestionStats and QuizStats, keyed by question and quiz id"""
+    questions, quizzes = {}, {}
+    for graded in attempts:
+        score = graded.score
+        quiz = quizzes.setdefault(graded.quiz_id, {"quiz_id": graded.quiz_id, "attempts": 0, "score_sum": 0, "score_sq_sum": 0})
+        quiz["attempts"] += 1
+        quiz["score_sum"] += score
+        quiz["score_sq_sum"] += score * score
+        for answer in graded.answers:
+            row = questions.get(answer["question_id"])
+            if row is None:
+                row = questions[answer["question_id"]] = {
+                    "question_id": answer["question_id"], "quiz_id": graded.quiz_id, "score_sq_sum": 0,
+                    **{column: 0 for column in _CHOSE + _SCORE_SUMS}
+                }
+            option = answer["selected_option"].lower()
+            row[f"chose_{option}"] += 1
+            row[f"score_sum_{option}"] += score
+            row["score_sq_sum"] += score * score
+    return questions, quizzes
+
+def record_attempt_stats(db: Session, attempts: Iterable):
+    """Add completed attempts (GradedAttempts) to QuestionStats and QuizStats in the caller's transaction"""
+    questions, quizzes = attempt_sums(attempts)
+    if not quizzes:
+        return
+    # Rows go in key order so concurrent submissions lock them in the same order
+    if questions:
+        db.execute(_increment(
+            insert(models.QuestionStats).values([questions[key] for key in sorted(questions)]),
+            "question_id", COUNTER_COLUMNS
+        ))
+    db.execute(_increment(
+        insert(models.QuizStats).values([quizzes[key] for key in sorted(quizzes)]),
+        "quiz_id", ["attempts", "score_sum", "score_sq_sum"]
+    ))
+
+def _number(value) -> Optional[float]:
+    # NaN marks a statistic that isn't defined yet (no answers, or everyone chose the same)
+    return None if value is None or value != value else round(float(value), 4)
+
+def analyze_items(stats, quiz_stats: Optional[models.QuizStats]) -> dict:
+    """Item analysis for one quiz from its QuestionStats rows, as columns.
+
+    stats is a DataFrame with question_id, question_number, correct_option and the
+    QuestionStats counters. Discrimination is the corrected point-biserial: each
+    item against the rest of the attempt's score, so it doesn't correlate with itself.
+    """
+    import numpy as np
+
+    chose = stats[_CHOSE].to_numpy(dtype=float)            # questions x options
+    score_sums = stats[_SCORE_SUMS].to_numpy(dtype=float)
+    responses = chose.sum(axis=1)
+    correct = (stats["correct_option"].to_numpy()[:, None] == np.array(OPTIONS)[None, :]).astype(float)
+    correct_column = correct.argmax(axis=1)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        n_correct = (chose * correct).sum(axis=1)
+        difficulty = n_correct / responses
+
+        # Rest score = attempt score minus this item's own point
+        rest_sums = score_sums - correct * chose                 # per option
+        rest_total = rest_sums.sum(axis=1)
+        rest_sq_total = stats["score_sq_sum"].to_numpy(dtype=float) - 2 * (score_sums * correct).sum(axis=1) + n_correct
+        rest_mean = rest_total / responses
+        rest_sd = np.sqrt(np.maximum(rest_sq_total / responses - rest_mean ** 2, 0))
+
+        # Point-biserial of "chose this option" against the rest score, for every option at once
+        share = chose / responses[:, None]
+        mean_choosers = rest_sums / chose
+        mean_others = (rest_total[:, None] - rest_sums) / (responses[:, None] - chose)
+        option_discrimination = (mean_choosers - mean_others) / rest_sd[:, None] * np.sqrt(share * (1 - share))
+        option_discrimination[(chose == 0) | (chose == responses[:, None])] = np.nan
+        option_discrimination[~np.isfinite(option_discrimination)] = np.nan
+        discrimination = np.take_along_axis(option_discrimination, correct_column[:, None], axis=1)[:, 0]
+
+    items = []
+    for index, row in enumerate(stats.itertuples(index=False)):
+        flags = []
+        if responses[index] >= MIN_RESPONSES:
+            if difficulty[index] > TOO_EASY:
+                flags.append("too_easy")
+            elif difficulty[index] < TOO_HARD:
+                flags.append("too_hard")
+            if not np.isnan(discrimination[index]) and discrimination[index] < LOW_DISCRIMINATION:
+                flags.append("low_discrimination")
+            # A wrong option that stronger students prefer usually means the question or key is off
+            flags += [
+                f"misleading_option_{option}"
+                for column, option in enumerate(OPTIONS)
+                if not correct[index, column] and option_discrimination[index, column] > 0
+            ]
+        items.append({
+            "question_id": row.question_id,
+            "question_number": row.question_number,
+            "correct_option": row.correct_option,
+            "responses": int(responses[index]),
+            "difficulty": _number(difficulty[index]),
+            "discrimination": _number(discrimination[index]),
+            "options": [
+                {
+                    "option": option, "chosen": int(chose[index, column]),
+                    "share": _number(share[index, column]), "discrimination": _number(option_discrimination[index, column])
+                }
+                for column, option in enumerate(OPTIONS)
+            ],
+            "flags": flags,
+        })
+
+    attempts = quiz_stats.attempts if quiz_stats else 0
+    mean_score = score_sd = reliability = None
+    if attempts:
+        mean_score = quiz_stats.score_sum / attempts
+        variance = max(quiz_stats.score_sq_sum / attempts - mean_score ** 2, 0.0)
+        score_sd = variance ** 0.5
+        # KR-20 over the items answered so far
+        k = int((responses > 0).sum())
+        if k > 1 and variance > 0:
+            pq = np.nansum(difficulty * (1 - difficulty))
+            reliability = k / (k - 1) * (1 - pq / variance)
+    return {
+        "attempts": attempts,
+        "mean_score": _number(mean_score),
+        "score_stddev": _number(score_sd),
+        "reliability": _number(reliability),
+        "items": items,
+    }
@@ -0,0 +1,112 @@
+import time
+from bisect import bisect_left, insort
+from threading import Lock
+from typing import Dict, List, NamedTuple, Optional, Tuple
+from sqlalchemy import event, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from .config import LEADERBOARD_TTL_SECONDS
+from . import models
+
+class Standing(NamedTuple):
+    student_id: int
+    name: str
+    mastery: float
+    best_percent: float
+    attempts: int
+
+class Leaderboard:
+    """Every student with progress in one subject, kept sorted by mastery (highest first)"""
+
+    def __init__(self, standings: List[Standing], cohort: int):
+        self.cohort = cohort  # students in the subject's standard, whether they attempted anything or not
+        self._lock = Lock()
+        self._standings: Dict[int, Standing] = {standing.student_id: standing for standing in standings}
+        self._order = sorted(self._key(standing) for standing in standings)
+
+    @staticmethod
+    def _key(standing: Standing) -> Tuple[float, int]:
+        return (-standing.mastery, standing.student_id)
+
+    def __len__(self) -> int:
+        return len(self._order)
+
+    def _rank(self, key) -> int:
+        # Ties share the better rank: (-mastery,) sorts before every (-mastery, student_id)
+        return bisect_left(self._order, key[:1]) + 1
+
+    def top(self, n: int) -> List[Tuple[int, Standing]]:
+        """(rank, standing) of the first n students"""
+        with self._lock:
+            return [(self._rank(key), self._standings[key[1]]) for key in self._order[:n]]
+
+    def rank(self, student_id: int) -> Optional[int]:
+        with self._lock:
+            standing = self._standings.get(student_id)
+            return self._rank(self._key(standing)) if standing else None
+
+    def update(self, student_id: int, mastery: float, best_percent: float, attempts: int) -> bool:
+        """Move a student already on the board; False if they aren't (their name isn't known here)"""
+        with self._lock:
+            standing = self._standings.get(student_id)
+            if standing is None:
+                return False
+            del self._order[bisect_left(self._order, self._key(standing))]
+            standing = standing._replace(mastery=mastery, best_percent=best_percent, attempts=attempts)
+            self._standings[student_id] = standing
+            insort(self._order, self._key(standing))
+            return True
+
+# subject_id -> (loaded_at, Leaderboard). Submissions committed on this worker are
+# applied in place; everyone else's show up when the board is reloaded after
+# LEADERBOARD_TTL_SECONDS.
+_lock = Lock()
+_boards: Dict[int, Tuple[float, Leaderboard]] = {}
+_stats = {"loads": 0, "updates": 0}
+
+def _load(db: Session, subject_id: int, standard: int) -> Leaderboard:
+    progress = models.StudentSubjectProgress
+    rows = db.execute(
+        select(progress.student_id, models.Student.name, progress.mastery, progress.best_percent, progress.attempts)
+        .join(models.Student, models.Student.id == progress.student_id)
+        .where(progress.subject_id == subject_id)
+    ).all()
+    cohort = db.scalar(select(func.count()).select_from(models.Student).where(models.Student.standard == standard))
+    board = Leaderboard([Standing(*row) for row in rows], cohort)
+    with _lock:
+        _boards[subject_id] = (time.monotonic(), board)
+        _stats["loads"] += 1
+    return board
+
+async def get_leaderboard(db: AsyncSession, subject_id: int, standard: int) -> Leaderboard:
+    with _lock:
+        cached = _boards.get(subject_id)
+    if cached is not None and time.monotonic() - cached[0] < LEADERBOARD_TTL_SECONDS:
+        return cached[1]
+    return await db.run_sync(_load, subject_id, standard)
+
+def note_progress(db: Session, subject_id: int, student_id: int, row: dict):
+    """Queue a student's new subject progress for this worker's leaderboard, applied on commit"""
+    db.info.setdefault("leaderboard_updates", []).append(
+        (subject_id, student_id, row["mastery"], row["best_percent"], row["attempts"])
+    )
+
+@event.listens_for(Session, "after_commit")
+def _apply_committed_progress(session):
+    for subject_id, student_id, mastery, best_percent, attempts in session.info.pop("leaderboard_updates", ()):
+        with _lock:
+            cached = _boards.get(subject_id)
+            _stats["updates"] += 1
+        if cached is not None and not cached[1].update(student_id, mastery, best_percent, attempts):
+            # A student new to the subject: reload rather than guess their name
+            with _lock:
+                if _boards.get(subject_id) is cached:
+                    del _boards[subject_id]
+
+@event.listens_for(Session, "after_rollback")
+def _discard_rolled_back_progress(session):
+    session.info.pop("leaderboard_updates", None)
+
+def leaderboard_metrics() -> dict:
+    with _lock:
+        return {"boards": len(_boards), "students": sum(len(board) for _, board in _boards.values()), **_stats}
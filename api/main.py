@@ -1,32 +1,52 @@
+import asyncio
+import time
 from fastapi import FastAPI, HTTPException, status
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.params import Depends
-from sqlalchemy.orm import Session
-from sqlalchemy import text
-from psycopg2 import IntegrityError
+from sqlalchemy import select, text
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 from contextlib import asynccontextmanager
-from passlib.context import CryptContext
 from . import models
-from .schemas import UserCreate, RoleEnum
-from .database import engine, get_db
-from .routers import login, ppts, courses, quiz
-from .config import supabase
+from .schemas import UserCreate, RoleEnum, TokenData
+from .database import get_async_engine, dispose_engines, get_async_db, pool_metrics, check_schema_revision
+from .hashing import hash_password, start_hashing_pool, stop_hashing_pool, hashing_metrics
+from .storage import close_storage
+from .previews import stop_preview_pool
+from .catalog import start_catalog_listener, stop_catalog_listener, catalog_metrics
+from .leaderboards import leaderboard_metrics
+from .exports import export_metrics
+from .pagination import NEXT_CURSOR_HEADER
+from .routers import login, ppts, courses, quiz, sync, packs, search, analytics
+from .startup import STARTED, step, record_step, mark_ready, print_startup_report, startup_report
 
-@asynccontextmanager
-async def lifespan(app: FastAPI):
-    """Initialize database tables on startup"""
+def _check_schema():
     try:
-        models.Base.metadata.create_all(bind=engine)
-        print("✅ Database tables created successfully")
+        check_schema_revision()
     except Exception as e:
-        print(f"❌ Failed to create database tables: {e}")
-        raise
+        print(f"⚠️ Could not check the database schema revision: {e}")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Start worker pools; the schema is managed by migrations (api/alembic.ini), not here"""
+    record_step("imports", time.perf_counter() - STARTED)
+    with step("hashing pool"):
+        start_hashing_pool()
+    # Needs a database round trip, so it runs alongside startup rather than delaying it
+    schema_check = asyncio.create_task(asyncio.to_thread(_check_schema))
+    start_catalog_listener()
+    mark_ready()
+    print_startup_report()
     yield
+    await stop_catalog_listener()
+    stop_hashing_pool()
+    stop_preview_pool()
+    await close_storage()
+    await schema_check
+    await dispose_engines()
 
 origins = ["https://earnest-treacle-320235.netlify.app/"]
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated = "auto")
-
 app = FastAPI(
     title="VidyaVistaar API",
     description='''API for VidyaVistaar website [GitHub Repo](https://github.com/pranavmanthripragada-arch/project-1)''',
@@ -39,22 +59,39 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER],
 )
 
 app.include_router(login.router)
 app.include_router(ppts.router)
 app.include_router(courses.router)
 app.include_router(quiz.router)
+app.include_router(sync.router)
+app.include_router(packs.router)
+app.include_router(search.router)
+app.include_router(analytics.router)
 
 @app.get("/")
 def home():
     return {"message": "Read docs at /docs"}
 
+@app.get("/metrics", status_code=status.HTTP_200_OK)
+def metrics(current_user: TokenData = Depends(login.teacher_only)):
+    return {
+        "db_pool": pool_metrics(),
+        "password_hashing": hashing_metrics(),
+        "token_cache": login.token_cache_metrics(),
+        "catalog": catalog_metrics(),
+        "leaderboards": leaderboard_metrics(),
+        "exports": export_metrics(),
+        "startup": startup_report()
+    }
+
 @app.get("/db-health", status_code=status.HTTP_200_OK)
 async def db_health_check():
     try:
-        with engine.connect() as conn:
-            conn.execute(text("SELECT 1"))
+        async with get_async_engine().connect() as conn:
+            await conn.execute(text("SELECT 1"))
         return {"status": "✅ Database connected"}
     except Exception as e:
         raise HTTPException(
@@ -63,8 +100,8 @@ async def db_health_check():
         )
     
 @app.post("/create-user", status_code=status.HTTP_201_CREATED)
-def create_user(request: UserCreate, db: Session=Depends(get_db)):
-    existing_email = db.query(models.User).filter((models.User.email == request.email)).first()
+async def create_user(request: UserCreate, db: AsyncSession=Depends(get_async_db)):
+    existing_email = (await db.execute(select(models.User).where(models.User.email == request.email))).scalars().first()
 
     if existing_email:
         raise HTTPException(
@@ -74,18 +111,17 @@ def create_user(request: UserCreate, db: Session=Depends(get_db)):
 
     new_user = models.User(
         email = request.email,
-        password = pwd_context.hash(request.password),
+        password = await hash_password(request.password),
         role = request.role
     )
 
     try:
         db.add(new_user)
-        db.commit()
-        db.refresh(new_user)
+        await db.commit()
         return {"message": "User created successfully"}
     
     except IntegrityError as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_409_CONFLICT,
             detail="Email already exists"
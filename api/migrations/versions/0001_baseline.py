@@ -0,0 +1,137 @@
+"""Baseline: the tables the API used to create with create_all at startup
+
+Revision ID: 0001_baseline
+Revises:
+Create Date: 2026-10-18 00:00:00
+
+Existing databases already have these tables, so each one is only created
+when it is missing and upgrading such a database is a no-op here. The offline
+script (upgrade --sql) has no database to look at and is for a new, empty one.
+"""
+from typing import Sequence, Union
+
+from alembic import context, op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0001_baseline"
+down_revision: Union[str, Sequence[str], None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+role_enum = postgresql.ENUM("student", "teacher", "admin", name="role_enum", create_type=False)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    bind = op.get_bind()
+    offline = context.is_offline_mode()
+    existing = set() if offline else set(sa.inspect(bind).get_table_names())
+    role_enum.create(bind, checkfirst=not offline)
+
+    if "Students" not in existing:
+        op.create_table(
+            "Students",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("name", sa.String(), nullable=False),
+            sa.Column("email", sa.String(), nullable=False, unique=True),
+            sa.Column("password", sa.String(), nullable=False),
+            sa.Column("standard", sa.Integer(), nullable=False),
+            sa.Column("role", role_enum, nullable=False),
+        )
+    if "Teachers" not in existing:
+        op.create_table(
+            "Teachers",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("name", sa.String(), nullable=False),
+            sa.Column("subject", sa.String(), nullable=False),
+            sa.Column("email", sa.String(), nullable=False, unique=True),
+            sa.Column("password", sa.String(), nullable=False),
+            sa.Column("role", role_enum, nullable=False),
+        )
+    if "Subjects" not in existing:
+        op.create_table(
+            "Subjects",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("name", sa.String(), nullable=False, unique=True),
+            sa.Column("standard", sa.Integer(), nullable=False),
+        )
+    if "Chapters" not in existing:
+        op.create_table(
+            "Chapters",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("name", sa.String(), nullable=False),
+            sa.Column("subject_id", sa.Integer(), sa.ForeignKey("Subjects.id"), nullable=False),
+        )
+    if "PPTs" not in existing:
+        op.create_table(
+            "PPTs",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("subject", sa.String(), nullable=False),
+            sa.Column("standard", sa.Integer(), nullable=False),
+            sa.Column("chapter", sa.String(), nullable=False),
+            sa.Column("syllabus", sa.String(), nullable=False),
+            sa.Column("file_url", sa.String(), nullable=False),
+            sa.Column("filename", sa.String(), nullable=False),
+            sa.Column("file_path", sa.String(), nullable=False),
+            sa.UniqueConstraint("subject", "standard", "chapter", name="unique_ppt_per_chapter"),
+        )
+        op.create_index("ix_PPTs_id", "PPTs", ["id"])
+    if "Quizzes" not in existing:
+        op.create_table(
+            "Quizzes",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("quiz_name", sa.String(), nullable=False),
+            sa.Column("description", sa.Text(), nullable=True),
+            sa.Column("chapter_id", sa.Integer(), sa.ForeignKey("Chapters.id"), nullable=False),
+            sa.Column("is_active", sa.Boolean(), nullable=False),
+            sa.UniqueConstraint("chapter_id", "quiz_name", name="unique_quiz_per_chapter"),
+        )
+        op.create_index("ix_Quizzes_id", "Quizzes", ["id"])
+    if "QuizQuestions" not in existing:
+        op.create_table(
+            "QuizQuestions",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("quiz_id", sa.Integer(), sa.ForeignKey("Quizzes.id"), nullable=False),
+            sa.Column("question_number", sa.Integer(), nullable=False),
+            sa.Column("question_text", sa.Text(), nullable=False),
+            sa.Column("option_a", sa.String(), nullable=False),
+            sa.Column("option_b", sa.String(), nullable=False),
+            sa.Column("option_c", sa.String(), nullable=False),
+            sa.Column("option_d", sa.String(), nullable=False),
+            sa.Column("correct_option", sa.String(), nullable=False),
+            sa.Column("explanation", sa.Text(), nullable=True),
+            sa.UniqueConstraint("quiz_id", "question_number", name="unique_question_number_per_quiz"),
+        )
+        op.create_index("ix_QuizQuestions_id", "QuizQuestions", ["id"])
+    if "QuizAttempts" not in existing:
+        op.create_table(
+            "QuizAttempts",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("student_id", sa.Integer(), sa.ForeignKey("Students.id"), nullable=False),
+            sa.Column("quiz_id", sa.Integer(), sa.ForeignKey("Quizzes.id"), nullable=False),
+            sa.Column("score", sa.Integer(), nullable=True),
+            sa.Column("total_questions", sa.Integer(), nullable=False),
+            sa.Column("is_completed", sa.Boolean(), nullable=False),
+        )
+        op.create_index("ix_QuizAttempts_id", "QuizAttempts", ["id"])
+    if "StudentAnswers" not in existing:
+        op.create_table(
+            "StudentAnswers",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("attempt_id", sa.Integer(), sa.ForeignKey("QuizAttempts.id"), nullable=False),
+            sa.Column("question_id", sa.Integer(), sa.ForeignKey("QuizQuestions.id"), nullable=False),
+            sa.Column("selected_option", sa.String(), nullable=False),
+            sa.Column("is_correct", sa.Boolean(), nullable=False),
+            sa.UniqueConstraint("attempt_id", "question_id", name="unique_answer_per_question_per_attempt"),
+        )
+        op.create_index("ix_StudentAnswers_id", "StudentAnswers", ["id"])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table in ("StudentAnswers", "QuizAttempts", "QuizQuestions", "Quizzes", "PPTs", "Chapters", "Subjects", "Teachers", "Students"):
+        op.drop_table(table)
+    role_enum.drop(op.get_bind(), checkfirst=not context.is_offline_mode())
@@ -0,0 +1,156 @@
+"""Content versions, change log, deduplicated PPT files, previews and search
+
+Revision ID: 0002_content_tracking
+Revises: 0001_baseline
+Create Date: 2026-10-18 00:00:01
+
+Some of these were created by create_all on servers that ran before
+migrations existed, so tables and columns are only added when missing. The
+change log and search index are seeded from existing rows the first time. The
+offline script (upgrade --sql) is for a database at 0001 without them.
+"""
+from typing import Sequence, Union
+
+from alembic import context, op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0002_content_tracking"
+down_revision: Union[str, Sequence[str], None] = "0001_baseline"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+SEARCH_DOCUMENT_SQL = (
+    "setweight(to_tsvector('english', coalesce(title, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(body, '')), 'B')"
+)
+
+BACKFILL_CHANGE_LOG = """
+INSERT INTO "ChangeLog" (entity, entity_id, operation, standard)
+SELECT entity, entity_id, 'upsert', standard FROM (
+    SELECT 1 AS kind, 'subject' AS entity, s.id AS entity_id, s.standard FROM "Subjects" s
+    UNION ALL
+    SELECT 2, 'chapter', c.id, s.standard
+    FROM "Chapters" c JOIN "Subjects" s ON c.subject_id = s.id
+    UNION ALL
+    SELECT 3, 'quiz', q.id, s.standard
+    FROM "Quizzes" q JOIN "Chapters" c ON q.chapter_id = c.id JOIN "Subjects" s ON c.subject_id = s.id
+    UNION ALL
+    SELECT 4, 'quiz_question', qq.id, s.standard
+    FROM "QuizQuestions" qq JOIN "Quizzes" q ON qq.quiz_id = q.id
+    JOIN "Chapters" c ON q.chapter_id = c.id JOIN "Subjects" s ON c.subject_id = s.id
+    UNION ALL
+    SELECT 5, 'ppt', p.id, p.standard FROM "PPTs" p
+) existing
+ORDER BY kind, entity_id
+"""
+
+BACKFILL_SEARCH = """
+INSERT INTO "SearchDocuments" (entity, entity_id, standard, subject, chapter, syllabus, quiz_id, title, body)
+SELECT 'chapter', c.id, s.standard, s.name, c.name, NULL, NULL, c.name, NULL
+FROM "Chapters" c JOIN "Subjects" s ON c.subject_id = s.id
+UNION ALL
+SELECT 'quiz', q.id, s.standard, s.name, c.name, NULL, q.id, q.quiz_name, q.description
+FROM "Quizzes" q JOIN "Chapters" c ON q.chapter_id = c.id JOIN "Subjects" s ON c.subject_id = s.id
+UNION ALL
+SELECT 'quiz_question', qq.id, s.standard, s.name, c.name, NULL, qq.quiz_id, qq.question_text,
+       concat_ws(' ', qq.option_a, qq.option_b, qq.option_c, qq.option_d, qq.explanation)
+FROM "QuizQuestions" qq JOIN "Quizzes" q ON qq.quiz_id = q.id
+JOIN "Chapters" c ON q.chapter_id = c.id JOIN "Subjects" s ON c.subject_id = s.id
+UNION ALL
+SELECT 'ppt', p.id, p.standard, p.subject, p.chapter, p.syllabus, NULL, p.chapter, NULL
+FROM "PPTs" p
+ON CONFLICT ON CONSTRAINT unique_search_document DO NOTHING
+"""
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    offline = context.is_offline_mode()
+    inspector = None if offline else sa.inspect(op.get_bind())
+    existing = set() if offline else set(inspector.get_table_names())
+
+    def has_column(table, column):
+        return not offline and any(c["name"] == column for c in inspector.get_columns(table))
+
+    if not has_column("QuizAttempts", "completed_at"):
+        op.add_column("QuizAttempts", sa.Column("completed_at", sa.DateTime(timezone=True), nullable=True))
+    if not has_column("QuizAttempts", "client_attempt_id"):
+        op.add_column("QuizAttempts", sa.Column("client_attempt_id", sa.String(), nullable=True))
+        op.create_unique_constraint("unique_client_attempt_per_student", "QuizAttempts", ["student_id", "client_attempt_id"])
+    if not has_column("PPTs", "content_hash"):
+        op.add_column("PPTs", sa.Column("content_hash", sa.String(), nullable=True))
+        op.create_index("ix_PPTs_content_hash", "PPTs", ["content_hash"])
+
+    if "ContentVersions" not in existing:
+        op.create_table(
+            "ContentVersions",
+            sa.Column("scope", sa.String(), primary_key=True),
+            sa.Column("version", sa.Integer(), nullable=False),
+        )
+
+    if "ChangeLog" not in existing:
+        op.create_table(
+            "ChangeLog",
+            sa.Column("id", sa.BigInteger(), primary_key=True),
+            sa.Column("entity", sa.String(), nullable=False),
+            sa.Column("entity_id", sa.Integer(), nullable=False),
+            sa.Column("operation", sa.String(), nullable=False),
+            sa.Column("standard", sa.Integer(), nullable=True),
+            sa.Column("changed_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+        )
+        op.create_index("ix_changelog_standard_id", "ChangeLog", ["standard", "id"])
+
+    if "PPTPreviews" not in existing:
+        op.create_table(
+            "PPTPreviews",
+            sa.Column("content_hash", sa.String(), primary_key=True),
+            sa.Column("status", sa.String(), nullable=False),
+            sa.Column("slide_count", sa.Integer(), nullable=False),
+            sa.Column("thumbnail_count", sa.Integer(), nullable=False),
+            sa.Column("slides", sa.JSON(), nullable=True),
+            sa.Column("error", sa.String(), nullable=True),
+            sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+        )
+
+    if "SearchDocuments" not in existing:
+        op.create_table(
+            "SearchDocuments",
+            sa.Column("id", sa.BigInteger(), primary_key=True),
+            sa.Column("entity", sa.String(), nullable=False),
+            sa.Column("entity_id", sa.Integer(), nullable=False),
+            sa.Column("standard", sa.Integer(), nullable=False),
+            sa.Column("subject", sa.String(), nullable=False),
+            sa.Column("chapter", sa.String(), nullable=False),
+            sa.Column("syllabus", sa.String(), nullable=True),
+            sa.Column("quiz_id", sa.Integer(), nullable=True),
+            sa.Column("title", sa.Text(), nullable=False),
+            sa.Column("body", sa.Text(), nullable=True),
+            sa.Column("document", postgresql.TSVECTOR(), sa.Computed(SEARCH_DOCUMENT_SQL, persisted=True)),
+            sa.UniqueConstraint("entity", "entity_id", name="unique_search_document"),
+        )
+        op.create_index("ix_searchdocuments_document", "SearchDocuments", ["document"], postgresql_using="gin")
+        op.create_index("ix_searchdocuments_standard_subject", "SearchDocuments", ["standard", "subject"])
+
+    # Seed from what's already there, so the first /sync and /search see all content.
+    # PPT slide text is filled in by the preview worker as decks are processed.
+    bind = op.get_bind()
+    if offline or bind.execute(sa.text('SELECT NOT EXISTS (SELECT 1 FROM "ChangeLog")')).scalar():
+        op.execute(BACKFILL_CHANGE_LOG)
+    if offline or bind.execute(sa.text('SELECT NOT EXISTS (SELECT 1 FROM "SearchDocuments")')).scalar():
+        op.execute(BACKFILL_SEARCH)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("SearchDocuments")
+    op.drop_table("PPTPreviews")
+    op.drop_table("ChangeLog")
+    op.drop_table("ContentVersions")
+    op.drop_index("ix_PPTs_content_hash", table_name="PPTs")
+    op.drop_column("PPTs", "content_hash")
+    op.drop_constraint("unique_client_attempt_per_student", "QuizAttempts", type_="unique")
+    op.drop_column("QuizAttempts", "client_attempt_id")
+    op.drop_column("QuizAttempts", "completed_at")
@@ -0,0 +1,68 @@
+"""Indexes for the hot lookups; drop the duplicate primary-key indexes
+
+Revision ID: 0003_lookup_indexes
+Revises: 0002_content_tracking
+Create Date: 2026-10-18 00:00:02
+
+Built CONCURRENTLY so upgrading a live database doesn't block writes. Lookups
+already served by a unique constraint's index need nothing new:
+PPTs(subject, standard, chapter), Quizzes(chapter_id, quiz_name),
+QuizQuestions(quiz_id, question_number), StudentAnswers(attempt_id, question_id)
+and Subjects(name).
+
+Columns declared with primary_key=True, index=True got a second btree next to
+the primary key's own, which only slowed down inserts; those are dropped.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0003_lookup_indexes"
+down_revision: Union[str, Sequence[str], None] = "0002_content_tracking"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# name -> (table, columns)
+INDEXES = {
+    # list_courses, content packs: WHERE standard = ?; add_course: name + standard
+    "ix_subjects_standard_name": ("Subjects", ["standard", "name"]),
+    # add_chapter, create_quiz: WHERE subject_id = ? AND name = ?; list_chapters: WHERE subject_id = ?
+    "ix_chapters_subject_id_name": ("Chapters", ["subject_id", "name"]),
+    # content packs: WHERE standard = ? AND syllabus = ?
+    "ix_ppts_standard_syllabus": ("PPTs", ["standard", "syllabus"]),
+    # a student's attempts at a quiz
+    "ix_quizattempts_student_id_quiz_id": ("QuizAttempts", ["student_id", "quiz_id"]),
+    # per-quiz reporting, and deleting a quiz's attempts
+    "ix_quizattempts_quiz_id": ("QuizAttempts", ["quiz_id"]),
+    # per-question reporting, and deleting a question's answers
+    "ix_studentanswers_question_id": ("StudentAnswers", ["question_id"]),
+}
+
+REDUNDANT_PK_INDEXES = {
+    "ix_PPTs_id": "PPTs",
+    "ix_Quizzes_id": "Quizzes",
+    "ix_QuizQuestions_id": "QuizQuestions",
+    "ix_QuizAttempts_id": "QuizAttempts",
+    "ix_StudentAnswers_id": "StudentAnswers",
+    "ix_ChangeLog_id": "ChangeLog",
+}
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.get_context().autocommit_block():
+        for name, (table, columns) in INDEXES.items():
+            op.create_index(name, table, columns, postgresql_concurrently=True, if_not_exists=True)
+        for name, table in REDUNDANT_PK_INDEXES.items():
+            op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        for name, table in REDUNDANT_PK_INDEXES.items():
+            op.create_index(name, table, ["id"], postgresql_concurrently=True, if_not_exists=True)
+        for name, (table, _) in INDEXES.items():
+            op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
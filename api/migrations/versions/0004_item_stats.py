@@ -0,0 +1,73 @@
+"""Running per-question and per-quiz sums for item analysis
+
+Revision ID: 0004_item_stats
+Revises: 0003_lookup_indexes
+Create Date: 2026-10-18 00:00:03
+
+Seeded from the attempts already completed. Attempts completed by servers
+still running the previous release after this runs aren't counted, so run it
+as part of the deploy.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0004_item_stats"
+down_revision: Union[str, Sequence[str], None] = "0003_lookup_indexes"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+OPTIONS = ("a", "b", "c", "d")
+
+BACKFILL_QUESTION_STATS = """
+INSERT INTO "QuestionStats" (question_id, quiz_id, {chose}, {score_sums}, score_sq_sum)
+SELECT sa.question_id, qa.quiz_id, {chose_values}, {score_sum_values}, sum(qa.score * qa.score)
+FROM "StudentAnswers" sa JOIN "QuizAttempts" qa ON sa.attempt_id = qa.id
+WHERE qa.is_completed AND qa.score IS NOT NULL
+GROUP BY sa.question_id, qa.quiz_id
+""".format(
+    chose=", ".join(f"chose_{option}" for option in OPTIONS),
+    score_sums=", ".join(f"score_sum_{option}" for option in OPTIONS),
+    chose_values=", ".join(f"count(*) FILTER (WHERE sa.selected_option = '{option.upper()}')" for option in OPTIONS),
+    score_sum_values=", ".join(f"coalesce(sum(qa.score) FILTER (WHERE sa.selected_option = '{option.upper()}'), 0)" for option in OPTIONS),
+)
+
+BACKFILL_QUIZ_STATS = """
+INSERT INTO "QuizStats" (quiz_id, attempts, score_sum, score_sq_sum)
+SELECT quiz_id, count(*), sum(score), sum(score * score)
+FROM "QuizAttempts"
+WHERE is_completed AND score IS NOT NULL
+GROUP BY quiz_id
+"""
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "QuestionStats",
+        sa.Column("question_id", sa.Integer(), sa.ForeignKey("QuizQuestions.id"), primary_key=True),
+        sa.Column("quiz_id", sa.Integer(), sa.ForeignKey("Quizzes.id"), nullable=False),
+        *[sa.Column(f"chose_{option}", sa.Integer(), nullable=False) for option in OPTIONS],
+        *[sa.Column(f"score_sum_{option}", sa.BigInteger(), nullable=False) for option in OPTIONS],
+        sa.Column("score_sq_sum", sa.BigInteger(), nullable=False),
+    )
+    op.create_index("ix_questionstats_quiz_id", "QuestionStats", ["quiz_id"])
+    op.create_table(
+        "QuizStats",
+        sa.Column("quiz_id", sa.Integer(), sa.ForeignKey("Quizzes.id"), primary_key=True),
+        sa.Column("attempts", sa.Integer(), nullable=False),
+        sa.Column("score_sum", sa.BigInteger(), nullable=False),
+        sa.Column("score_sq_sum", sa.BigInteger(), nullable=False),
+    )
+    op.execute(BACKFILL_QUESTION_STATS)
+    op.execute(BACKFILL_QUIZ_STATS)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("QuizStats")
+    op.drop_index("ix_questionstats_quiz_id", table_name="QuestionStats")
+    op.drop_table("QuestionStats")
@@ -0,0 +1,94 @@
+"""Per-student progress by chapter and subject
+
+Revision ID: 0005_student_progress
+Revises: 0004_item_stats
+Create Date: 2026-10-18 00:00:04
+
+Backfilled from the attempts already completed with the SQL of
+api.progress.rebuild_progress as it was when this was written (mastery weight
+0.3), copied so later changes to the app don't change this revision. As with
+0004, attempts completed by servers still running the previous release after
+this runs aren't counted.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0005_student_progress"
+down_revision: Union[str, Sequence[str], None] = "0004_item_stats"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# The weighted average in closed form: counting back from the newest attempt
+# (age 1), each gets w * (1 - w)^(age - 1), and the oldest keeps (1 - w)^(n - 1)
+# because it started the average off on its own.
+BACKFILL_CHAPTERS = """
+INSERT INTO "StudentChapterProgress" (student_id, chapter_id, attempts, best_percent, last_percent, mastery, last_attempt_at)
+WITH scored AS (
+    SELECT qa.student_id, c.id AS chapter_id, qa.completed_at,
+           CASE WHEN qa.total_questions > 0 THEN 100.0 * qa.score / qa.total_questions ELSE 0 END::float AS percent,
+           row_number() OVER (PARTITION BY qa.student_id, c.id ORDER BY qa.completed_at DESC NULLS LAST, qa.id DESC) AS age,
+           count(*) OVER (PARTITION BY qa.student_id, c.id) AS n
+    FROM "QuizAttempts" qa
+    JOIN "Quizzes" q ON qa.quiz_id = q.id
+    JOIN "Chapters" c ON q.chapter_id = c.id
+    WHERE qa.is_completed AND qa.score IS NOT NULL
+)
+SELECT student_id, chapter_id, count(*), max(percent), max(percent) FILTER (WHERE age = 1),
+       sum(percent * CASE WHEN age = n THEN power(1 - 0.3, n - 1) ELSE 0.3 * power(1 - 0.3, age - 1) END),
+       max(completed_at)
+FROM scored
+GROUP BY student_id, chapter_id
+"""
+
+BACKFILL_SUBJECTS = """
+INSERT INTO "StudentSubjectProgress" (student_id, subject_id, attempts, best_percent, last_percent, mastery, last_attempt_at)
+WITH scored AS (
+    SELECT qa.student_id, c.subject_id AS subject_id, qa.completed_at,
+           CASE WHEN qa.total_questions > 0 THEN 100.0 * qa.score / qa.total_questions ELSE 0 END::float AS percent,
+           row_number() OVER (PARTITION BY qa.student_id, c.subject_id ORDER BY qa.completed_at DESC NULLS LAST, qa.id DESC) AS age,
+           count(*) OVER (PARTITION BY qa.student_id, c.subject_id) AS n
+    FROM "QuizAttempts" qa
+    JOIN "Quizzes" q ON qa.quiz_id = q.id
+    JOIN "Chapters" c ON q.chapter_id = c.id
+    WHERE qa.is_completed AND qa.score IS NOT NULL
+)
+SELECT student_id, subject_id, count(*), max(percent), max(percent) FILTER (WHERE age = 1),
+       sum(percent * CASE WHEN age = n THEN power(1 - 0.3, n - 1) ELSE 0.3 * power(1 - 0.3, age - 1) END),
+       max(completed_at)
+FROM scored
+GROUP BY student_id, subject_id
+"""
+
+PROGRESS_TABLES = [
+    ("StudentChapterProgress", "chapter_id", "Chapters.id"),
+    ("StudentSubjectProgress", "subject_id", "Subjects.id"),
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for table, key, target in PROGRESS_TABLES:
+        op.create_table(
+            table,
+            sa.Column("student_id", sa.Integer(), sa.ForeignKey("Students.id"), primary_key=True),
+            sa.Column(key, sa.Integer(), sa.ForeignKey(target), primary_key=True),
+            sa.Column("attempts", sa.Integer(), nullable=False),
+            sa.Column("best_percent", sa.Float(), nullable=False),
+            sa.Column("last_percent", sa.Float(), nullable=False),
+            sa.Column("mastery", sa.Float(), nullable=False),
+            sa.Column("last_attempt_at", sa.DateTime(timezone=True), nullable=True),
+        )
+        op.create_index(f"ix_{table.lower()}_{key}", table, [key])
+    op.execute(BACKFILL_CHAPTERS)
+    op.execute(BACKFILL_SUBJECTS)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table, key, _ in reversed(PROGRESS_TABLES):
+        op.drop_index(f"ix_{table.lower()}_{key}", table_name=table)
+        op.drop_table(table)
@@ -0,0 +1,60 @@
+"""Class-wide progress totals per chapter and subject
+
+Revision ID: 0006_class_stats
+Revises: 0005_student_progress
+Create Date: 2026-10-18 00:00:05
+
+Seeded from the per-student progress rows, which 0005 backfilled, with the SQL
+api.progress.rebuild_progress used when this was written.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0006_class_stats"
+down_revision: Union[str, Sequence[str], None] = "0005_student_progress"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BACKFILL_CHAPTERS = """
+INSERT INTO "ChapterStats" (chapter_id, students, attempts, best_percent_sum, mastery_sum)
+SELECT chapter_id, count(*), sum(attempts), sum(best_percent), sum(mastery)
+FROM "StudentChapterProgress"
+GROUP BY chapter_id
+"""
+
+BACKFILL_SUBJECTS = """
+INSERT INTO "SubjectStats" (subject_id, students, attempts, best_percent_sum, mastery_sum)
+SELECT subject_id, count(*), sum(attempts), sum(best_percent), sum(mastery)
+FROM "StudentSubjectProgress"
+GROUP BY subject_id
+"""
+
+STATS_TABLES = [
+    ("ChapterStats", "chapter_id", "Chapters.id"),
+    ("SubjectStats", "subject_id", "Subjects.id"),
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for table, key, target in STATS_TABLES:
+        op.create_table(
+            table,
+            sa.Column(key, sa.Integer(), sa.ForeignKey(target), primary_key=True),
+            sa.Column("students", sa.Integer(), nullable=False),
+            sa.Column("attempts", sa.Integer(), nullable=False),
+            sa.Column("best_percent_sum", sa.Float(), nullable=False),
+            sa.Column("mastery_sum", sa.Float(), nullable=False),
+        )
+    op.execute(BACKFILL_CHAPTERS)
+    op.execute(BACKFILL_SUBJECTS)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table, _, _ in reversed(STATS_TABLES):
+        op.drop_table(table)
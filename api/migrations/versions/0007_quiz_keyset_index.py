@@ -0,0 +1,34 @@
+"""Index for paging through a subject's quizzes by id
+
+Revision ID: 0007_quiz_keyset_index
+Revises: 0006_class_stats
+Create Date: 2026-10-18 00:00:06
+
+Built CONCURRENTLY, like 0003, so upgrading a live database doesn't block writes.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0007_quiz_keyset_index"
+down_revision: Union[str, Sequence[str], None] = "0006_class_stats"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.get_context().autocommit_block():
+        # /quizzes/by-subject pages: WHERE chapter_id = ? AND id > ? ORDER BY id
+        op.create_index(
+            "ix_quizzes_chapter_id_id", "Quizzes", ["chapter_id", "id"],
+            postgresql_concurrently=True, if_not_exists=True
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index("ix_quizzes_chapter_id_id", table_name="Quizzes", postgresql_concurrently=True, if_exists=True)
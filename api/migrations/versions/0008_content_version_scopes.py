@@ -0,0 +1,32 @@
+"""Drop content versions stored under the old subject: scopes
+
+Revision ID: 0008_content_version_scopes
+Revises: 0007_quiz_keyset_index
+Create Date: 2026-10-18 00:00:07
+
+Chapter and quiz versions were both kept under "subject:...", so a subject
+named like "Maths:9" shared a row with Maths' class 9 quizzes. They now live
+under "chapters:" and "quizzes:". The old rows can't be told apart, and the
+scope is part of every ETag, so they're dropped and the new scopes start over.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0008_content_version_scopes"
+down_revision: Union[str, Sequence[str], None] = "0007_quiz_keyset_index"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute("""DELETE FROM "ContentVersions" WHERE scope LIKE 'subject:%'""")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # The dropped versions can't be restored; rows under the new scopes are just unused by older code
+    pass
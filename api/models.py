@@ -1,6 +1,7 @@
-from sqlalchemy import Column, Integer, String, Float, ForeignKey, UniqueConstraint, Boolean, Text
+from sqlalchemy import Column, Integer, BigInteger, String, Float, ForeignKey, UniqueConstraint, Boolean, Text, DateTime, Index, JSON, Computed, func
 from sqlalchemy.orm import relationship
 from sqlalchemy import Enum as SQLAlchemyEnum
+from sqlalchemy.dialects.postgresql import TSVECTOR
 from .database import Base
 from .schemas import RoleEnum
 
@@ -29,6 +30,7 @@ class Teacher(Base):
 
 class Subject(Base):
     __tablename__ = "Subjects"
+    __table_args__ = (Index('ix_subjects_standard_name', 'standard', 'name'),)
 
     id = Column(Integer, primary_key=True, index=False)
     name = Column(String, unique=True, nullable=False)
@@ -38,6 +40,7 @@ class Subject(Base):
 
 class Chapter(Base):
     __tablename__ = "Chapters"
+    __table_args__ = (Index('ix_chapters_subject_id_name', 'subject_id', 'name'),)
 
     id = Column(Integer, primary_key=True, index=False)
     name = Column(String, nullable=False)
@@ -48,9 +51,12 @@ class Chapter(Base):
 
 class PPT(Base):
     __tablename__ = "PPTs"
-    __table_args__ = (UniqueConstraint('subject', 'standard', 'chapter', name='unique_ppt_per_chapter'),)
+    __table_args__ = (
+        UniqueConstraint('subject', 'standard', 'chapter', name='unique_ppt_per_chapter'),
+        Index('ix_ppts_standard_syllabus', 'standard', 'syllabus'),
+    )
 
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True, index=False)
     subject = Column(String, nullable=False)
     standard = Column(Integer, nullable=False)
     chapter = Column(String, nullable=False)
@@ -58,15 +64,32 @@ class PPT(Base):
     file_url = Column(String, nullable=False)
     filename = Column(String, nullable=False)
     file_path = Column(String, nullable=False)  # full path in storage
+    content_hash = Column(String, index=True)  # sha256 of the file; NULL for files stored before dedup
+
+
+class PPTPreview(Base):
+    """Slide outline and thumbnails of a stored PPT file, shared by every PPT with the same content"""
+    __tablename__ = "PPTPreviews"
+
+    content_hash = Column(String, primary_key=True)
+    status = Column(String, nullable=False)  # ready, unsupported or failed
+    slide_count = Column(Integer, nullable=False, default=0)
+    thumbnail_count = Column(Integer, nullable=False, default=0)
+    slides = Column(JSON)  # [{"number", "title", "text": [...]}]
+    error = Column(String)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
 
 
 # Quiz System Models
 
 class Quiz(Base):
     __tablename__ = "Quizzes"
-    __table_args__ = (UniqueConstraint('chapter_id', 'quiz_name', name='unique_quiz_per_chapter'),)
+    __table_args__ = (
+        UniqueConstraint('chapter_id', 'quiz_name', name='unique_quiz_per_chapter'),
+        Index('ix_quizzes_chapter_id_id', 'chapter_id', 'id'),
+    )
 
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True, index=False)
     quiz_name = Column(String, nullable=False)  # e.g., "Algebra Quiz 1"
     description = Column(Text, nullable=True)   # Optional quiz description
     chapter_id = Column(Integer, ForeignKey("Chapters.id"), nullable=False)
@@ -74,14 +97,15 @@ class Quiz(Base):
 
     # Relationships
     chapter = relationship("Chapter", back_populates="quizzes")
-    questions = relationship("QuizQuestion", back_populates="quiz", cascade="all, delete-orphan")
+    questions = relationship("QuizQuestion", back_populates="quiz", cascade="all, delete-orphan",
+                             order_by="QuizQuestion.question_number")
     attempts = relationship("QuizAttempt", back_populates="quiz", cascade="all, delete-orphan")
 
 
 class QuizQuestion(Base):
     __tablename__ = "QuizQuestions"
 
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True, index=False)
     quiz_id = Column(Integer, ForeignKey("Quizzes.id"), nullable=False)
     question_number = Column(Integer, nullable=False)  # 1 to 20
     question_text = Column(Text, nullable=False)
@@ -101,13 +125,20 @@ class QuizQuestion(Base):
 
 class QuizAttempt(Base):
     __tablename__ = "QuizAttempts"
+    __table_args__ = (
+        UniqueConstraint('student_id', 'client_attempt_id', name='unique_client_attempt_per_student'),
+        Index('ix_quizattempts_student_id_quiz_id', 'student_id', 'quiz_id'),
+        Index('ix_quizattempts_quiz_id', 'quiz_id'),
+    )
 
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True, index=False)
     student_id = Column(Integer, ForeignKey("Students.id"), nullable=False)
     quiz_id = Column(Integer, ForeignKey("Quizzes.id"), nullable=False)
     score = Column(Integer, nullable=True)  # Out of total questions (calculated after completion)
     total_questions = Column(Integer, default=20, nullable=False)
     is_completed = Column(Boolean, default=False, nullable=False)
+    completed_at = Column(DateTime(timezone=True), nullable=True)  # Set when the attempt is graded
+    client_attempt_id = Column(String, nullable=True)  # Idempotency key from the device for offline-queued attempts
 
     # Relationships
     student = relationship("Student", back_populates="quiz_attempts")
@@ -118,7 +149,7 @@ class QuizAttempt(Base):
 class StudentAnswer(Base):
     __tablename__ = "StudentAnswers"
 
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True, index=False)
     attempt_id = Column(Integer, ForeignKey("QuizAttempts.id"), nullable=False)
     question_id = Column(Integer, ForeignKey("QuizQuestions.id"), nullable=False)
     selected_option = Column(String, nullable=False)  # 'A', 'B', 'C', or 'D'
@@ -128,4 +159,140 @@ class StudentAnswer(Base):
     attempt = relationship("QuizAttempt", back_populates="answers")
     question = relationship("QuizQuestion", back_populates="student_answers")
 
-    __table_args__ = (UniqueConstraint('attempt_id', 'question_id', name='unique_answer_per_question_per_attempt'),)
+    __table_args__ = (
+        UniqueConstraint('attempt_id', 'question_id', name='unique_answer_per_question_per_attempt'),
+        Index('ix_studentanswers_question_id', 'question_id'),
+    )
+
+
+class ContentVersion(Base):
+    __tablename__ = "ContentVersions"
+
+    scope = Column(String, primary_key=True)  # e.g. "standard:9", "chapters:Maths", "quizzes:Maths:9"
+    version = Column(Integer, default=0, nullable=False)  # Bumped on every write to the scope
+
+
+
+class ChangeLog(Base):
+    __tablename__ = "ChangeLog"
+    __table_args__ = (Index('ix_changelog_standard_id', 'standard', 'id'),)
+
+    id = Column(BigInteger, primary_key=True)  # Monotonic revision, used as the sync cursor
+    entity = Column(String, nullable=False)  # subject, chapter, quiz, quiz_question or ppt
+    entity_id = Column(Integer, nullable=False)
+    operation = Column(String, nullable=False)  # upsert or delete
+    standard = Column(Integer, nullable=True)  # Lets clients sync only their own class
+    changed_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+
+class SearchDocument(Base):
+    """One searchable row per chapter, quiz, quiz question and PPT, kept in step by record_changes"""
+    __tablename__ = "SearchDocuments"
+    __table_args__ = (
+        UniqueConstraint('entity', 'entity_id', name='unique_search_document'),
+        Index('ix_searchdocuments_document', 'document', postgresql_using='gin'),
+        Index('ix_searchdocuments_standard_subject', 'standard', 'subject'),
+    )
+
+    id = Column(BigInteger, primary_key=True)
+    entity = Column(String, nullable=False)  # chapter, quiz, quiz_question or ppt
+    entity_id = Column(Integer, nullable=False)
+    standard = Column(Integer, nullable=False)
+    subject = Column(String, nullable=False)
+    chapter = Column(String, nullable=False)
+    syllabus = Column(String, nullable=True)  # only PPTs belong to a board
+    quiz_id = Column(Integer, nullable=True)  # for quizzes and their questions
+    title = Column(Text, nullable=False)
+    body = Column(Text, nullable=True)
+    # Titles rank above body text; 'english' stems English and passes other scripts through as-is
+    document = Column(TSVECTOR, Computed(
+        "setweight(to_tsvector('english', coalesce(title, '')), 'A') || "
+        "setweight(to_tsvector('english', coalesce(body, '')), 'B')",
+        persisted=True
+    ))
+
+
+class QuestionStats(Base):
+    """Running sums for item analysis, one row per question, updated as attempts complete.
+
+    Counts and score sums are kept per chosen option (the score being the whole
+    attempt's), which is enough to derive difficulty, point-biserial
+    discrimination and how each distractor behaves without rereading answers.
+    """
+    __tablename__ = "QuestionStats"
+    __table_args__ = (Index('ix_questionstats_quiz_id', 'quiz_id'),)
+
+    question_id = Column(Integer, ForeignKey("QuizQuestions.id"), primary_key=True)
+    quiz_id = Column(Integer, ForeignKey("Quizzes.id"), nullable=False)
+    chose_a = Column(Integer, default=0, nullable=False)
+    chose_b = Column(Integer, default=0, nullable=False)
+    chose_c = Column(Integer, default=0, nullable=False)
+    chose_d = Column(Integer, default=0, nullable=False)
+    score_sum_a = Column(BigInteger, default=0, nullable=False)  # Sum of attempt scores of students who chose A
+    score_sum_b = Column(BigInteger, default=0, nullable=False)
+    score_sum_c = Column(BigInteger, default=0, nullable=False)
+    score_sum_d = Column(BigInteger, default=0, nullable=False)
+    score_sq_sum = Column(BigInteger, default=0, nullable=False)  # Sum of squared attempt scores over all answers
+
+
+class QuizStats(Base):
+    __tablename__ = "QuizStats"
+
+    quiz_id = Column(Integer, ForeignKey("Quizzes.id"), primary_key=True)
+    attempts = Column(Integer, default=0, nullable=False)  # Completed attempts
+    score_sum = Column(BigInteger, default=0, nullable=False)
+    score_sq_sum = Column(BigInteger, default=0, nullable=False)
+
+
+class StudentChapterProgress(Base):
+    """A student's running progress in one chapter, updated in the transaction that completes each attempt.
+
+    Percentages are score / total_questions of an attempt; mastery is a
+    recency-weighted average of them (see progress.MASTERY_WEIGHT).
+    """
+    __tablename__ = "StudentChapterProgress"
+    __table_args__ = (Index('ix_studentchapterprogress_chapter_id', 'chapter_id'),)
+
+    student_id = Column(Integer, ForeignKey("Students.id"), primary_key=True)
+    chapter_id = Column(Integer, ForeignKey("Chapters.id"), primary_key=True)
+    attempts = Column(Integer, default=0, nullable=False)  # Completed attempts at any quiz in the chapter
+    best_percent = Column(Float, nullable=False)
+    last_percent = Column(Float, nullable=False)
+    mastery = Column(Float, nullable=False)
+    last_attempt_at = Column(DateTime(timezone=True), nullable=True)
+
+
+class StudentSubjectProgress(Base):
+    """The same as StudentChapterProgress across every chapter of a subject"""
+    __tablename__ = "StudentSubjectProgress"
+    __table_args__ = (Index('ix_studentsubjectprogress_subject_id', 'subject_id'),)
+
+    student_id = Column(Integer, ForeignKey("Students.id"), primary_key=True)
+    subject_id = Column(Integer, ForeignKey("Subjects.id"), primary_key=True)
+    attempts = Column(Integer, default=0, nullable=False)
+    best_percent = Column(Float, nullable=False)
+    last_percent = Column(Float, nullable=False)
+    mastery = Column(Float, nullable=False)
+    last_attempt_at = Column(DateTime(timezone=True), nullable=True)
+
+
+class ChapterStats(Base):
+    """Class-wide totals of StudentChapterProgress, kept in step with it, for teacher reports"""
+    __tablename__ = "ChapterStats"
+
+    chapter_id = Column(Integer, ForeignKey("Chapters.id"), primary_key=True)
+    students = Column(Integer, default=0, nullable=False)  # Students with at least one completed attempt
+    attempts = Column(Integer, default=0, nullable=False)
+    best_percent_sum = Column(Float, default=0, nullable=False)
+    mastery_sum = Column(Float, default=0, nullable=False)
+
+
+class SubjectStats(Base):
+    """Class-wide totals of StudentSubjectProgress"""
+    __tablename__ = "SubjectStats"
+
+    subject_id = Column(Integer, ForeignKey("Subjects.id"), primary_key=True)
+    students = Column(Integer, default=0, nullable=False)
+    attempts = Column(Integer, default=0, nullable=False)
+    best_percent_sum = Column(Float, default=0, nullable=False)
+    mastery_sum = Column(Float, default=0, nullable=False)
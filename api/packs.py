@@ -0,0 +1,189 @@
+import gzip
+import json
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, UTC
+from threading import Lock
+from typing import Optional
+from sqlalchemy import func
+from sqlalchemy.orm import Session, selectinload
+from .config import CONTENT_PACK_DIR, SYLLABI
+from .database import SessionLocal
+from .schemas import SyncSubject, SyncChapter, SyncPPT, QuizResponse, QuizQuestionResponse
+from .versioning import quizzes_scope
+from . import models
+
+try:
+    import brotli
+except ImportError:  # Packs are still served gzip-compressed without it
+    brotli = None
+
+# Accept-Encoding token -> file suffix, in order of preference
+PACK_ENCODINGS = {"br": ".br", "gzip": ".gz"}
+
+# One background builder per worker; rebuild requests for a pack that is
+# already queued are coalesced into the queued build.
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="content-pack")
+_pending = set()
+_pending_lock = Lock()
+
+# Built quiz sections per subject, keyed by subject id and reused across
+# rebuilds until the subject's quiz content version moves.
+_quiz_sections = {}
+_quiz_sections_lock = Lock()
+
+def pack_version(db: Session, standard: int) -> int:
+    """Latest change-log revision touching the standard"""
+    version = db.query(func.max(models.ChangeLog.id)).filter(models.ChangeLog.standard == standard).scalar()
+    return version or 0
+
+def pack_path(syllabus: str, standard: int, version: int) -> str:
+    return os.path.join(CONTENT_PACK_DIR, f"{syllabus}_{standard}_{version}.json")
+
+def find_latest_pack(syllabus: str, standard: int) -> Optional[int]:
+    """Newest version of the pack already on disk, if any"""
+    prefix = f"{syllabus}_{standard}_"
+    try:
+        names = os.listdir(CONTENT_PACK_DIR)
+    except FileNotFoundError:
+        return None
+    versions = [
+        int(name[len(prefix):-len(".json")])
+        for name in names
+        if name.startswith(prefix) and name.endswith(".json") and name[len(prefix):-len(".json")].isdigit()
+    ]
+    return max(versions, default=None)
+
+def _quiz_section(quiz, questions) -> dict:
+    return QuizResponse(
+        id=quiz.id,
+        quiz_name=quiz.quiz_name,
+        description=quiz.description,
+        chapter_id=quiz.chapter_id,
+        is_active=quiz.is_active,
+        questions=[QuizQuestionResponse.model_validate(question, from_attributes=True) for question in questions]
+    ).model_dump()
+
+def _load_quiz_sections(db: Session, subjects) -> list:
+    scopes = {subject.id: quizzes_scope(subject.name, subject.standard) for subject in subjects}
+    versions = dict(db.query(models.ContentVersion.scope, models.ContentVersion.version).filter(
+        models.ContentVersion.scope.in_(scopes.values())
+    ).all())
+
+    with _quiz_sections_lock:
+        cached = {subject_id: _quiz_sections.get(subject_id) for subject_id in scopes}
+    stale = [
+        subject_id for subject_id, scope in scopes.items()
+        if cached[subject_id] is None or cached[subject_id][0] != versions.get(scope, 0)
+    ]
+
+    if stale:
+        rows = db.query(models.Quiz, models.Chapter.subject_id).join(
+            models.Chapter, models.Quiz.chapter_id == models.Chapter.id
+        ).filter(
+            models.Chapter.subject_id.in_(stale),
+            models.Quiz.is_active == True
+        ).options(
+            selectinload(models.Quiz.questions)
+        ).order_by(models.Quiz.id).all()
+
+        rebuilt = {subject_id: [] for subject_id in stale}
+        for quiz, subject_id in rows:
+            rebuilt[subject_id].append(_quiz_section(quiz, quiz.questions))
+
+        with _quiz_sections_lock:
+            for subject_id, section in rebuilt.items():
+                entry = (versions.get(scopes[subject_id], 0), section)
+                _quiz_sections[subject_id] = entry
+                cached[subject_id] = entry
+
+    return [quiz for subject in subjects for quiz in cached[subject.id][1]]
+
+def _write_atomic(path: str, data: bytes):
+    fd, tmp_path = tempfile.mkstemp(dir=CONTENT_PACK_DIR, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as tmp:
+            tmp.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+def build_pack(db: Session, syllabus: str, standard: int) -> int:
+    """Write the pack for the standard's current version if it isn't on disk yet"""
+    version = pack_version(db, standard)
+    path = pack_path(syllabus, standard, version)
+    if os.path.exists(path):
+        return version
+
+    subjects = db.query(models.Subject).filter(models.Subject.standard == standard).order_by(models.Subject.id).all()
+    chapters = db.query(models.Chapter).join(
+        models.Subject, models.Chapter.subject_id == models.Subject.id
+    ).filter(models.Subject.standard == standard).order_by(models.Chapter.id).all()
+    ppts = db.query(models.PPT).filter(
+        func.lower(models.PPT.syllabus) == syllabus,
+        models.PPT.standard == standard
+    ).order_by(models.PPT.id).all()
+
+    pack = {
+        "syllabus": syllabus,
+        "standard": standard,
+        "version": version,
+        "generated_at": datetime.now(UTC).isoformat(),
+        "courses": [SyncSubject.model_validate(subject, from_attributes=True).model_dump() for subject in subjects],
+        "chapters": [SyncChapter.model_validate(chapter, from_attributes=True).model_dump() for chapter in chapters],
+        "quizzes": _load_quiz_sections(db, subjects),
+        "ppts": [SyncPPT.model_validate(ppt, from_attributes=True).model_dump() for ppt in ppts],
+    }
+    data = json.dumps(pack, ensure_ascii=False, separators=(",", ":")).encode()
+
+    os.makedirs(CONTENT_PACK_DIR, exist_ok=True)
+    # Compressed variants go first so the plain .json marks a complete pack
+    _write_atomic(path + PACK_ENCODINGS["gzip"], gzip.compress(data, compresslevel=9))
+    if brotli is not None:
+        _write_atomic(path + PACK_ENCODINGS["br"], brotli.compress(data, quality=11))
+    _write_atomic(path, data)
+
+    _remove_old_packs(syllabus, standard, version)
+    print(f"📦 Built content pack {syllabus}/class_{standard} v{version} ({len(data)} bytes)")
+    return version
+
+def _remove_old_packs(syllabus: str, standard: int, version: int):
+    # The previous version is kept so in-flight downloads of it can finish
+    prefix = f"{syllabus}_{standard}_"
+    versions = set()
+    for name in os.listdir(CONTENT_PACK_DIR):
+        number = name[len(prefix):].split(".", 1)[0]
+        if name.startswith(prefix) and number.isdigit():
+            versions.add(int(number))
+    for old_version in sorted(versions)[:-2]:
+        if old_version == version:
+            continue
+        for suffix in ["", *PACK_ENCODINGS.values()]:
+            try:
+                os.unlink(pack_path(syllabus, standard, old_version) + suffix)
+            except FileNotFoundError:
+                pass
+
+def _rebuild_pack(syllabus: str, standard: int):
+    with _pending_lock:
+        _pending.discard((syllabus, standard))
+    db = SessionLocal()
+    try:
+        build_pack(db, syllabus, standard)
+    except Exception as e:
+        print(f"❌ Failed to build content pack {syllabus}/class_{standard}: {e}")
+    finally:
+        db.close()
+
+def schedule_pack_rebuild(standard: int, syllabus: Optional[str] = None):
+    """Queue a background rebuild of the standard's packs (all boards unless one is given)"""
+    for name in ([syllabus.lower()] if syllabus else SYLLABI):
+        if name not in SYLLABI:
+            continue
+        with _pending_lock:
+            if (name, standard) in _pending:
+                continue
+            _pending.add((name, standard))
+        _executor.submit(_rebuild_pack, name, standard)
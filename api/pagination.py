@@ -0,0 +1,53 @@
+import base64
+import binascii
+from typing import Optional, Sequence
+from fastapi import HTTPException, status
+from .config import LIST_PAGE_SIZE
+
+# List endpoints page by id: the cursor is the last id returned, sent back as
+# ?cursor=... to get the rows after it. It comes out in this header so the body
+# keeps the shape it has always had.
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+def encode_cursor(position: int) -> str:
+    return base64.urlsafe_b64encode(f"v1:{position}".encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: Optional[str], what: str = "cursor") -> int:
+    if not cursor:
+        return 0
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        version, position = raw.split(":", 1)
+        if version != "v1":
+            raise ValueError(version)
+        return int(position)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Invalid {what}")
+
+def parse_fields(fields: Optional[str], allowed: Sequence[str]) -> Optional[list]:
+    """The fields named in ?fields=a,b (in `allowed` order, always with id), or None for all of them"""
+    if not fields:
+        return None
+    requested = {name.strip() for name in fields.split(",") if name.strip()}
+    unknown = requested - set(allowed)
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown field(s): {', '.join(sorted(unknown))}. Choose from: {', '.join(allowed)}"
+        )
+    return [name for name in allowed if name in requested or name == "id"]
+
+def next_cursor_headers(rows: list, limit: int) -> dict:
+    """Trim rows (fetched with limit + 1) to the page in place; a cursor header if more follow"""
+    if len(rows) <= limit:
+        return {}
+    del rows[limit:]
+    last = rows[-1]
+    return {NEXT_CURSOR_HEADER: encode_cursor(last["id"] if isinstance(last, dict) else last.id)}
+
+def page_size(limit: Optional[int], cursor: Optional[str]) -> Optional[int]:
+    """Rows per page, or None for an unpaged request (neither ?limit= nor ?cursor=)"""
+    return limit or (LIST_PAGE_SIZE if cursor else None)
+
+def project(rows: list, fields: Optional[list]) -> list:
+    return rows if fields is None else [{name: getattr(row, name) for name in fields} for row in rows]
@@ -0,0 +1,128 @@
+import asyncio
+import multiprocessing
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from threading import Lock
+from typing import Dict
+import anyio
+from sqlalchemy.dialects.postgresql import insert
+from .blobs import content_key, preview_key, lock_content, ref_count
+from .config import PPT_CONTENT_BUCKET, PREVIEW_WORKERS, PREVIEW_SLIDES, PREVIEW_WIDTH, UPLOAD_CHUNK_SIZE
+from .database import AsyncSessionLocal
+from .search_index import index_ppt_content
+from .storage import get_storage
+from . import models
+
+_executor = None
+_lock = Lock()
+# In-flight generations by content hash, so repeated uploads of a deck share one job
+_tasks: Dict[str, asyncio.Task] = {}
+# Bounds how many decks are downloaded to temp files at once
+_slots = asyncio.Semaphore(PREVIEW_WORKERS * 2)
+
+def start_preview_pool():
+    global _executor
+    with _lock:
+        if _executor is None:
+            # spawn, not fork: the server process already has threads and an event loop
+            _executor = ProcessPoolExecutor(max_workers=PREVIEW_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+    return _executor
+
+def _shutdown_pool():
+    global _executor
+    with _lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+def stop_preview_pool():
+    for task in list(_tasks.values()):
+        task.cancel()
+    _shutdown_pool()
+
+async def _download(path: str, size: int) -> str:
+    storage = get_storage()
+    fd, tmp_path = tempfile.mkstemp(suffix=".pptx")
+    os.close(fd)
+    try:
+        async with await anyio.open_file(tmp_path, "wb") as out:
+            for start in range(0, size, UPLOAD_CHUNK_SIZE):
+                await out.write(await storage.read_range(PPT_CONTENT_BUCKET, path, start, min(start + UPLOAD_CHUNK_SIZE, size)))
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    return tmp_path
+
+async def _generate(sha256: str, path: str):
+    async with AsyncSessionLocal() as db:
+        if await db.get(models.PPTPreview, sha256) is not None:
+            return
+
+    # Pulls in Pillow, which only preview work needs
+    from .slides import UnsupportedDeck, extract_preview
+
+    storage = get_storage()
+    async with _slots:
+        stat = await storage.stat(PPT_CONTENT_BUCKET, path)
+        if stat is None:
+            return
+        tmp_path = await _download(path, stat.size)
+        try:
+            preview = await asyncio.get_running_loop().run_in_executor(
+                start_preview_pool(), extract_preview, tmp_path, PREVIEW_SLIDES, PREVIEW_WIDTH
+            )
+            row = {
+                "status": "ready",
+                "slide_count": len(preview.slides),
+                "thumbnail_count": len(preview.thumbnails),
+                "slides": [slide._asdict() for slide in preview.slides],
+            }
+        except UnsupportedDeck as e:
+            preview, row = None, {"status": "unsupported", "error": str(e)}
+        except BrokenProcessPool as e:
+            # A worker died (e.g. killed for memory) on this deck; start a fresh pool for the next one
+            _shutdown_pool()
+            preview, row = None, {"status": "failed", "error": f"Worker crashed: {e}"}
+        except Exception as e:
+            preview, row = None, {"status": "failed", "error": f"{type(e).__name__}: {e}"[:500]}
+        finally:
+            os.unlink(tmp_path)
+
+    if preview is not None:
+        for number, image in enumerate(preview.thumbnails, start=1):
+            await storage.put(PPT_CONTENT_BUCKET, preview_key(sha256, number), image, "image/jpeg")
+
+    async with AsyncSessionLocal() as db:
+        # Same lock as release_content, so a deck deleted meanwhile doesn't get a preview row
+        await lock_content(db, sha256)
+        if await ref_count(db, sha256) == 0:
+            await db.commit()
+            if preview is not None:
+                await storage.remove(PPT_CONTENT_BUCKET, [preview_key(sha256, number) for number in range(1, len(preview.thumbnails) + 1)])
+            return
+        await db.execute(insert(models.PPTPreview).values(content_hash=sha256, **row).on_conflict_do_nothing())
+        if preview is not None:
+            # Slide text becomes searchable for every PPT using this file
+            await db.run_sync(index_ppt_content, sha256)
+        await db.commit()
+    print(f"🖼️ Preview for {sha256[:12]}: {row['status']}")
+
+async def _run(sha256: str, path: str):
+    try:
+        await _generate(sha256, path)
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        # Nothing is stored, so the next request for the preview tries again
+        print(f"❌ Preview for {sha256[:12]} failed: {e}")
+
+def schedule_preview(sha256: str):
+    """Start extracting the deck's slide text and thumbnails unless it's cached or already underway"""
+    task = _tasks.get(sha256)
+    if task is not None and not task.done():
+        return
+    task = asyncio.get_running_loop().create_task(_run(sha256, content_key(sha256)))
+    _tasks[sha256] = task
+    task.add_done_callback(lambda done: _tasks.pop(sha256, None) if _tasks.get(sha256) is done else None)
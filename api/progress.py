@@ -0,0 +1,177 @@
+import argparse
+from datetime import datetime
+from typing import Iterable, List, Optional, Tuple
+from sqlalchemy import func, select, text
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+from .database import SessionLocal
+from .leaderboards import note_progress
+from . import models
+
+# Namespace for the per-student advisory locks (two-key form, like the content locks)
+PROGRESS_LOCK_NAMESPACE = 7307103
+
+# Mastery is an exponentially weighted average of attempt percentages: the newest
+# attempt counts this much and everything before it the rest, so it follows how a
+# student is doing now rather than their whole history. rebuild_progress folds
+# with the same weight; migration 0005 backfilled with 0.3.
+MASTERY_WEIGHT = 0.3
+
+PROGRESS_COLUMNS = ["attempts", "best_percent", "last_percent", "mastery", "last_attempt_at"]
+# ChapterStats and SubjectStats: sums over every student's progress row
+TOTAL_COLUMNS = ["students", "attempts", "best_percent_sum", "mastery_sum"]
+
+def attempt_percent(score: int, total_questions: int) -> float:
+    return 100.0 * score / total_questions if total_questions else 0.0
+
+def fold_attempt(row: Optional[dict], percent: float, completed_at: datetime) -> dict:
+    """A progress row (PROGRESS_COLUMNS) with one more attempt added; row is None for the first"""
+    if row is None:
+        return {"attempts": 1, "best_percent": percent, "last_percent": percent, "mastery": percent, "last_attempt_at": completed_at}
+    return {
+        "attempts": row["attempts"] + 1,
+        "best_percent": max(row["best_percent"], percent),
+        "last_percent": percent,
+        "mastery": MASTERY_WEIGHT * percent + (1 - MASTERY_WEIGHT) * row["mastery"],
+        "last_attempt_at": completed_at,
+    }
+
+def _load(db: Session, model, key: str, student_id: int, ids) -> dict:
+    column = getattr(model, key)
+    rows = db.execute(
+        select(column, *[getattr(model, name) for name in PROGRESS_COLUMNS])
+        .where(model.student_id == student_id, column.in_(ids))
+    ).all()
+    return {row[0]: dict(zip(PROGRESS_COLUMNS, row[1:])) for row in rows}
+
+def _upsert(db: Session, model, key: str, student_id: int, rows: dict):
+    stmt = insert(model).values([{"student_id": student_id, key: row_id, **rows[row_id]} for row_id in sorted(rows)])
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=["student_id", key],
+        set_={name: stmt.excluded[name] for name in PROGRESS_COLUMNS}
+    ))
+
+def _add_totals(db: Session, model, key: str, before: dict, after: dict):
+    # Each changed progress row moves the class totals by its difference
+    rows = []
+    for row_id in sorted(after):
+        old, new = before.get(row_id), after[row_id]
+        rows.append({
+            key: row_id,
+            "students": 0 if old else 1,
+            "attempts": new["attempts"] - (old["attempts"] if old else 0),
+            "best_percent_sum": new["best_percent"] - (old["best_percent"] if old else 0),
+            "mastery_sum": new["mastery"] - (old["mastery"] if old else 0),
+        })
+    stmt = insert(model).values(rows)
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=[key],
+        set_={column: stmt.table.c[column] + stmt.excluded[column] for column in TOTAL_COLUMNS}
+    ))
+
+def record_progress(db: Session, student_id: int, attempts: Iterable[Tuple[object, datetime]]):
+    """Fold completed attempts ((GradedAttempt, completed_at), oldest first) into the
+    student's chapter and subject progress rows, and the class totals, in the caller's transaction"""
+    attempts = list(attempts)
+    if not attempts:
+        return
+    # Mastery depends on order, so two submissions from the same student are applied
+    # one after the other; nobody else ever waits on this lock
+    db.execute(
+        text("SELECT pg_advisory_xact_lock(:namespace, :student_id)"),
+        {"namespace": PROGRESS_LOCK_NAMESPACE, "student_id": student_id}
+    )
+    chapters = _load(db, models.StudentChapterProgress, "chapter_id", student_id, {graded.chapter_id for graded, _ in attempts})
+    subjects = _load(db, models.StudentSubjectProgress, "subject_id", student_id, {graded.subject_id for graded, _ in attempts})
+    chapters_before, subjects_before = dict(chapters), dict(subjects)
+    for graded, completed_at in attempts:
+        percent = attempt_percent(graded.score, graded.total_questions)
+        chapters[graded.chapter_id] = fold_attempt(chapters.get(graded.chapter_id), percent, completed_at)
+        subjects[graded.subject_id] = fold_attempt(subjects.get(graded.subject_id), percent, completed_at)
+    _upsert(db, models.StudentChapterProgress, "chapter_id", student_id, chapters)
+    _upsert(db, models.StudentSubjectProgress, "subject_id", student_id, subjects)
+    # Shared by the whole class, so these rows are locked last and in key order
+    _add_totals(db, models.ChapterStats, "chapter_id", chapters_before, chapters)
+    _add_totals(db, models.SubjectStats, "subject_id", subjects_before, subjects)
+    for subject_id, row in subjects.items():
+        note_progress(db, subject_id, student_id, row)
+
+# progress model, class totals model, their key, and where an attempt's key comes from in _REBUILD_PROGRESS
+REBUILD_TABLES = [
+    (models.StudentChapterProgress, models.ChapterStats, "chapter_id", "c.id"),
+    (models.StudentSubjectProgress, models.SubjectStats, "subject_id", "c.subject_id"),
+]
+
+# fold_attempt in closed form: counting back from the newest attempt (age 1), each
+# gets w * (1 - w)^(age - 1), and the oldest keeps (1 - w)^(n - 1) because it
+# started the average off on its own.
+_REBUILD_PROGRESS = """
+INSERT INTO "{table}" (student_id, {key}, attempts, best_percent, last_percent, mastery, last_attempt_at)
+WITH scored AS (
+    SELECT qa.student_id, {source} AS {key}, qa.completed_at,
+           CASE WHEN qa.total_questions > 0 THEN 100.0 * qa.score / qa.total_questions ELSE 0 END::float AS percent,
+           row_number() OVER (PARTITION BY qa.student_id, {source} ORDER BY qa.completed_at DESC NULLS LAST, qa.id DESC) AS age,
+           count(*) OVER (PARTITION BY qa.student_id, {source}) AS n
+    FROM "QuizAttempts" qa
+    JOIN "Quizzes" q ON qa.quiz_id = q.id
+    JOIN "Chapters" c ON q.chapter_id = c.id
+    WHERE qa.is_completed AND qa.score IS NOT NULL
+)
+SELECT student_id, {key}, count(*), max(percent), max(percent) FILTER (WHERE age = 1),
+       sum(percent * CASE WHEN age = n THEN power(1 - {weight}, n - 1) ELSE {weight} * power(1 - {weight}, age - 1) END),
+       max(completed_at)
+FROM scored
+GROUP BY student_id, {key}
+"""
+
+_REBUILD_TOTALS = """
+INSERT INTO "{table}" ({key}, students, attempts, best_percent_sum, mastery_sum)
+SELECT {key}, count(*), sum(attempts), sum(best_percent), sum(mastery)
+FROM "{source}"
+GROUP BY {key}
+"""
+
+def rebuild_statements(progress: bool = True, totals: bool = True) -> List[str]:
+    """INSERTs that fill the empty progress tables from the completed attempts and/or
+    the class totals from the progress rows"""
+    statements = []
+    if progress:
+        statements += [
+            _REBUILD_PROGRESS.format(table=model.__tablename__, key=key, source=source, weight=MASTERY_WEIGHT)
+            for model, _, key, source in REBUILD_TABLES
+        ]
+    if totals:
+        statements += [
+            _REBUILD_TOTALS.format(table=stats.__tablename__, key=key, source=model.__tablename__)
+            for model, stats, key, _ in REBUILD_TABLES
+        ]
+    return statements
+
+def rebuild_progress(db: Session) -> dict:
+    """Recompute every progress row and the class totals from the completed attempts, in the caller's transaction.
+
+    Repairs drift, e.g. after attempts were edited or deleted by hand. Submissions wait
+    until the caller commits and are then folded into the rebuilt rows. Leaderboards
+    pick the new standings up when they next reload.
+    """
+    # In the order record_progress touches them, so a submission already underway finishes first
+    tables = [model for model, _, _, _ in REBUILD_TABLES] + [stats for _, stats, _, _ in REBUILD_TABLES]
+    names = ", ".join(f'"{model.__tablename__}"' for model in tables)
+    db.execute(text(f"LOCK TABLE {names} IN ACCESS EXCLUSIVE MODE"))
+    for model in tables:
+        db.execute(model.__table__.delete())
+    for statement in rebuild_statements():
+        db.execute(text(statement))
+    return {model.__tablename__: db.scalar(select(func.count()).select_from(model)) for model in tables}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="python -m api.progress", description="Student progress maintenance")
+    parser.add_argument("--rebuild", action="store_true", help="recompute progress and class totals from the completed attempts")
+    args = parser.parse_args()
+    if not args.rebuild:
+        parser.error("nothing to do; pass --rebuild")
+    with SessionLocal() as db:
+        counts = rebuild_progress(db)
+        db.commit()
+    for table, rows in counts.items():
+        print(f"{table}: {rows} rows")
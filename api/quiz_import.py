@@ -0,0 +1,208 @@
+from collections import defaultdict
+from typing import AsyncIterator, List, Optional, Set, Tuple
+from pydantic import ValidationError
+from sqlalchemy import insert, select, tuple_
+from sqlalchemy.orm import Session
+from .catalog import get_catalog, invalidate_catalog
+from .changes import lock_change_log, record_changes
+from .schemas import QuizCreate, QuizImportResult
+from .versioning import quizzes_scope, bump_version
+from . import models
+
+QUESTIONS_PER_QUIZ = 20
+OPTIONS = ["A", "B", "C", "D"]
+QUESTION_COLUMNS = ["question_text", "option_a", "option_b", "option_c", "option_d", "correct_option", "explanation"]
+KEY_COLUMNS = ["subject", "standard", "chapter"]
+
+def rejected(line: int, quiz_name: Optional[str], errors: List[str]) -> QuizImportResult:
+    return QuizImportResult(line=line, quiz_name=quiz_name, status="rejected", errors=errors)
+
+async def iter_ndjson(chunks: AsyncIterator[bytes], max_line_bytes: int) -> AsyncIterator[Tuple[int, Optional[bytes]]]:
+    """Yield (line number, line) from a streamed body; None stands for a line over the size limit"""
+    buffer, line_number, oversized = bytearray(), 0, False
+    async for chunk in chunks:
+        start = 0
+        while True:
+            end = chunk.find(b"\n", start)
+            if end == -1:
+                if not oversized:
+                    buffer += chunk[start:]
+                    oversized = len(buffer) > max_line_bytes
+                    if oversized:
+                        buffer.clear()
+                break
+            line_number += 1
+            if oversized or len(buffer) + end - start > max_line_bytes:
+                yield line_number, None
+            else:
+                buffer += chunk[start:end]
+                if buffer.strip():
+                    yield line_number, bytes(buffer)
+            buffer.clear()
+            oversized = False
+            start = end + 1
+    if oversized or buffer.strip():
+        yield line_number + 1, None if oversized else bytes(buffer)
+
+def parse_quiz_line(line_number: int, raw: Optional[bytes], max_line_bytes: int):
+    """Return (QuizCreate, None), or (None, a rejected result) for a line that isn't a valid quiz"""
+    if raw is None:
+        return None, rejected(line_number, None, [f"Line is longer than {max_line_bytes} bytes"])
+    try:
+        return QuizCreate.model_validate_json(raw), None
+    except ValidationError as e:
+        errors = [f"{'.'.join(str(part) for part in error['loc']) or 'line'}: {error['msg']}" for error in e.errors()]
+        return None, rejected(line_number, None, errors)
+
+def _resolve_chapters(db: Session, keys):
+    """(subject, standard, chapter) -> chapter id for every key that exists, and the set of (subject, standard) found"""
+    catalog = get_catalog(db)
+    chapters, subjects, missing = {}, set(), []
+    for subject_name, standard, chapter_name in keys:
+        key = (subject_name, int(standard), chapter_name)
+        subject = catalog.subject(subject_name, key[1])
+        chapter = subject and catalog.chapter(subject.id, chapter_name)
+        if chapter:
+            chapters[key] = chapter.id
+            subjects.add(key[:2])
+        else:
+            missing.append(key)
+    if missing:
+        # Anything the catalog doesn't know yet, checked in one query
+        rows = db.execute(
+            select(models.Subject.name, models.Subject.standard, models.Chapter.name, models.Chapter.id)
+            .outerjoin(models.Chapter, models.Chapter.subject_id == models.Subject.id)
+            .where(tuple_(models.Subject.name, models.Subject.standard).in_({key[:2] for key in missing}))
+            .order_by(models.Chapter.id)
+        ).all()
+        wanted = set(missing)
+        for subject_name, standard, chapter_name, chapter_id in rows:
+            subjects.add((subject_name, standard))
+            if (subject_name, standard, chapter_name) in wanted:
+                chapters.setdefault((subject_name, standard, chapter_name), chapter_id)
+        if rows:
+            # The catalog is behind this worker's database view; have it reload
+            invalidate_catalog()
+    return chapters, subjects
+
+def quiz_frames(batch: List[Tuple[int, QuizCreate]]):
+    """A batch of (line, quiz) as two DataFrames: one row per quiz (indexed by batch position) and one per question"""
+    # pandas takes a while to import and only imports need it
+    import pandas as pd
+
+    quizzes = pd.DataFrame({
+        "line": [line for line, _ in batch],
+        "quiz_name": [quiz.quiz_name for _, quiz in batch],
+        "description": [quiz.description for _, quiz in batch],
+        "subject": [quiz.subject for _, quiz in batch],
+        "standard": [quiz.standard for _, quiz in batch],
+        "chapter": [quiz.chapter for _, quiz in batch],
+        "question_count": [len(quiz.questions) for _, quiz in batch],
+    })
+    questions = pd.DataFrame.from_records(
+        [
+            (position, number, *(getattr(question, column) for column in QUESTION_COLUMNS))
+            for position, (_, quiz) in enumerate(batch)
+            for number, question in enumerate(quiz.questions, start=1)
+        ],
+        columns=["quiz", "question_number", *QUESTION_COLUMNS]
+    )
+    return quizzes, questions
+
+def validate_quizzes(quizzes, questions, chapters: dict, subjects: set, existing: set, seen: Set[Tuple[int, str]]) -> dict:
+    """Check a batch column by column; returns batch position -> error messages for every rejected quiz.
+
+    chapters and subjects are what _resolve_chapters found, existing the (chapter_id,
+    quiz_name) pairs already in the database. Fills in quizzes.chapter_id.
+    """
+    import pandas as pd
+
+    errors = defaultdict(list)
+
+    for position, count in quizzes.loc[quizzes.question_count != QUESTIONS_PER_QUIZ, "question_count"].items():
+        errors[position].append(f"Quiz must have exactly {QUESTIONS_PER_QUIZ} questions. Received {count} questions.")
+
+    bad_options = questions.loc[~questions.correct_option.isin(OPTIONS), ["quiz", "question_number", "correct_option"]]
+    for position, number, option in bad_options.itertuples(index=False):
+        errors[position].append(f"Question {number}: correct_option must be 'A', 'B', 'C', or 'D'. Got '{option}'")
+
+    quizzes["chapter_id"] = pd.Series(chapters, dtype="Int64").reindex(pd.MultiIndex.from_frame(quizzes[KEY_COLUMNS])).to_numpy()
+    for position, subject, standard, chapter in quizzes.loc[quizzes.chapter_id.isna(), KEY_COLUMNS].itertuples():
+        if (subject, standard) in subjects:
+            errors[position].append(f"Chapter '{chapter}' not found in subject '{subject}'")
+        else:
+            errors[position].append(f"Subject '{subject}' not found for standard {standard}")
+
+    # unique_quiz_per_chapter: against the database, earlier batches, and earlier lines of this one
+    resolved = quizzes[quizzes.chapter_id.notna()]
+    names = pd.MultiIndex.from_arrays([resolved.chapter_id.astype("int64"), resolved.quiz_name])
+    in_database = names.isin(list(existing))
+    repeated = names.isin(list(seen)) | names.duplicated(keep="first")
+    for position, chapter, name, taken, again in zip(resolved.index, resolved.chapter, resolved.quiz_name, in_database, repeated):
+        if taken:
+            errors[position].append(f"Quiz '{name}' already exists for chapter '{chapter}'")
+        elif again:
+            errors[position].append(f"Quiz '{name}' appears more than once for chapter '{chapter}' in this import")
+    return errors
+
+def import_quiz_batch(db: Session, batch: List[Tuple[int, QuizCreate]], seen: Set[Tuple[int, str]]):
+    """Validate a batch of quizzes column by column and insert the valid ones in the caller's transaction.
+
+    seen holds (chapter_id, quiz_name) of quizzes created earlier in the same import.
+    Returns the per-quiz results and the (subject, standard) pairs that got new quizzes.
+    """
+    lock_change_log(db)
+    quizzes, questions = quiz_frames(batch)
+    chapters, subjects = _resolve_chapters(db, quizzes[KEY_COLUMNS].drop_duplicates().itertuples(index=False, name=None))
+    candidates = {
+        (chapters[(subject, int(standard), chapter)], name)
+        for subject, standard, chapter, name in quizzes[[*KEY_COLUMNS, "quiz_name"]].itertuples(index=False, name=None)
+        if (subject, int(standard), chapter) in chapters
+    }
+    existing = set(db.execute(
+        select(models.Quiz.chapter_id, models.Quiz.quiz_name)
+        .where(tuple_(models.Quiz.chapter_id, models.Quiz.quiz_name).in_(candidates))
+    ).all()) if candidates else set()
+    errors = validate_quizzes(quizzes, questions, chapters, subjects, existing, seen)
+
+    results = [
+        rejected(line, name, errors[position])
+        for position, line, name in quizzes.loc[sorted(errors), ["line", "quiz_name"]].itertuples()
+    ]
+    valid = quizzes.drop(index=list(errors))
+    if valid.empty:
+        return results, set()
+
+    quiz_ids = db.execute(
+        insert(models.Quiz).returning(models.Quiz.id, sort_by_parameter_order=True),
+        [
+            {"quiz_name": name, "description": description, "chapter_id": int(chapter_id), "is_active": True}
+            for name, description, chapter_id in valid[["quiz_name", "description", "chapter_id"]].itertuples(index=False)
+        ]
+    ).scalars().all()
+    valid = valid.assign(quiz_id=quiz_ids)
+
+    rows = questions[questions.quiz.isin(valid.index)].assign(
+        quiz_id=lambda frame: frame.quiz.map(valid.quiz_id),
+        correct_option=lambda frame: frame.correct_option.str.upper()
+    )
+    question_ids = db.execute(
+        insert(models.QuizQuestion).returning(models.QuizQuestion.id, sort_by_parameter_order=True),
+        rows[["quiz_id", "question_number", *QUESTION_COLUMNS]].astype(object).where(rows.notna(), None).to_dict("records")
+    ).scalars().all()
+    rows = rows.assign(id=question_ids).merge(valid[["quiz_id", "standard"]], on="quiz_id")
+
+    for standard, ids in valid.groupby("standard").quiz_id:
+        record_changes(db, "quiz", ids.tolist(), standard=int(standard))
+    for standard, ids in rows.groupby("standard").id:
+        record_changes(db, "quiz_question", ids.tolist(), standard=int(standard))
+    touched = set(valid[["subject", "standard"]].drop_duplicates().itertuples(index=False, name=None))
+    for subject, standard in touched:
+        bump_version(db, quizzes_scope(subject, standard))
+
+    seen.update(zip(valid.chapter_id.astype("int64").tolist(), valid.quiz_name))
+    results += [
+        QuizImportResult(line=line, quiz_name=name, status="created", quiz_id=quiz_id)
+        for line, name, quiz_id in valid[["line", "quiz_name", "quiz_id"]].itertuples(index=False)
+    ]
+    return results, {(subject, int(standard)) for subject, standard in touched}
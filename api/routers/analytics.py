@@ -0,0 +1,227 @@
+from datetime import date
+from typing import Literal, Optional
+from urllib.parse import quote
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..catalog import find_subject, get_catalog_async
+from ..config import LEADERBOARD_SIZE, LEADERBOARD_MAX_SIZE
+from ..database import get_async_db
+from ..exports import MEDIA_TYPES, export_query, reserve_export, stream_export
+from ..leaderboards import get_leaderboard
+from ..item_stats import COUNTER_COLUMNS, analyze_items
+from ..progress import PROGRESS_COLUMNS
+from ..schemas import (
+    ChapterProgress, ChapterReport, LeaderboardEntry, QuizItemAnalysis, StudentProgress, SubjectProgress, SubjectReport, TokenData
+)
+from .login import student_only, teacher_only
+from .. import models
+
+router = APIRouter(
+    prefix="/analytics",
+    tags=["Analytics"]
+)
+
+@router.get("/quizzes/{quiz_id}/items", status_code=status.HTTP_200_OK, response_model=QuizItemAnalysis)
+async def quiz_item_analysis(
+    quiz_id: int,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: TokenData = Depends(teacher_only)
+):
+    """Per-question difficulty, discrimination and distractor choices, from the running sums kept as attempts complete"""
+    import pandas as pd
+
+    try:
+        quiz = await db.get(models.Quiz, quiz_id)
+        if quiz is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Quiz {quiz_id} not found")
+
+        stats = models.QuestionStats
+        columns = [
+            models.QuizQuestion.id.label("question_id"), models.QuizQuestion.question_number, models.QuizQuestion.correct_option,
+            *[getattr(stats, name) for name in COUNTER_COLUMNS]
+        ]
+        # Questions nobody has answered yet come back as zeros
+        result = await db.execute(
+            select(*columns)
+            .outerjoin(stats, stats.question_id == models.QuizQuestion.id)
+            .where(models.QuizQuestion.quiz_id == quiz_id)
+            .order_by(models.QuizQuestion.question_number)
+        )
+        frame = pd.DataFrame(result.all(), columns=list(result.keys())).fillna(0)
+        quiz_stats = await db.get(models.QuizStats, quiz_id)
+        return QuizItemAnalysis(quiz_id=quiz.id, quiz_name=quiz.quiz_name, **analyze_items(frame, quiz_stats))
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"An error occurred: {e}")
+
+def _summary(row) -> dict:
+    summary = {name: getattr(row, name) for name in PROGRESS_COLUMNS}
+    for name in ("best_percent", "last_percent", "mastery"):
+        summary[name] = round(summary[name], 2)
+    return summary
+
+async def _student_progress(db: AsyncSession, student_id: int) -> StudentProgress:
+    # Reads the maintained summary rows only: one per subject and chapter the student has attempted
+    chapters = models.StudentChapterProgress
+    subjects = models.StudentSubjectProgress
+    chapter_rows = (await db.execute(
+        select(chapters, models.Chapter.name.label("chapter"), models.Chapter.subject_id)
+        .join(models.Chapter, models.Chapter.id == chapters.chapter_id)
+        .where(chapters.student_id == student_id)
+        .order_by(models.Chapter.id)
+    )).all()
+    by_subject = {}
+    for progress, chapter, subject_id in chapter_rows:
+        by_subject.setdefault(subject_id, []).append(
+            ChapterProgress(chapter_id=progress.chapter_id, chapter=chapter, **_summary(progress))
+        )
+    subject_rows = (await db.execute(
+        select(subjects, models.Subject.name, models.Subject.standard)
+        .join(models.Subject, models.Subject.id == subjects.subject_id)
+        .where(subjects.student_id == student_id)
+        .order_by(models.Subject.standard, models.Subject.name)
+    )).all()
+    return StudentProgress(student_id=student_id, subjects=[
+        SubjectProgress(
+            subject_id=progress.subject_id, subject=name, standard=standard,
+            chapters=by_subject.get(progress.subject_id, []), **_summary(progress)
+        )
+        for progress, name, standard in subject_rows
+    ])
+
+@router.get("/progress/me", status_code=status.HTTP_200_OK, response_model=StudentProgress)
+async def my_progress(
+    db: AsyncSession = Depends(get_async_db),
+    current_user: TokenData = Depends(student_only)
+):
+    """The signed-in student's progress per subject and chapter"""
+    try:
+        return await _student_progress(db, current_user.user_id)
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"An error occurred: {e}")
+
+@router.get("/progress/students/{student_id}", status_code=status.HTTP_200_OK, response_model=StudentProgress)
+async def student_progress(
+    student_id: int,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: TokenData = Depends(teacher_only)
+):
+    """A student's progress per subject and chapter, for teachers"""
+    try:
+        if await db.scalar(select(models.Student.id).where(models.Student.id == student_id)) is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Student {student_id} not found")
+        return await _student_progress(db, student_id)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"An error occurred: {e}")
+
+def _averages(stats, cohort: int) -> dict:
+    students = stats.students if stats else 0
+    return {
+        "completion_rate": round(students / cohort, 4) if cohort else 0.0,
+        "attempts": stats.attempts if stats else 0,
+        "average_mastery": round(stats.mastery_sum / students, 2) if students else None,
+        "average_best_percent": round(stats.best_percent_sum / students, 2) if students else None,
+    }
+
+@router.get("/reports/subject", status_code=status.HTTP_200_OK, response_model=SubjectReport)
+async def subject_report(
+    standard: int,
+    top: int = Query(LEADERBOARD_SIZE, ge=1, le=LEADERBOARD_MAX_SIZE),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: TokenData = Depends(teacher_only)
+):
+    """How a standard is doing in the teacher's subject, from the class totals kept as
+    attempts complete and this worker's in-memory leaderboard"""
+    if not current_user.subject:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="No subject is set for this account")
+    try:
+        catalog = await get_catalog_async(db)
+        subject = catalog.subject(current_user.subject, standard) or await db.run_sync(find_subject, current_user.subject, standard)
+        if subject is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Subject '{current_user.subject}' not found for standard {standard}"
+            )
+
+        board = await get_leaderboard(db, subject.id, standard)
+        subject_stats = await db.get(models.SubjectStats, subject.id)
+        chapters = catalog.chapters(subject.id)
+        chapter_stats = {
+            stats.chapter_id: stats
+            for stats in (await db.execute(
+                select(models.ChapterStats).where(models.ChapterStats.chapter_id.in_([chapter.id for chapter in chapters]))
+            )).scalars()
+        } if chapters else {}
+
+        chapter_reports = [
+            ChapterReport(
+                chapter_id=chapter.id, chapter=chapter.name,
+                students=chapter_stats[chapter.id].students if chapter.id in chapter_stats else 0,
+                **_averages(chapter_stats.get(chapter.id), board.cohort)
+            )
+            for chapter in chapters
+        ]
+        chapter_reports.sort(key=lambda report: (report.average_mastery is None, report.average_mastery or 0, report.chapter_id))
+        return SubjectReport(
+            subject_id=subject.id, subject=subject.name, standard=standard,
+            students=board.cohort,
+            active_students=subject_stats.students if subject_stats else 0,
+            chapters=chapter_reports,
+            leaderboard=[
+                LeaderboardEntry(
+                    rank=rank, student_id=standing.student_id, name=standing.name, attempts=standing.attempts,
+                    mastery=round(standing.mastery, 2), best_percent=round(standing.best_percent, 2)
+                )
+                for rank, standing in board.top(top)
+            ],
+            **_averages(subject_stats, board.cohort)
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"An error occurred: {e}")
+
+@router.get("/exports/{dataset}", status_code=status.HTTP_200_OK)
+async def export_results(
+    dataset: Literal["attempts", "answers"],
+    file_format: Literal["csv", "parquet"] = Query("csv", alias="format"),
+    standard: Optional[int] = None,
+    subject: Optional[str] = None,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    current_user: TokenData = Depends(teacher_only)
+):
+    """Every completed attempt, or every answer, in the teacher's subject as a streamed CSV or Parquet file.
+
+    Filters by the quiz's standard and by completion date (inclusive, UTC).
+    """
+    if not current_user.subject:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="No subject is set for this account")
+    if subject is None:
+        subject = current_user.subject
+    elif subject != current_user.subject:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Teachers can only export their own subject")
+    if start and end and start > end:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="start must not be after end")
+    slot = reserve_export()
+    try:
+        stmt = export_query(dataset, standard, subject, start, end)
+        filename = "-".join(str(part) for part in ("quiz", dataset, standard, subject, start, end) if part is not None)
+        filename = quote(f"{filename}.{file_format}")
+        return StreamingResponse(
+            stream_export(stmt, dataset, file_format, slot),
+            media_type=MEDIA_TYPES[file_format],
+            # Subject names needn't be ASCII, so the name goes out percent-encoded like FileResponse does
+            headers={"Content-Disposition": f"attachment; filename*=utf-8''{filename}"},
+            # The stream frees the slot itself; this covers a response that never starts it
+            background=BackgroundTask(slot.release)
+        )
+    except Exception:
+        slot.release()
+        raise
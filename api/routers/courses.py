@@ -1,6 +1,16 @@
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status, UploadFile, File, Form
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from ..database import get_db
+from ..config import CURRICULUM_IMPORT_MAX_BYTES, LIST_MAX_PAGE_SIZE
+from ..curriculum import CurriculumError, parse_curriculum_csv, parse_curriculum_json, import_curriculum
+from ..database import get_db, get_async_db
+from ..schemas import CurriculumImportResponse
+from ..catalog import find_subject, find_subject_named, find_chapter, get_catalog_async
+from ..changes import record_change
+from ..packs import schedule_pack_rebuild
+from ..pagination import decode_cursor, next_cursor_headers, page_size, parse_fields, project
+from ..versioning import courses_scope, chapters_scope, get_version_async, bump_version, make_etag, is_not_modified, not_modified_response, cache_headers
 from .. import models
 
 router = APIRouter(
@@ -8,46 +18,136 @@ router = APIRouter(
     tags=["Courses"]
 )
 
+SUBJECT_FIELDS = ["id", "name", "standard"]
+CHAPTER_FIELDS = ["id", "name", "subject_id"]
+
 @router.post("/add_course", status_code=status.HTTP_201_CREATED)
 def add_course(name: str = Form(...), standard: int = Form(...), db: Session = Depends(get_db)):
-    existing_course = db.query(models.Subject).filter(models.Subject.name == name, models.Subject.standard == standard).first()
+    existing_course = find_subject(db, name, standard)
     if existing_course:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Course already exists")
     
     new_course = models.Subject(name=name, standard=standard)
     db.add(new_course)
+    db.flush()
+    record_change(db, "subject", new_course.id, standard=standard)
+    bump_version(db, courses_scope(standard))
     db.commit()
     db.refresh(new_course)
+    schedule_pack_rebuild(standard)
     return {"message": "Course added successfully", "course_id": new_course.id}
 
 @router.post("/add_chapter", status_code=status.HTTP_201_CREATED)
 def add_chapter(name: str = Form(...), subject: str = Form(...), standard: int = Form(...), db: Session = Depends(get_db)):
-    subject = db.query(models.Subject).filter(models.Subject.name == subject, models.Subject.standard == standard).first()
+    subject = find_subject(db, subject, standard)
     if not subject:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Subject not found")
     
-    existing_chapter = db.query(models.Chapter).filter(models.Chapter.name == name, models.Chapter.subject_id == subject.id).first()
+    existing_chapter = find_chapter(db, subject.id, name)
     if existing_chapter:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Chapter already exists in this subject")
     
     new_chapter = models.Chapter(name=name, subject_id=subject.id)
     db.add(new_chapter)
+    db.flush()
+    record_change(db, "chapter", new_chapter.id, standard=subject.standard)
+    bump_version(db, chapters_scope(subject.name))
     db.commit()
     db.refresh(new_chapter)
+    schedule_pack_rebuild(subject.standard)
     return {"message": "Chapter added successfully", "chapter_id": new_chapter.id}
 
+@router.post("/import", status_code=status.HTTP_200_OK, response_model=CurriculumImportResponse)
+def import_courses(file: UploadFile = File(...), dry_run: bool = Form(False), db: Session = Depends(get_db)):
+    """Add a whole curriculum at once from JSON ({"9": {"Maths": ["Algebra", ...]}}) or
+    CSV (standard,subject,chapter rows). Rows that already exist are skipped."""
+    data = file.file.read(CURRICULUM_IMPORT_MAX_BYTES + 1)
+    if len(data) > CURRICULUM_IMPORT_MAX_BYTES:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Curriculum files are limited to {CURRICULUM_IMPORT_MAX_BYTES} bytes"
+        )
+    filename = (file.filename or "").lower()
+    content_type = (file.content_type or "").lower()
+    try:
+        if filename.endswith(".csv") or "csv" in content_type:
+            curriculum = parse_curriculum_csv(data)
+        elif filename.endswith(".json") or "json" in content_type:
+            curriculum = parse_curriculum_json(data)
+        else:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Upload a .json or .csv curriculum file")
+    except CurriculumError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=e.errors)
+
+    try:
+        result = import_curriculum(db, curriculum)
+        if dry_run:
+            db.rollback()
+            result.dry_run = True
+            return result
+        db.commit()
+    except HTTPException:
+        raise
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"An error occurred: {e}")
+
+    for standard in {subject.standard for subject in result.created_subjects} | {chapter.standard for chapter in result.created_chapters}:
+        schedule_pack_rebuild(standard)
+    return result
+
 @router.get("/list_courses", status_code=status.HTTP_200_OK)
-def list_courses(standard: int, db: Session = Depends(get_db)):
-    courses = db.query(models.Subject).filter(models.Subject.standard == standard).all()
-    return courses
+async def list_courses(
+    standard: int,
+    request: Request,
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=LIST_MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Subjects of a standard in id order; all of them unless a page is asked for"""
+    fields = parse_fields(fields, SUBJECT_FIELDS)
+    size, after = page_size(limit, cursor), decode_cursor(cursor)
+    version = await get_version_async(db, courses_scope(standard))
+    etag = make_etag(courses_scope(standard), version)
+    if is_not_modified(request, etag):
+        return not_modified_response(etag)
+
+    catalog = await get_catalog_async(db, courses_scope(standard), version)
+    response.headers.update(cache_headers(etag))
+    if size is None:
+        return project(catalog.subjects(standard), fields)
+    subjects = catalog.subjects_after(standard, after, size + 1)
+    response.headers.update(next_cursor_headers(subjects, size))
+    return project(subjects, fields)
 
 @router.get("/list_chapters", status_code=status.HTTP_200_OK)
-def list_chapters(subject: str, db: Session = Depends(get_db)):
-    subject = db.query(models.Subject).filter(models.Subject.name == subject).first()
+async def list_chapters(
+    subject: str,
+    request: Request,
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=LIST_MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Chapters of a subject in id order; all of them unless a page is asked for"""
+    fields = parse_fields(fields, CHAPTER_FIELDS)
+    size, after = page_size(limit, cursor), decode_cursor(cursor)
+    version = await get_version_async(db, chapters_scope(subject))
+    etag = make_etag(chapters_scope(subject), version)
+    if is_not_modified(request, etag):
+        return not_modified_response(etag)
+
+    subject = await db.run_sync(find_subject_named, subject)
     if not subject:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Subject not found")
-    
-    chapters = db.query(models.Chapter).filter(models.Chapter.subject_id == subject.id).all()
-    return chapters
-
 
+    catalog = await get_catalog_async(db, chapters_scope(subject.name), version)
+    response.headers.update(cache_headers(etag))
+    if size is None:
+        return project(catalog.chapters(subject.id), fields)
+    chapters = catalog.chapters_after(subject.id, after, size + 1)
+    response.headers.update(next_cursor_headers(chapters, size))
+    return project(chapters, fields)
@@ -1,21 +1,29 @@
 from fastapi import APIRouter, status, HTTPException
 from fastapi.params import Depends
-from sqlalchemy.orm import Session
-from passlib.context import CryptContext
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import datetime, timedelta, UTC
+from hashlib import sha256
+from threading import Lock
+import time
+from cachetools import TLRUCache
 from jose import jwt, JWTError
 from fastapi.security import OAuth2PasswordBearer
 from fastapi.security.oauth2 import OAuth2PasswordRequestForm
 from .. import schemas, models
-from ..database import get_db
-from ..config import SECRET_KEY, JWT_ALGORITHM, ACCESS_TOKEN_EXPIRE_DAYS
+from ..database import get_async_db
+from ..hashing import hash_password, verify_password
+from ..config import SECRET_KEY, JWT_ALGORITHM, ACCESS_TOKEN_EXPIRE_DAYS, TOKEN_CACHE_SIZE
 
 router = APIRouter()
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated = "auto")
-
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/login")
 
+# Verified tokens keyed by their SHA-256, each dropped once its own exp passes
+_token_cache = TLRUCache(maxsize=TOKEN_CACHE_SIZE, ttu=lambda key, value, now: value[1], timer=time.time)
+_token_cache_lock = Lock()
+_token_cache_stats = {"hits": 0, "misses": 0, "rejections": 0}
+
 def generate_token(data: dict):
     to_encode = data.copy()
     expire = datetime.now(UTC) + timedelta(days=ACCESS_TOKEN_EXPIRE_DAYS)
@@ -24,14 +32,20 @@ def generate_token(data: dict):
     return encoded_jwt
 
 @router.post("/student_login", tags=["Authentication"])
-def student_login(request: OAuth2PasswordRequestForm = Depends(), db: Session=Depends(get_db)):
-    student = db.query(models.Student).filter(models.Student.email == request.username).first()
+async def student_login(request: OAuth2PasswordRequestForm = Depends(), db: AsyncSession=Depends(get_async_db)):
+    student = (await db.execute(select(models.Student).where(models.Student.email == request.username))).scalars().first()
 
     if not student:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Student doesn't exist/not found")
     
-    if not pwd_context.verify(request.password, student.password):
+    valid, new_hash = await verify_password(request.password, student.password)
+    if not valid:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid Password")
+
+    if new_hash:
+        # Stored hash uses older parameters, replace it while we have the password
+        student.password = new_hash
+        await db.commit()
     
     access_token = generate_token(data = {"user_id": student.id,
                                           "role": student.role,
@@ -44,14 +58,20 @@ def student_login(request: OAuth2PasswordRequestForm = Depends(), db: Session=De
             "token_type": "Bearer"}
 
 @router.post("/teacher_login", tags=["Authentication"])
-def teacher_login(request: OAuth2PasswordRequestForm = Depends(), db: Session=Depends(get_db)):
-    teacher = db.query(models.Teacher).filter(models.Teacher.email == request.username).first()
+async def teacher_login(request: OAuth2PasswordRequestForm = Depends(), db: AsyncSession=Depends(get_async_db)):
+    teacher = (await db.execute(select(models.Teacher).where(models.Teacher.email == request.username))).scalars().first()
 
     if not teacher:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Student doesn't exist/not found")
     
-    if not pwd_context.verify(request.password, teacher.password):
+    valid, new_hash = await verify_password(request.password, teacher.password)
+    if not valid:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid Password")
+
+    if new_hash:
+        # Stored hash uses older parameters, replace it while we have the password
+        teacher.password = new_hash
+        await db.commit()
     
     access_token = generate_token(data = {"user_id": teacher.id,
                                           "role": teacher.role,
@@ -64,27 +84,47 @@ def teacher_login(request: OAuth2PasswordRequestForm = Depends(), db: Session=De
             "token_type": "Bearer"}
 
 @router.get("/hash_password")
-def hash_pwd(request: str):
-    return {"hashed_password": pwd_context.hash(request)}
+async def hash_pwd(request: str):
+    return {"hashed_password": await hash_password(request)}
 
 def get_current_user(token: str = Depends(oauth2_scheme)):
     cred_exception = HTTPException(status_code=status.HTTP_401_UNAUTHORIZED,
                                    detail="Invalid authorization credentials",
                                    headers={'WWW-AUTHENTICATE': "Bearer"})
+    token_key = sha256(token.encode()).digest()
+    with _token_cache_lock:
+        cached = _token_cache.get(token_key)
+        _token_cache_stats["hits" if cached else "misses"] += 1
+    if cached:
+        return cached[0]
+
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[JWT_ALGORITHM])
         user_id: int = payload.get("user_id")
         role: str = payload.get("role")
         standard: int = payload.get("standard")  # For students
         subject: str = payload.get("subject")    # For teachers
+        expires_at = payload.get("exp")
         
         if user_id is None or role is None:
             raise cred_exception
             
-        return schemas.TokenData(user_id=user_id, role=role, standard=standard, subject=subject)
-    except JWTError:
+        token_data = schemas.TokenData(user_id=user_id, role=role, standard=standard, subject=subject)
+    except (JWTError, HTTPException):
+        with _token_cache_lock:
+            _token_cache_stats["rejections"] += 1
         raise cred_exception
 
+    # Tokens without an exp never expire, so they are not worth pinning in the cache
+    if isinstance(expires_at, (int, float)):
+        with _token_cache_lock:
+            _token_cache[token_key] = (token_data, expires_at)
+    return token_data
+
+def token_cache_metrics() -> dict:
+    with _token_cache_lock:
+        return {**_token_cache_stats, "size": len(_token_cache), "max_size": _token_cache.maxsize}
+
 def teacher_only(current_user: schemas.TokenData = Depends(get_current_user)):
     if current_user.role != schemas.RoleEnum.teacher:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Teacher access required")
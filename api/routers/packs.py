@@ -0,0 +1,64 @@
+import os
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi.responses import FileResponse
+from sqlalchemy.orm import Session
+from ..config import SYLLABI
+from ..database import get_db
+from ..packs import PACK_ENCODINGS, pack_version, pack_path, find_latest_pack, schedule_pack_rebuild
+from ..versioning import is_not_modified, not_modified_response
+
+router = APIRouter(
+    prefix="/packs",
+    tags=["Content Packs"]
+)
+
+def pack_etag(syllabus: str, standard: int, version: int, encoding) -> str:
+    return f'"pack-{syllabus}-{standard}-{version}-{encoding or "identity"}"'
+
+def choose_encoding(request: Request, path: str):
+    accepted = {
+        token.split(";", 1)[0].strip().lower()
+        for token in request.headers.get("accept-encoding", "").split(",")
+    }
+    for encoding, suffix in PACK_ENCODINGS.items():
+        if encoding in accepted and os.path.exists(path + suffix):
+            return encoding, path + suffix
+    return None, path
+
+@router.get("/{syllabus}/{standard}", status_code=status.HTTP_200_OK)
+def download_pack(syllabus: str, standard: int, request: Request, db: Session = Depends(get_db)):
+    """Whole offline bundle for a board and class: courses, chapters, active quizzes and PPT links"""
+    syllabus = syllabus.lower()
+    if syllabus not in SYLLABI:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Unknown syllabus '{syllabus}'")
+
+    latest = find_latest_pack(syllabus, standard)
+    if latest is None:
+        # Nothing built yet; building here would make this client wait for the whole compression
+        schedule_pack_rebuild(standard, syllabus)
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="The content pack is being built, please retry shortly",
+            headers={"Retry-After": "10"}
+        )
+
+    # Revalidation is answered from the newest pack on disk without a query: every content
+    # change schedules a rebuild, so a stale pack is only served until that finishes
+    encoding, path = choose_encoding(request, pack_path(syllabus, standard, latest))
+    etag = pack_etag(syllabus, standard, latest, encoding)
+    if is_not_modified(request, etag):
+        return not_modified_response(etag)
+
+    if pack_version(db, standard) != latest:
+        # Serve the previous pack while the current one is built
+        schedule_pack_rebuild(standard, syllabus)
+
+    headers = {"ETag": etag, "Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    return FileResponse(
+        path,
+        media_type="application/json",
+        headers=headers,
+        filename=f"{syllabus}_class_{standard}_v{latest}.json"
+    )
@@ -1,8 +1,16 @@
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, status, Request, Response
+from fastapi.responses import FileResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from ..schemas import PPTSchema, PPTResponse
-from ..config import supabase
-from ..database import get_db
+from ..config import SYLLABI, PPT_CONTENT_BUCKET
+from ..database import get_async_db
+from ..changes import record_change
+from ..storage import get_storage, receive_upload
+from ..blobs import store_content, release_content, release_ppt_file, preview_key
+from ..previews import schedule_preview
+from ..packs import schedule_pack_rebuild
+from ..versioning import is_not_modified, not_modified_response, cache_headers
 from .. import models
 
 router = APIRouter(
@@ -10,25 +18,33 @@ router = APIRouter(
    tags=["PPTs"]
 )
 
+# The upload routes read their body with receive_upload rather than through FastAPI, so it's described here for the docs
+PPT_UPLOAD_BODY = {"requestBody": {"required": True, "content": {"multipart/form-data": {"schema": {
+    "type": "object",
+    "required": ["syllabus", "standard", "subject", "chapter", "file"],
+    "properties": {
+        "syllabus": {"type": "string"}, "standard": {"type": "integer"}, "subject": {"type": "string"},
+        "chapter": {"type": "string"}, "file": {"type": "string", "format": "binary"},
+    },
+}}}}}
+
 @router.post("/create-buckets", status_code=status.HTTP_201_CREATED)
-def create_storage_buckets():
+async def create_storage_buckets():
     """Create the required storage buckets if they don't exist"""
     try:
-        buckets_to_create = ['ncert', 'pseb']
+        buckets_to_create = SYLLABI + [PPT_CONTENT_BUCKET]
         created_buckets = []
         
         for bucket_name in buckets_to_create:
             try:
                 # Try to create the bucket
-                result = supabase.storage.create_bucket(bucket_name, {'public': True})
-                created_buckets.append(bucket_name)
-                print(f"Created bucket: {bucket_name}")
-            except Exception as e:
-                # Bucket might already exist
-                if "already exists" in str(e).lower():
-                    print(f"Bucket {bucket_name} already exists")
+                if await get_storage().create_bucket(bucket_name):
+                    created_buckets.append(bucket_name)
+                    print(f"Created bucket: {bucket_name}")
                 else:
-                    print(f"Error creating bucket {bucket_name}: {e}")
+                    print(f"Bucket {bucket_name} already exists")
+            except Exception as e:
+                print(f"Error creating bucket {bucket_name}: {e}")
         
         return {
             "message": "Storage buckets setup completed",
@@ -39,22 +55,18 @@ def create_storage_buckets():
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Failed to create buckets: {e}")
 
    
-@router.post("/upload", status_code=status.HTTP_201_CREATED)
-def upload_ppt(
-    syllabus: str = Form(...),
-    standard: int = Form(...),
-    subject: str = Form(...),
-    chapter: str = Form(...),
-    file: UploadFile = File(...), 
-    db: Session = Depends(get_db)
-):
+@router.post("/upload", status_code=status.HTTP_201_CREATED, openapi_extra=PPT_UPLOAD_BODY)
+async def upload_ppt(request: Request, db: AsyncSession = Depends(get_async_db)):
+    # Hashed and size-checked as it arrives, so an oversized file is cut off rather than spooled whole
+    form, file, digest = await receive_upload(request, PPTSchema)
+    syllabus, standard, subject, chapter = form.syllabus, form.standard, form.subject, form.chapter
     try:
         # Check if PPT already exists for this subject, standard, and chapter
-        existing_ppt = db.query(models.PPT).filter(
+        existing_ppt = (await db.execute(select(models.PPT).where(
             models.PPT.subject == subject,
             models.PPT.standard == standard,
             models.PPT.chapter == chapter
-        ).first()
+        ))).scalars().first()
         
         if existing_ppt:
             raise HTTPException(
@@ -62,39 +74,15 @@ def upload_ppt(
                 detail=f"PPT already exists for {subject} class {standard} chapter {chapter}"
             )
         
-        # Read file content
-        file_content = file.file.read()
-        
-        # Determine bucket based on syllabus
-        bucket_name = syllabus.lower()  # 'ncert' or 'pseb'
-        
-        # Create folder structure: class_x/subject/chapter_filename.ppt
-        folder_path = f"class_{standard}/{subject}/{chapter}_{file.filename}"
-        
-        # Upload to the appropriate bucket with folder structure
+        # Files are stored once under their SHA-256; bytes we already have aren't sent again
         try:
-            response = supabase.storage.from_(bucket_name).upload(folder_path, file_content)
-            print(f"Upload response: {response}")  # Debug log
-            
-            # Response is an UploadResponse object with path attribute
-            if not response or not hasattr(response, 'path'):
-                raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Upload failed - invalid response")
-                
+            stored, uploaded = await store_content(db, file, digest)
+        except HTTPException:
+            raise
         except Exception as upload_error:
-            raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Failed to upload file to Supabase Storage: {upload_error}")
+            raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Failed to upload file to storage: {upload_error}")
         
-        # Get public URL for the uploaded file
-        try:
-            file_url_response = supabase.storage.from_(bucket_name).get_public_url(folder_path)
-            # Handle both string response and dict response
-            if isinstance(file_url_response, str):
-                file_url = file_url_response
-            elif isinstance(file_url_response, dict):
-                file_url = file_url_response.get('publicURL') or file_url_response.get('url', str(file_url_response))
-            else:
-                file_url = str(file_url_response)
-        except Exception as url_error:
-            raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Failed to get public URL: {url_error}")
+        file_url = get_storage().public_url(PPT_CONTENT_BUCKET, stored.path)
         
         # Save PPT information to database
         new_ppt = models.PPT(
@@ -104,47 +92,60 @@ def upload_ppt(
             syllabus=syllabus,
             file_url=file_url,
             filename=file.filename,
-            file_path=folder_path
+            file_path=stored.path,
+            content_hash=stored.sha256
         )
         
         db.add(new_ppt)
-        db.commit()
-        db.refresh(new_ppt)
+        try:
+            await db.flush()
+            await db.run_sync(record_change, "ppt", new_ppt.id, standard=standard)
+            await db.commit()
+        except Exception:
+            await db.rollback()
+            # Removes our upload, or an orphan we deduplicated against, if nothing references it
+            await release_content(stored.sha256)
+            raise
+        schedule_pack_rebuild(standard, syllabus)
+        schedule_preview(stored.sha256)
         
         return {
             "id": new_ppt.id,
             "file_url": file_url,
-            "bucket": bucket_name,
-            "path": folder_path,
+            "bucket": PPT_CONTENT_BUCKET,
+            "path": stored.path,
             "subject": subject,
             "standard": standard,
             "chapter": chapter,
             "syllabus": syllabus,
-            "message": f"PPT uploaded successfully to {bucket_name}/class_{standard}/{subject}/"
+            "size": stored.size,
+            "sha256": stored.sha256,
+            "deduplicated": not uploaded,
+            "message": f"PPT uploaded successfully for {subject} class {standard} chapter {chapter}"
         }
     except HTTPException:
         raise
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"An error occurred: {e}")
     finally:
-        file.file.close()
+        await file.close()
 
 @router.get("/ppt", status_code=status.HTTP_200_OK)
-def get_ppt(
+async def get_ppt(
     syllabus: str,
     standard: int, 
     subject: str,
     chapter: str,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     try:
-        ppt = db.query(models.PPT).filter(
+        ppt = (await db.execute(select(models.PPT).where(
             models.PPT.syllabus == syllabus,
             models.PPT.subject == subject,
             models.PPT.standard == standard,
             models.PPT.chapter == chapter
-        ).first()
+        ))).scalars().first()
         
         if not ppt:
             raise HTTPException(
@@ -167,74 +168,123 @@ def get_ppt(
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"An error occurred: {e}")
 
-@router.put("/ppt/update", status_code=status.HTTP_200_OK)
-def update_ppt(
-    syllabus: str = Form(...),
-    standard: int = Form(...),
-    subject: str = Form(...),
-    chapter: str = Form(...),
-    file: UploadFile = File(...), 
-    db: Session = Depends(get_db)
+@router.get("/ppt/preview", status_code=status.HTTP_200_OK)
+async def get_ppt_preview(
+    request: Request,
+    response: Response,
+    syllabus: str,
+    standard: int,
+    subject: str,
+    chapter: str,
+    db: AsyncSession = Depends(get_async_db)
 ):
+    """Slide outline and thumbnail URLs, extracted in the background after upload"""
     try:
-        # Find existing PPT
-        existing_ppt = db.query(models.PPT).filter(
+        ppt = (await db.execute(select(models.PPT).where(
             models.PPT.syllabus == syllabus,
             models.PPT.subject == subject,
             models.PPT.standard == standard,
             models.PPT.chapter == chapter
-        ).first()
+        ))).scalars().first()
         
-        if not existing_ppt:
+        if not ppt:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND, 
                 detail=f"No PPT found for {subject} class {standard} chapter {chapter}"
             )
+        if ppt.content_hash is None:
+            # Uploaded before files were stored by content hash; re-upload it to get a preview
+            return {"id": ppt.id, "status": "unavailable"}
+        
+        preview = await db.get(models.PPTPreview, ppt.content_hash)
+        if preview is None:
+            schedule_preview(ppt.content_hash)
+            return {"id": ppt.id, "status": "pending"}
         
-        # Read new file content
-        file_content = file.file.read()
+        # A preview never changes for a given file, so the content hash is a strong validator
+        etag = f'"preview-{ppt.content_hash[:32]}"'
+        if is_not_modified(request, etag):
+            return not_modified_response(etag)
+        response.headers.update(cache_headers(etag))
         
-        # Determine bucket based on syllabus
-        bucket_name = syllabus.lower()
+        storage = get_storage()
+        return {
+            "id": ppt.id,
+            "status": preview.status,
+            "slide_count": preview.slide_count,
+            "slides": preview.slides or [],
+            "thumbnails": [
+                storage.public_url(PPT_CONTENT_BUCKET, preview_key(ppt.content_hash, number))
+                for number in range(1, preview.thumbnail_count + 1)
+            ]
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"An error occurred: {e}")
+
+@router.get("/files/{bucket}/{path:path}", status_code=status.HTTP_200_OK)
+async def download_ppt_file(bucket: str, path: str):
+    """Serve a PPT kept by the local storage backend, with Range support"""
+    storage = get_storage()
+    if not hasattr(storage, "file_path"):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Files are not served from this server")
+
+    if await storage.stat(bucket, path) is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"No file at {bucket}/{path}")
+    return FileResponse(storage.file_path(bucket, path), filename=path.rsplit("/", 1)[-1])
+
+@router.put("/ppt/update", status_code=status.HTTP_200_OK, openapi_extra=PPT_UPLOAD_BODY)
+async def update_ppt(request: Request, db: AsyncSession = Depends(get_async_db)):
+    # Hashed and size-checked as it arrives, so an oversized file is cut off rather than spooled whole
+    form, file, digest = await receive_upload(request, PPTSchema)
+    syllabus, standard, subject, chapter = form.syllabus, form.standard, form.subject, form.chapter
+    try:
+        # Find existing PPT
+        existing_ppt = (await db.execute(select(models.PPT).where(
+            models.PPT.syllabus == syllabus,
+            models.PPT.subject == subject,
+            models.PPT.standard == standard,
+            models.PPT.chapter == chapter
+        ))).scalars().first()
         
-        # Delete old file from storage
-        delete_response = supabase.storage.from_(bucket_name).remove([existing_ppt.file_path])
+        if not existing_ppt:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND, 
+                detail=f"No PPT found for {subject} class {standard} chapter {chapter}"
+            )
         
-        # Create new folder path
-        new_folder_path = f"class_{standard}/{subject}/{chapter}_{file.filename}"
+        old_file = (existing_ppt.syllabus, existing_ppt.file_path, existing_ppt.content_hash)
         
-        # Upload new file
+        # Store the new file first; the old one is only released once nothing points at it
         try:
-            upload_response = supabase.storage.from_(bucket_name).upload(new_folder_path, file_content)
-            print(f"Update upload response: {upload_response}")  # Debug log
-            
-            # Response is an UploadResponse object with path attribute
-            if not upload_response or not hasattr(upload_response, 'path'):
-                raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Upload failed - invalid response")
-                
+            stored, uploaded = await store_content(db, file, digest)
+        except HTTPException:
+            raise
         except Exception as upload_error:
-            raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Failed to upload new file to Supabase Storage: {upload_error}")
+            raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Failed to upload new file to storage: {upload_error}")
         
-        # Get new public URL
-        try:
-            new_file_url_response = supabase.storage.from_(bucket_name).get_public_url(new_folder_path)
-            # Handle both string response and dict response
-            if isinstance(new_file_url_response, str):
-                new_file_url = new_file_url_response
-            elif isinstance(new_file_url_response, dict):
-                new_file_url = new_file_url_response.get('publicURL') or new_file_url_response.get('url', str(new_file_url_response))
-            else:
-                new_file_url = str(new_file_url_response)
-        except Exception as url_error:
-            raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Failed to get public URL: {url_error}")
+        new_file_url = get_storage().public_url(PPT_CONTENT_BUCKET, stored.path)
+        new_folder_path = stored.path
         
         # Update database record
         existing_ppt.file_url = new_file_url
         existing_ppt.filename = file.filename
         existing_ppt.file_path = new_folder_path
+        existing_ppt.content_hash = stored.sha256
+        try:
+            await db.run_sync(record_change, "ppt", existing_ppt.id, standard=existing_ppt.standard)
+            await db.commit()
+        except Exception:
+            await db.rollback()
+            # Removes our upload, or an orphan we deduplicated against, if nothing references it
+            await release_content(stored.sha256)
+            raise
         
-        db.commit()
-        db.refresh(existing_ppt)
+        if old_file[2] != stored.sha256:
+            await release_ppt_file(*old_file)
+        schedule_pack_rebuild(standard, syllabus)
+        schedule_preview(stored.sha256)
         
         return {
             "id": existing_ppt.id,
@@ -245,26 +295,29 @@ def update_ppt(
             "chapter": chapter,
             "syllabus": syllabus,
             "file_path": new_folder_path,
+            "size": stored.size,
+            "sha256": stored.sha256,
+            "deduplicated": not uploaded,
             "message": f"PPT updated successfully for {subject} class {standard} chapter {chapter}"
         }
     except HTTPException:
         raise
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"An error occurred: {e}")
     finally:
-        file.file.close()
+        await file.close()
 
 @router.delete("/ppt/delete", status_code=status.HTTP_200_OK)
-def delete_ppt(request: PPTSchema, db: Session = Depends(get_db)):
+async def delete_ppt(request: PPTSchema, db: AsyncSession = Depends(get_async_db)):
     try:
         # Find existing PPT
-        existing_ppt = db.query(models.PPT).filter(
+        existing_ppt = (await db.execute(select(models.PPT).where(
             models.PPT.syllabus == request.syllabus,
             models.PPT.subject == request.subject,
             models.PPT.standard == request.standard,
             models.PPT.chapter == request.chapter
-        ).first()
+        ))).scalars().first()
         
         if not existing_ppt:
             raise HTTPException(
@@ -272,13 +325,14 @@ def delete_ppt(request: PPTSchema, db: Session = Depends(get_db)):
                 detail=f"No PPT found for {request.subject} class {request.standard} chapter {request.chapter}"
             )
         
-        # Delete file from Supabase storage
-        bucket_name = existing_ppt.syllabus.lower()
-        delete_response = supabase.storage.from_(bucket_name).remove([existing_ppt.file_path])
+        # Delete record from database, leaving a tombstone for syncing clients
+        await db.run_sync(record_change, "ppt", existing_ppt.id, operation="delete", standard=existing_ppt.standard)
+        await db.delete(existing_ppt)
+        await db.commit()
         
-        # Delete record from database
-        db.delete(existing_ppt)
-        db.commit()
+        # Delete the file from storage unless another PPT shares it
+        await release_ppt_file(existing_ppt.syllabus, existing_ppt.file_path, existing_ppt.content_hash)
+        schedule_pack_rebuild(request.standard, request.syllabus)
         
         return {
             "message": f"PPT deleted successfully for {existing_ppt.subject} class {existing_ppt.standard} chapter {existing_ppt.chapter}",
@@ -288,5 +342,5 @@ def delete_ppt(request: PPTSchema, db: Session = Depends(get_db)):
     except HTTPException:
         raise
     except Exception as e:
-        db.rollback()
-        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"An error occurred: {e}")
\ No newline at end of file
+        await db.rollback()
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"An error occurred: {e}")
@@ -1,9 +1,24 @@
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form
-from sqlalchemy.orm import Session
-from typing import List
-from ..schemas import QuizCreate, QuizAttemptResponse, QuizAttemptStart, QuizQuestion, QuizQuestionResponse, QuizQuestionWithAnswer, QuizResponse, StudentAnswerResponse, StudentAnswerSubmit
-from ..config import supabase
-from ..database import get_db
+import asyncio
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status, UploadFile, File, Form
+from fastapi.responses import JSONResponse
+from sqlalchemy import Integer, bindparam, func, select, true
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, selectinload
+from typing import List, Optional
+from pydantic import TypeAdapter
+from ..schemas import QuizImportResponse, QuizCreate, QuizAttemptResponse, QuizAttemptStart, QuizQuestion, QuizQuestionResponse, QuizQuestionWithAnswer, QuizResponse, StudentAnswerResponse, StudentAnswerSubmit, StudentAttemptSubmit, BulkAttemptSubmit, BulkAttemptResponse, BulkAttemptResult, TokenData
+from ..config import BULK_ATTEMPT_MAX, LIST_MAX_PAGE_SIZE, QUIZ_IMPORT_BATCH_SIZE, QUIZ_IMPORT_MAX_LINE_BYTES
+from ..database import SessionLocal, get_db, get_async_db
+from ..catalog import find_subject, find_chapter, get_catalog_async
+from ..grading import grade_submission, save_attempt, save_queued_attempts
+from .login import student_only
+from ..cache import get_subject_quizzes, set_subject_quizzes, invalidate_subject_quizzes
+from ..changes import record_change, record_changes
+from ..packs import schedule_pack_rebuild
+from ..pagination import decode_cursor, next_cursor_headers, page_size, parse_fields
+from ..quiz_import import iter_ndjson, parse_quiz_line, import_quiz_batch, rejected
+from ..versioning import quizzes_scope, chapters_scope, get_version_async, bump_version, make_etag, is_not_modified, not_modified_response, cache_headers
 from .. import models
 
 router = APIRouter(
@@ -11,14 +26,47 @@ router = APIRouter(
     tags=["quizzes"]
 )
 
+quiz_list_adapter = TypeAdapter(List[QuizResponse])
+
+QUIZ_FIELDS = ["id", "quiz_name", "description", "chapter_id", "is_active", "questions"]
+# Everything in QuizQuestionResponse; correct_option stays out
+QUESTION_COLUMNS = [
+    models.QuizQuestion.id, models.QuizQuestion.question_number, models.QuizQuestion.question_text,
+    models.QuizQuestion.option_a, models.QuizQuestion.option_b, models.QuizQuestion.option_c, models.QuizQuestion.option_d
+]
+
+async def _list_quizzes(db: AsyncSession, chapter_ids: List[int], fields: List[str], after: int, size: Optional[int]) -> list:
+    """Quizzes of the given chapters in id order as dicts of the requested fields"""
+    columns = [getattr(models.Quiz, name) for name in fields if name != "questions"]
+    if size is None:
+        stmt = select(*columns).where(models.Quiz.chapter_id.in_(chapter_ids)).order_by(models.Quiz.id)
+    else:
+        # Walk ix_quizzes_chapter_id_id for each chapter and merge: a page reads at most
+        # size + 1 index entries per chapter, however many quizzes the subject has
+        chapter = func.unnest(bindparam("chapter_ids", chapter_ids, type_=ARRAY(Integer))).table_valued("id").render_derived()
+        per_chapter = select(*columns).where(
+            models.Quiz.chapter_id == chapter.c.id, models.Quiz.id > after
+        ).order_by(models.Quiz.id).limit(size + 1).lateral()
+        stmt = select(per_chapter).select_from(chapter).join(per_chapter, true()).order_by(per_chapter.c.id).limit(size + 1)
+    quizzes = [dict(row) for row in (await db.execute(stmt)).mappings()]
+
+    if "questions" in fields and quizzes:
+        by_quiz = {quiz["id"]: quiz.setdefault("questions", []) for quiz in quizzes}
+        result = await db.execute(
+            select(models.QuizQuestion.quiz_id, *QUESTION_COLUMNS)
+            .where(models.QuizQuestion.quiz_id.in_(by_quiz))
+            .order_by(models.QuizQuestion.quiz_id, models.QuizQuestion.question_number)
+        )
+        for row in result.mappings():
+            question = dict(row)
+            by_quiz[question.pop("quiz_id")].append(question)
+    return quizzes
+
 @router.post("/create", status_code=status.HTTP_201_CREATED)
 def create_quiz(request: QuizCreate, db: Session = Depends(get_db)):
     try:
         # Step 1: Find the subject based on syllabus, standard, and subject name
-        subject = db.query(models.Subject).filter(
-            models.Subject.name == request.subject,
-            models.Subject.standard == request.standard
-        ).first()
+        subject = find_subject(db, request.subject, request.standard)
         
         if not subject:
             raise HTTPException(
@@ -27,10 +75,7 @@ def create_quiz(request: QuizCreate, db: Session = Depends(get_db)):
             )
         
         # Step 2: Find the chapter based on subject and chapter name
-        chapter = db.query(models.Chapter).filter(
-            models.Chapter.name == request.chapter,
-            models.Chapter.subject_id == subject.id
-        ).first()
+        chapter = find_chapter(db, subject.id, request.chapter)
         
         if not chapter:
             raise HTTPException(
@@ -93,10 +138,18 @@ def create_quiz(request: QuizCreate, db: Session = Depends(get_db)):
         
         # Add all questions to the session
         db.add_all(quiz_questions)
+        db.flush()
+        record_change(db, "quiz", new_quiz.id, standard=subject.standard)
+        record_changes(db, "quiz_question", [question.id for question in quiz_questions], standard=subject.standard)
+        bump_version(db, quizzes_scope(subject.name, subject.standard))
         
         # Commit all changes
         db.commit()
         db.refresh(new_quiz)
+
+        # The cached quiz bundle for this subject no longer has every quiz
+        invalidate_subject_quizzes(subject.name, subject.standard)
+        schedule_pack_rebuild(subject.standard)
         
         return {
             "message": "Quiz created successfully",
@@ -116,76 +169,224 @@ def create_quiz(request: QuizCreate, db: Session = Depends(get_db)):
         db.rollback()
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"An error occurred: {e}")
 
+def _import_batch(batch, batch_seen) -> tuple:
+    # Building and checking the frames is CPU work, so each batch runs on a worker
+    # thread with a session of its own rather than on the event loop
+    with SessionLocal() as db:
+        imported = import_quiz_batch(db, batch, batch_seen)
+        db.commit()
+    return imported
+
+@router.post("/import", status_code=status.HTTP_200_OK, response_model=QuizImportResponse)
+async def import_quizzes(request: Request):
+    """Create many quizzes from an NDJSON body: one QuizCreate object per line.
+
+    Quizzes are validated and committed in batches as the body streams in. A
+    rejected quiz doesn't stop the others; each line gets a result.
+    """
+    results, batch, seen, touched = [], [], set(), set()
+
+    async def flush():
+        # Names from this batch only count as taken once it has committed
+        batch_seen = set(seen)
+        try:
+            batch_results, batch_touched = await asyncio.to_thread(_import_batch, list(batch), batch_seen)
+            seen.update(batch_seen)
+        except Exception as e:
+            batch_results, batch_touched = [rejected(line, quiz.quiz_name, [f"An error occurred: {e}"]) for line, quiz in batch], set()
+        results.extend(batch_results)
+        for subject, standard in batch_touched:
+            invalidate_subject_quizzes(subject, standard)
+        touched.update(batch_touched)
+        batch.clear()
+
+    async for line_number, raw in iter_ndjson(request.stream(), QUIZ_IMPORT_MAX_LINE_BYTES):
+        quiz, error = parse_quiz_line(line_number, raw, QUIZ_IMPORT_MAX_LINE_BYTES)
+        if error is not None:
+            results.append(error)
+            continue
+        batch.append((line_number, quiz))
+        if len(batch) >= QUIZ_IMPORT_BATCH_SIZE:
+            await flush()
+    if batch:
+        await flush()
+
+    for standard in {standard for _, standard in touched}:
+        schedule_pack_rebuild(standard)
+    results.sort(key=lambda result: result.line)
+    created = sum(result.status == "created" for result in results)
+    return QuizImportResponse(created=created, rejected=len(results) - created, results=results)
+
 @router.get("/by-subject", status_code=status.HTTP_200_OK, response_model=List[QuizResponse])
-def get_quizzes_by_subject(
+async def get_quizzes_by_subject(
     subject: str,
     standard: int,
-    db: Session = Depends(get_db)
+    request: Request,
+    limit: Optional[int] = Query(None, ge=1, le=LIST_MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db)
 ):
+    """Every quiz of a subject with its questions, for offline use. Ask for a page
+    (?limit=, ?cursor=) or for fewer fields (?fields=id,quiz_name) for listing screens."""
+    fields = parse_fields(fields, QUIZ_FIELDS)
+    size, after = page_size(limit, cursor), decode_cursor(cursor)
     try:
-        # Step 1: Find the subject based on name and standard
-        subject_obj = db.query(models.Subject).filter(
+        # Answer revalidation from the cached content version without querying quizzes
+        version = await get_version_async(db, quizzes_scope(subject, standard))
+        etag = make_etag(quizzes_scope(subject, standard), version)
+        if is_not_modified(request, etag):
+            return not_modified_response(etag)
+
+        if size is not None or fields is not None:
+            found = await db.run_sync(find_subject, subject, standard)
+            if not found:
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail=f"Subject '{subject}' not found for standard {standard}"
+                )
+            # At least as new as the subject's chapter list, so no chapter's quizzes are missed
+            chapters_version = await get_version_async(db, chapters_scope(subject))
+            catalog = await get_catalog_async(db, chapters_scope(subject), chapters_version)
+            chapter_ids = [chapter.id for chapter in catalog.chapters(found.id)]
+            quizzes = await _list_quizzes(db, chapter_ids, fields or QUIZ_FIELDS, after, size) if chapter_ids else []
+            headers = cache_headers(etag)
+            if size is not None:
+                headers.update(next_cursor_headers(quizzes, size))
+            return JSONResponse(content=quizzes, headers=headers)
+
+        # Serve the already-serialized bundle if this worker has it
+        cached = get_subject_quizzes(subject, standard, version)
+        if cached is not None:
+            return Response(content=cached, media_type="application/json", headers=cache_headers(etag))
+
+        # Load subject -> chapters -> quizzes in one query and all their questions in a second one
+        result = await db.execute(select(models.Quiz).join(
+            models.Chapter, models.Quiz.chapter_id == models.Chapter.id
+        ).join(
+            models.Subject, models.Chapter.subject_id == models.Subject.id
+        ).where(
             models.Subject.name == subject,
             models.Subject.standard == standard
-        ).first()
-        
-        if not subject_obj:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND, 
-                detail=f"Subject '{subject}' not found for standard {standard}"
-            )
-        
-        # Step 2: Get all chapters for this subject
-        chapters = db.query(models.Chapter).filter(
-            models.Chapter.subject_id == subject_obj.id
-        ).all()
-        
-        if not chapters:
-            return []  # Return empty list if no chapters found
-        
-        # Step 3: Get all quizzes for all chapters in this subject
-        chapter_ids = [chapter.id for chapter in chapters]
-        quizzes = db.query(models.Quiz).filter(
-            models.Quiz.chapter_id.in_(chapter_ids)
-        ).all()
-        
-        # Step 4: Format the response with questions included for offline caching
-        quiz_responses = []
-        for quiz in quizzes:
-            # Get all questions for this quiz
-            questions = db.query(models.QuizQuestion).filter(
-                models.QuizQuestion.quiz_id == quiz.id
-            ).order_by(models.QuizQuestion.question_number).all()
-            
-            # Format questions according to QuizQuestionResponse schema (without correct_option for students)
-            question_responses = []
-            for question in questions:
-                question_responses.append(QuizQuestionResponse(
-                    id=question.id,
-                    question_number=question.question_number,
-                    question_text=question.question_text,
-                    option_a=question.option_a,
-                    option_b=question.option_b,
-                    option_c=question.option_c,
-                    option_d=question.option_d
-                ))
-            
-            # Create complete quiz response with questions
-            quiz_responses.append(QuizResponse(
+        ).options(
+            selectinload(models.Quiz.questions)
+        ).order_by(models.Quiz.id))
+        quizzes = result.scalars().all()
+
+        if not quizzes:
+            subject_exists = await db.run_sync(find_subject, subject, standard)
+
+            if not subject_exists:
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND, 
+                    detail=f"Subject '{subject}' not found for standard {standard}"
+                )
+
+        # Format the response with questions included for offline caching
+        # (QuizQuestionResponse leaves out correct_option for students)
+        quiz_responses = [
+            QuizResponse(
                 id=quiz.id,
                 quiz_name=quiz.quiz_name,
                 description=quiz.description,
                 chapter_id=quiz.chapter_id,
                 is_active=quiz.is_active,
-                questions=question_responses
-            ))
-        
-        return quiz_responses
+                questions=[
+                    QuizQuestionResponse(
+                        id=question.id,
+                        question_number=question.question_number,
+                        question_text=question.question_text,
+                        option_a=question.option_a,
+                        option_b=question.option_b,
+                        option_c=question.option_c,
+                        option_d=question.option_d
+                    )
+                    for question in quiz.questions
+                ]
+            )
+            for quiz in quizzes
+        ]
+
+        payload = quiz_list_adapter.dump_json(quiz_responses)
+        set_subject_quizzes(subject, standard, version, payload)
+        return Response(content=payload, media_type="application/json", headers=cache_headers(etag))
         
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"An error occurred: {e}")
-    
 
+@router.post("/submit", status_code=status.HTTP_201_CREATED, response_model=QuizAttemptResponse)
+def submit_attempt(
+    request: StudentAttemptSubmit,
+    db: Session = Depends(get_db),
+    current_user: TokenData = Depends(student_only)
+):
+    # Grade everything in memory first so invalid submissions never touch the database
+    graded = grade_submission(db, request)
+
+    try:
+        attempt = save_attempt(db, current_user.user_id, graded)
+        # Built before commit so the expired attempt isn't reloaded afterwards
+        response = QuizAttemptResponse(
+            id=attempt.id,
+            quiz_id=attempt.quiz_id,
+            score=attempt.score,
+            total_questions=attempt.total_questions,
+            is_completed=attempt.is_completed
+        )
+        db.commit()
+        return response
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"An error occurred: {e}")
+
+@router.post("/submit-bulk", status_code=status.HTTP_200_OK, response_model=BulkAttemptResponse)
+def submit_attempts_bulk(
+    request: BulkAttemptSubmit,
+    db: Session = Depends(get_db),
+    current_user: TokenData = Depends(student_only)
+):
+    if len(request.attempts) > BULK_ATTEMPT_MAX:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"At most {BULK_ATTEMPT_MAX} attempts can be uploaded at once. Received {len(request.attempts)}."
+        )
+
+    # Grade everything first; a bad attempt is rejected on its own without failing the batch
+    results = {}
+    graded_by_key = {}
+    for attempt in request.attempts:
+        if attempt.idempotency_key in results or attempt.idempotency_key in graded_by_key:
+            continue  # Same attempt queued twice on the device
+        try:
+            graded_by_key[attempt.idempotency_key] = grade_submission(db, attempt)
+        except HTTPException as e:
+            results[attempt.idempotency_key] = BulkAttemptResult(
+                idempotency_key=attempt.idempotency_key, status="rejected", error=e.detail
+            )
+
+    try:
+        created, existing = save_queued_attempts(db, current_user.user_id, graded_by_key)
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"An error occurred: {e}")
+
+    for key, outcome in [(key, "created") for key in created] + [(key, "duplicate") for key in existing]:
+        row = created.get(key) or existing[key]
+        results[key] = BulkAttemptResult(
+            idempotency_key=key,
+            status=outcome,
+            attempt=QuizAttemptResponse(
+                id=row.id,
+                quiz_id=row.quiz_id,
+                score=row.score,
+                total_questions=row.total_questions,
+                is_completed=row.is_completed
+            )
+        )
 
+    # Results come back in the order the device sent them
+    ordered_keys = dict.fromkeys(attempt.idempotency_key for attempt in request.attempts)
+    return BulkAttemptResponse(results=[results[key] for key in ordered_keys if key in results])
@@ -0,0 +1,79 @@
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy import func, literal_column, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..schemas import SearchResponse, SearchResult
+from ..config import SEARCH_PAGE_SIZE, SEARCH_MAX_PAGE_SIZE
+from ..database import get_async_db
+from ..search_index import SEARCH_ENTITIES
+from .. import models
+
+router = APIRouter(
+    prefix="/search",
+    tags=["Search"]
+)
+
+# Must match the configuration of the SearchDocuments.document column
+SEARCH_CONFIG = literal_column("'english'::regconfig")
+HEADLINE_OPTIONS = "MaxFragments=1, MaxWords=20, MinWords=8, StartSel=<b>, StopSel=</b>"
+
+@router.get("", status_code=status.HTTP_200_OK, response_model=SearchResponse)
+async def search(
+    q: str = Query(..., min_length=1, max_length=200),
+    standard: Optional[int] = None,
+    subject: Optional[str] = None,
+    syllabus: Optional[str] = None,
+    entity: Optional[str] = None,
+    limit: int = Query(SEARCH_PAGE_SIZE, ge=1, le=SEARCH_MAX_PAGE_SIZE),
+    offset: int = Query(0, ge=0, le=10000),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Ranked full-text search over chapters, quizzes, quiz questions and PPT slide text.
+
+    q accepts web-search syntax: "quoted phrases", OR, and -excluded words.
+    """
+    if entity is not None and entity not in SEARCH_ENTITIES:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"entity must be one of {', '.join(SEARCH_ENTITIES)}")
+    try:
+        document = models.SearchDocument
+        ts_query = func.websearch_to_tsquery(SEARCH_CONFIG, q)
+        rank = func.ts_rank_cd(document.document, ts_query)
+
+        conditions = [document.document.op("@@")(ts_query)]
+        if standard is not None:
+            conditions.append(document.standard == standard)
+        if subject is not None:
+            conditions.append(document.subject == subject)
+        if syllabus is not None:
+            # Chapters and quizzes are shared by both boards; only PPTs belong to one
+            conditions.append(or_(document.syllabus == syllabus, document.syllabus.is_(None)))
+        if entity is not None:
+            conditions.append(document.entity == entity)
+
+        # Highlighting is the expensive part, so it only runs on the page being returned
+        page = (
+            select(document, rank.label("rank"))
+            .where(*conditions)
+            .order_by(rank.desc(), document.id)
+            .limit(limit + 1)
+            .offset(offset)
+            .subquery()
+        )
+        snippet = func.ts_headline(SEARCH_CONFIG, func.coalesce(func.nullif(page.c.body, ""), page.c.title), ts_query, HEADLINE_OPTIONS)
+        rows = (await db.execute(
+            select(page, snippet.label("snippet")).order_by(page.c.rank.desc(), page.c.id)
+        )).all()
+
+        results = [
+            SearchResult(
+                entity=row.entity, id=row.entity_id, title=row.title, snippet=row.snippet,
+                standard=row.standard, subject=row.subject, chapter=row.chapter,
+                syllabus=row.syllabus, quiz_id=row.quiz_id, rank=row.rank
+            )
+            for row in rows[:limit]
+        ]
+        return SearchResponse(results=results, has_more=len(rows) > limit)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"An error occurred: {e}")
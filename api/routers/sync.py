@@ -0,0 +1,66 @@
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy.orm import Session
+from ..schemas import SyncResponse, SyncUpserts, SyncDeletes, SyncSubject, SyncChapter, SyncQuiz, SyncQuizQuestion, SyncPPT
+from ..config import SYNC_PAGE_SIZE, SYNC_MAX_PAGE_SIZE
+from ..database import get_db
+from ..pagination import encode_cursor, decode_cursor
+from .. import models
+
+router = APIRouter(
+    prefix="/sync",
+    tags=["Sync"]
+)
+
+# entity name in the change log -> (model, schema, field on SyncUpserts/SyncDeletes)
+SYNC_ENTITIES = {
+    "subject": (models.Subject, SyncSubject, "subjects"),
+    "chapter": (models.Chapter, SyncChapter, "chapters"),
+    "quiz": (models.Quiz, SyncQuiz, "quizzes"),
+    "quiz_question": (models.QuizQuestion, SyncQuizQuestion, "quiz_questions"),
+    "ppt": (models.PPT, SyncPPT, "ppts"),
+}
+
+@router.get("", status_code=status.HTTP_200_OK, response_model=SyncResponse)
+def sync(
+    cursor: Optional[str] = None,
+    standard: Optional[int] = None,
+    limit: int = Query(SYNC_PAGE_SIZE, ge=1, le=SYNC_MAX_PAGE_SIZE),
+    db: Session = Depends(get_db)
+):
+    since = decode_cursor(cursor, "sync cursor")
+    try:
+        query = db.query(models.ChangeLog).filter(models.ChangeLog.id > since)
+        if standard is not None:
+            query = query.filter(models.ChangeLog.standard == standard)
+        changes = query.order_by(models.ChangeLog.id).limit(limit + 1).all()
+
+        has_more = len(changes) > limit
+        changes = changes[:limit]
+
+        # Only the latest operation per row in this page matters
+        latest = {}
+        for change in changes:
+            latest[(change.entity, change.entity_id)] = change.operation
+
+        upserts = SyncUpserts()
+        deletes = SyncDeletes()
+        for entity, (model, schema, field) in SYNC_ENTITIES.items():
+            upsert_ids = [entity_id for (name, entity_id), operation in latest.items() if name == entity and operation == "upsert"]
+            deleted_ids = [entity_id for (name, entity_id), operation in latest.items() if name == entity and operation == "delete"]
+
+            rows = []
+            if upsert_ids:
+                rows = db.query(model).filter(model.id.in_(upsert_ids)).order_by(model.id).all()
+            found_ids = {row.id for row in rows}
+
+            setattr(upserts, field, [schema.model_validate(row, from_attributes=True) for row in rows])
+            # Rows removed since they were logged are reported as deleted
+            setattr(deletes, field, deleted_ids + [entity_id for entity_id in upsert_ids if entity_id not in found_ids])
+
+        next_revision = changes[-1].id if changes else since
+        return SyncResponse(upserts=upserts, deletes=deletes, cursor=encode_cursor(next_revision), has_more=has_more)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"An error occurred: {e}")
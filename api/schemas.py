@@ -1,3 +1,4 @@
+from datetime import datetime
 from typing import List, Optional
 from pydantic import BaseModel
 from enum import Enum
@@ -56,6 +57,18 @@ class QuizCreate(BaseModel):
     description: Optional[str] = None
     questions: List[QuizQuestion]
 
+class QuizImportResult(BaseModel):
+    line: int  # line of the NDJSON body, starting at 1
+    quiz_name: Optional[str]
+    status: str  # created or rejected
+    quiz_id: Optional[int] = None
+    errors: List[str] = []
+
+class QuizImportResponse(BaseModel):
+    created: int
+    rejected: int
+    results: List[QuizImportResult]  # in line order
+
 class QuizResponse(BaseModel):
     id: int
     quiz_name: str
@@ -86,6 +99,12 @@ class StudentAttemptSubmit(BaseModel):
     quiz_id: int
     answers: List[StudentAnswerSubmit]
 
+class QueuedAttemptSubmit(StudentAttemptSubmit):
+    idempotency_key: str  # Generated on the device when the attempt is queued offline
+
+class BulkAttemptSubmit(BaseModel):
+    attempts: List[QueuedAttemptSubmit]
+
 class QuizAttemptStart(BaseModel):
     quiz_id: int
 
@@ -96,8 +115,192 @@ class QuizAttemptResponse(BaseModel):
     total_questions: int
     is_completed: bool
 
+class BulkAttemptResult(BaseModel):
+    idempotency_key: str
+    status: str  # created, duplicate or rejected
+    attempt: Optional[QuizAttemptResponse] = None
+    error: Optional[str] = None
+
+class BulkAttemptResponse(BaseModel):
+    results: List[BulkAttemptResult]
+
+# Curriculum Import Schemas
+
+class CurriculumSubjectResult(BaseModel):
+    id: int
+    name: str
+    standard: int
+
+class CurriculumChapterResult(BaseModel):
+    id: int
+    name: str
+    subject: str
+    standard: int
+
+class CurriculumConflict(BaseModel):
+    standard: int
+    subject: str
+    error: str
+
+class CurriculumImportResponse(BaseModel):
+    dry_run: bool = False  # True when nothing was committed
+    created_subjects: List[CurriculumSubjectResult] = []
+    created_chapters: List[CurriculumChapterResult] = []
+    skipped_subjects: List[CurriculumSubjectResult] = []  # already existed
+    skipped_chapters: List[CurriculumChapterResult] = []
+    conflicts: List[CurriculumConflict] = []  # not imported, with the reason
+
 class StudentAnswerResponse(BaseModel):
     id: int
     question_id: int
     selected_option: str
-    is_correct: bool
\ No newline at end of file
+    is_correct: bool
+
+# Delta Sync Schemas
+
+class SyncSubject(BaseModel):
+    id: int
+    name: str
+    standard: int
+
+class SyncChapter(BaseModel):
+    id: int
+    name: str
+    subject_id: int
+
+class SyncQuiz(BaseModel):
+    id: int
+    quiz_name: str
+    description: Optional[str]
+    chapter_id: int
+    is_active: bool
+
+class SyncQuizQuestion(QuizQuestionResponse):
+    quiz_id: int
+
+class SyncPPT(BaseModel):
+    id: int
+    syllabus: str
+    standard: int
+    subject: str
+    chapter: str
+    file_url: str
+    filename: str
+
+class SyncUpserts(BaseModel):
+    subjects: List[SyncSubject] = []
+    chapters: List[SyncChapter] = []
+    quizzes: List[SyncQuiz] = []
+    quiz_questions: List[SyncQuizQuestion] = []
+    ppts: List[SyncPPT] = []
+
+class SyncDeletes(BaseModel):
+    subjects: List[int] = []
+    chapters: List[int] = []
+    quizzes: List[int] = []
+    quiz_questions: List[int] = []
+    ppts: List[int] = []
+
+class SyncResponse(BaseModel):
+    upserts: SyncUpserts
+    deletes: SyncDeletes
+    cursor: str  # Pass back as ?cursor= on the next call
+    has_more: bool
+
+class SearchResult(BaseModel):
+    entity: str  # chapter, quiz, quiz_question or ppt
+    id: int
+    title: str
+    snippet: str  # matching text with <b>highlighted</b> terms
+    standard: int
+    subject: str
+    chapter: str
+    syllabus: Optional[str]
+    quiz_id: Optional[int]
+    rank: float
+
+class SearchResponse(BaseModel):
+    results: List[SearchResult]
+    has_more: bool
+
+# Analytics Schemas
+
+class ItemOption(BaseModel):
+    option: str
+    chosen: int
+    share: Optional[float]  # of everyone who answered the question
+    discrimination: Optional[float]  # point-biserial of choosing it; should be negative for a distractor
+
+class ItemAnalysis(BaseModel):
+    question_id: int
+    question_number: int
+    correct_option: str
+    responses: int
+    difficulty: Optional[float]  # p-value: share who answered correctly
+    discrimination: Optional[float]  # corrected point-biserial against the rest of the score
+    options: List[ItemOption]
+    flags: List[str]  # too_easy, too_hard, low_discrimination, misleading_option_X
+
+class QuizItemAnalysis(BaseModel):
+    quiz_id: int
+    quiz_name: str
+    attempts: int
+    mean_score: Optional[float]
+    score_stddev: Optional[float]
+    reliability: Optional[float]  # KR-20
+    items: List[ItemAnalysis]
+
+# Student Progress Schemas
+
+class ProgressSummary(BaseModel):
+    attempts: int
+    best_percent: float
+    last_percent: float
+    mastery: float  # recency-weighted average percentage
+    last_attempt_at: Optional[datetime]
+
+class ChapterProgress(ProgressSummary):
+    chapter_id: int
+    chapter: str
+
+class SubjectProgress(ProgressSummary):
+    subject_id: int
+    subject: str
+    standard: int
+    chapters: List[ChapterProgress]
+
+class StudentProgress(BaseModel):
+    student_id: int
+    subjects: List[SubjectProgress]
+
+# Teacher Report Schemas
+
+class LeaderboardEntry(BaseModel):
+    rank: int
+    student_id: int
+    name: str
+    mastery: float
+    best_percent: float
+    attempts: int
+
+class ChapterReport(BaseModel):
+    chapter_id: int
+    chapter: str
+    students: int  # with at least one completed attempt
+    completion_rate: float  # students / everyone in the standard
+    attempts: int
+    average_mastery: Optional[float]
+    average_best_percent: Optional[float]
+
+class SubjectReport(BaseModel):
+    subject_id: int
+    subject: str
+    standard: int
+    students: int  # everyone in the standard
+    active_students: int
+    completion_rate: float
+    attempts: int
+    average_mastery: Optional[float]
+    average_best_percent: Optional[float]
+    chapters: List[ChapterReport]  # weakest first; chapters nobody has attempted go last
+    leaderboard: List[LeaderboardEntry]
@@ -0,0 +1,104 @@
+from typing import Iterable, List, Optional
+from sqlalchemy import delete, func, literal, null, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+from . import models
+
+SEARCH_ENTITIES = ("chapter", "quiz", "quiz_question", "ppt")
+
+_COLUMNS = ["entity", "entity_id", "standard", "subject", "chapter", "syllabus", "quiz_id", "title", "body"]
+
+def _chapter_documents():
+    return (
+        select(
+            literal("chapter"), models.Chapter.id, models.Subject.standard, models.Subject.name,
+            models.Chapter.name, null(), null(), models.Chapter.name, null()
+        )
+        .join(models.Subject, models.Chapter.subject_id == models.Subject.id)
+    )
+
+def _quiz_documents():
+    return (
+        select(
+            literal("quiz"), models.Quiz.id, models.Subject.standard, models.Subject.name,
+            models.Chapter.name, null(), models.Quiz.id, models.Quiz.quiz_name, models.Quiz.description
+        )
+        .join(models.Chapter, models.Quiz.chapter_id == models.Chapter.id)
+        .join(models.Subject, models.Chapter.subject_id == models.Subject.id)
+    )
+
+def _question_documents():
+    question = models.QuizQuestion
+    return (
+        select(
+            literal("quiz_question"), question.id, models.Subject.standard, models.Subject.name,
+            models.Chapter.name, null(), question.quiz_id, question.question_text,
+            func.concat_ws(" ", question.option_a, question.option_b, question.option_c, question.option_d, question.explanation)
+        )
+        .join(models.Quiz, question.quiz_id == models.Quiz.id)
+        .join(models.Chapter, models.Quiz.chapter_id == models.Chapter.id)
+        .join(models.Subject, models.Chapter.subject_id == models.Subject.id)
+    )
+
+# entity -> (query producing _COLUMNS, id column to filter it by)
+_SOURCES = {
+    "chapter": (_chapter_documents, models.Chapter.id),
+    "quiz": (_quiz_documents, models.Quiz.id),
+    "quiz_question": (_question_documents, models.QuizQuestion.id),
+}
+
+def _upsert(stmt):
+    return stmt.on_conflict_do_update(
+        constraint="unique_search_document",
+        set_={column: stmt.excluded[column] for column in _COLUMNS[2:]}
+    )
+
+def _slide_text(slides: Optional[List[dict]]) -> Optional[str]:
+    if not slides:
+        return None
+    parts = []
+    for slide in slides:
+        if slide.get("title"):
+            parts.append(slide["title"])
+        parts.extend(slide.get("text") or [])
+    return "\n".join(parts)
+
+def _index_ppts(db: Session, condition):
+    # PPT text comes from the extracted preview, which may not exist yet
+    rows = db.execute(
+        select(models.PPT, models.PPTPreview.slides)
+        .outerjoin(models.PPTPreview, models.PPT.content_hash == models.PPTPreview.content_hash)
+        .where(condition)
+    ).all()
+    values = [
+        {
+            "entity": "ppt", "entity_id": ppt.id, "standard": ppt.standard, "subject": ppt.subject,
+            "chapter": ppt.chapter, "syllabus": ppt.syllabus, "quiz_id": None,
+            "title": ppt.chapter, "body": _slide_text(slides),
+        }
+        for ppt, slides in rows
+    ]
+    if values:
+        db.execute(_upsert(insert(models.SearchDocument).values(values)))
+
+def index_documents(db: Session, entity: str, entity_ids: Iterable[int], operation: str = "upsert"):
+    """Bring the search documents for these rows up to date in the caller's transaction"""
+    if entity not in SEARCH_ENTITIES:
+        return
+    entity_ids = list(entity_ids)
+    if not entity_ids:
+        return
+    if operation == "delete":
+        db.execute(delete(models.SearchDocument).where(
+            models.SearchDocument.entity == entity,
+            models.SearchDocument.entity_id.in_(entity_ids)
+        ))
+    elif entity == "ppt":
+        _index_ppts(db, models.PPT.id.in_(entity_ids))
+    else:
+        source, id_column = _SOURCES[entity]
+        db.execute(_upsert(insert(models.SearchDocument).from_select(_COLUMNS, source().where(id_column.in_(entity_ids)))))
+
+def index_ppt_content(db: Session, content_hash: str):
+    """Re-index every PPT using this file, once its text has been extracted"""
+    _index_ppts(db, models.PPT.content_hash == content_hash)
@@ -0,0 +1,235 @@
+"""Slide text and preview images from .pptx files, using only zipfile, ElementTree and Pillow.
+
+These functions run in the preview worker processes. The renderer is a rough
+approximation: it places a slide's pictures and text boxes at their positions,
+which is enough for a thumbnail, but it ignores themes, layouts and shapes.
+"""
+import io
+import posixpath
+import zipfile
+import xml.etree.ElementTree as ET
+from typing import Dict, List, NamedTuple, Optional, Tuple
+from PIL import Image, ImageDraw, ImageFont
+
+NS = {
+    "a": "http://schemas.openxmlformats.org/drawingml/2006/main",
+    "p": "http://schemas.openxmlformats.org/presentationml/2006/main",
+    "r": "http://schemas.openxmlformats.org/officeDocument/2006/relationships",
+    "rel": "http://schemas.openxmlformats.org/package/2006/relationships",
+}
+R_ID = f"{{{NS['r']}}}id"
+R_EMBED = f"{{{NS['r']}}}embed"
+
+EMU_PER_POINT = 12700
+DEFAULT_SLIDE_SIZE = (12192000, 6858000)  # 16:9 in EMU
+DEFAULT_FONT_POINTS = 18
+TITLE_FONT_POINTS = 36
+# Media bigger than this (uncompressed) is skipped rather than decoded
+MAX_MEDIA_BYTES = 40 * 1024 * 1024
+# A slide, relationship or presentation part bigger than this makes the deck unsupported
+MAX_XML_BYTES = 16 * 1024 * 1024
+# Uncompressed/compressed size above which a member is taken for a zip bomb; real decks stay far below
+MAX_COMPRESSION_RATIO = 200
+
+class UnsupportedDeck(Exception):
+    """Not a .pptx (e.g. a legacy binary .ppt)"""
+
+class SlideText(NamedTuple):
+    number: int
+    title: Optional[str]
+    text: List[str]
+
+class DeckPreview(NamedTuple):
+    slides: List[SlideText]
+    thumbnails: List[bytes]  # JPEG, one per rendered slide
+
+# Affine map from a shape's coordinates to slide EMU: (scale_x, scale_y, offset_x, offset_y)
+_IDENTITY = (1.0, 1.0, 0.0, 0.0)
+
+def _read_member(archive: zipfile.ZipFile, name: str, limit: int) -> bytes:
+    """A member's bytes, checked against its sizes in the central directory before anything is inflated.
+
+    zipfile stops at the recorded size, so a member can't expand past what was checked here.
+    """
+    info = archive.getinfo(name)
+    if info.file_size > limit or info.file_size > max(info.compress_size, 1) * MAX_COMPRESSION_RATIO:
+        raise UnsupportedDeck(f"{name} is too large ({info.file_size} bytes uncompressed, {info.compress_size} compressed)")
+    return archive.read(info)
+
+def _read_xml(archive: zipfile.ZipFile, name: str) -> Optional[ET.Element]:
+    try:
+        return ET.fromstring(_read_member(archive, name, MAX_XML_BYTES))
+    except KeyError:
+        return None
+
+def _relationships(archive: zipfile.ZipFile, part: str) -> Dict[str, str]:
+    """Relationship id -> target part name for the given part"""
+    folder, filename = posixpath.split(part)
+    root = _read_xml(archive, posixpath.join(folder, "_rels", f"{filename}.rels"))
+    if root is None:
+        return {}
+    return {
+        rel.get("Id"): posixpath.normpath(posixpath.join(folder, rel.get("Target")))
+        for rel in root.findall("rel:Relationship", NS)
+        if rel.get("TargetMode") != "External"
+    }
+
+def _slide_parts(archive: zipfile.ZipFile) -> Tuple[List[str], Tuple[int, int]]:
+    """Slide part names in presentation order, and the slide size in EMU"""
+    presentation = _read_xml(archive, "ppt/presentation.xml")
+    if presentation is None:
+        raise UnsupportedDeck("No ppt/presentation.xml")
+    size = presentation.find("p:sldSz", NS)
+    slide_size = (int(size.get("cx")), int(size.get("cy"))) if size is not None else DEFAULT_SLIDE_SIZE
+    rels = _relationships(archive, "ppt/presentation.xml")
+    parts = [rels[slide.get(R_ID)] for slide in presentation.findall("p:sldIdLst/p:sldId", NS) if slide.get(R_ID) in rels]
+    return parts, slide_size
+
+def _paragraphs(shape: ET.Element) -> List[Tuple[str, Optional[int]]]:
+    """(text, font size in points) for each non-empty paragraph of a shape"""
+    paragraphs = []
+    for paragraph in shape.findall(".//a:p", NS):
+        text = "".join(run.text or "" for run in paragraph.iter(f"{{{NS['a']}}}t")).strip()
+        if not text:
+            continue
+        sizes = [int(props.get("sz")) for props in paragraph.iter(f"{{{NS['a']}}}rPr") if props.get("sz")]
+        paragraphs.append((text, sizes[0] // 100 if sizes else None))
+    return paragraphs
+
+def _placeholder_type(shape: ET.Element) -> Optional[str]:
+    placeholder = shape.find("./*/p:nvPr/p:ph", NS)
+    if placeholder is None:
+        return None
+    return placeholder.get("type", "body")
+
+def _box(element: ET.Element, transform) -> Optional[Tuple[float, float, float, float]]:
+    """(x, y, width, height) in slide EMU, or None when the position is inherited from the layout"""
+    xfrm = element.find("./p:spPr/a:xfrm", NS)
+    if xfrm is None:
+        xfrm = element.find("./p:grpSpPr/a:xfrm", NS)
+    if xfrm is None or xfrm.find("a:off", NS) is None or xfrm.find("a:ext", NS) is None:
+        return None
+    scale_x, scale_y, offset_x, offset_y = transform
+    off, ext = xfrm.find("a:off", NS), xfrm.find("a:ext", NS)
+    return (
+        offset_x + int(off.get("x")) * scale_x,
+        offset_y + int(off.get("y")) * scale_y,
+        int(ext.get("cx")) * scale_x,
+        int(ext.get("cy")) * scale_y,
+    )
+
+def _group_transform(group: ET.Element, transform):
+    xfrm = group.find("./p:grpSpPr/a:xfrm", NS)
+    child_off = xfrm.find("a:chOff", NS) if xfrm is not None else None
+    child_ext = xfrm.find("a:chExt", NS) if xfrm is not None else None
+    box = _box(group, transform)
+    if box is None or child_off is None or child_ext is None:
+        return transform
+    x, y, width, height = box
+    scale_x = width / max(int(child_ext.get("cx")), 1)
+    scale_y = height / max(int(child_ext.get("cy")), 1)
+    return (scale_x, scale_y, x - int(child_off.get("x")) * scale_x, y - int(child_off.get("y")) * scale_y)
+
+def _walk(tree: ET.Element, transform=_IDENTITY):
+    """Yield (tag, element, transform) for the shapes and pictures of a shape tree, in z-order"""
+    for child in tree:
+        tag = child.tag.rsplit("}", 1)[-1]
+        if tag == "grpSp":
+            yield from _walk(child, _group_transform(child, transform))
+        elif tag in ("sp", "pic"):
+            yield tag, child, transform
+
+def _wrap(draw: ImageDraw.ImageDraw, text: str, font, width: float) -> List[str]:
+    lines, line = [], ""
+    for word in text.split():
+        candidate = f"{line} {word}" if line else word
+        if line and draw.textlength(candidate, font=font) > width:
+            lines.append(line)
+            line = word
+        else:
+            line = candidate
+    if line:
+        lines.append(line)
+    return lines
+
+def _render(archive, part, root, slide_size, width) -> bytes:
+    slide_width, slide_height = slide_size
+    scale = width / slide_width
+    height = max(1, round(slide_height * scale))
+    image = Image.new("RGB", (width, height), "white")
+    draw = ImageDraw.Draw(image)
+    rels = _relationships(archive, part)
+    fonts = {}
+
+    def font(points):
+        pixels = max(6, round(points * EMU_PER_POINT * scale))
+        if pixels not in fonts:
+            # Without FreeType this is a fixed-size bitmap font, which is still fine for a thumbnail
+            fonts[pixels] = ImageFont.load_default(size=pixels)
+        return fonts[pixels], pixels
+
+    tree = root.find("p:cSld/p:spTree", NS)
+    for tag, element, transform in _walk(tree if tree is not None else []):
+        box = _box(element, transform)
+        if tag == "pic":
+            blip = element.find(".//a:blip", NS)
+            target = rels.get(blip.get(R_EMBED)) if blip is not None else None
+            if box is None or target is None:
+                continue
+            try:
+                with Image.open(io.BytesIO(_read_member(archive, target, MAX_MEDIA_BYTES))) as picture:
+                    size = (max(1, round(box[2] * scale)), max(1, round(box[3] * scale)))
+                    picture.draft("RGB", size)
+                    picture = picture.convert("RGBA").resize(size)
+                    image.paste(picture, (round(box[0] * scale), round(box[1] * scale)), picture)
+            except Exception:
+                # EMF/WMF and other formats Pillow can't decode are left out of the preview
+                continue
+        else:
+            paragraphs = _paragraphs(element)
+            if not paragraphs:
+                continue
+            is_title = _placeholder_type(element) in ("title", "ctrTitle")
+            if box is None:
+                # Placeholder positioned by its layout: assume the usual title/body areas
+                box = (slide_width * 0.06, slide_height * (0.05 if is_title else 0.25), slide_width * 0.88, slide_height * (0.18 if is_title else 0.68))
+            x, y = box[0] * scale, box[1] * scale
+            for text, points in paragraphs:
+                line_font, pixels = font(points or (TITLE_FONT_POINTS if is_title else DEFAULT_FONT_POINTS))
+                line_height = pixels * 1.2
+                for line in _wrap(draw, text, line_font, box[2] * scale):
+                    # Decks often rely on autofit shrinking text, so only stop at the slide's edge
+                    if y >= height:
+                        break
+                    draw.text((x, y), line, fill="black", font=line_font)
+                    y += line_height
+
+    output = io.BytesIO()
+    image.save(output, "JPEG", quality=80, optimize=True)
+    return output.getvalue()
+
+def extract_preview(path: str, render_slides: int, width: int) -> DeckPreview:
+    """Text of every slide plus JPEG thumbnails of the first render_slides slides"""
+    if not zipfile.is_zipfile(path):
+        raise UnsupportedDeck("Not a .pptx file")
+    with zipfile.ZipFile(path) as archive:
+        parts, slide_size = _slide_parts(archive)
+        slides, thumbnails = [], []
+        for number, part in enumerate(parts, start=1):
+            root = _read_xml(archive, part)
+            if root is None:
+                continue
+            title, text = None, []
+            tree = root.find("p:cSld/p:spTree", NS)
+            for tag, element, _ in _walk(tree if tree is not None else []):
+                if tag != "sp":
+                    continue
+                paragraphs = [paragraph for paragraph, _ in _paragraphs(element)]
+                if title is None and paragraphs and _placeholder_type(element) in ("title", "ctrTitle"):
+                    title = " ".join(paragraphs)
+                else:
+                    text.extend(paragraphs)
+            slides.append(SlideText(number=number, title=title, text=text))
+            if number <= render_slides:
+                thumbnails.append(_render(archive, part, root, slide_size, width))
+        return DeckPreview(slides=slides, thumbnails=thumbnails)
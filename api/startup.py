@@ -0,0 +1,111 @@
+"""Where startup time goes: init steps always, module imports with STARTUP_PROFILE=1
+
+Cold starts have to fit inside the platform's health-check window, so the
+report printed once the app is ready names the slowest steps and packages.
+"""
+import sys
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from importlib.abc import MetaPathFinder
+from threading import Lock, local
+
+STARTED = time.perf_counter()
+_lock = Lock()
+_steps = []        # (name, seconds) in the order they ran
+_imports = {}      # module -> (cumulative seconds, self seconds)
+_ready_at = None
+_stack = local()
+
+@contextmanager
+def step(name: str):
+    """Time one init step (settings, engines, worker pools...) for the startup report"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_step(name, time.perf_counter() - started)
+
+class _TimedLoader:
+    """Wraps a module's loader to time exec_module, minus the time spent in nested imports"""
+
+    def __init__(self, loader):
+        self._loader = loader
+
+    def __getattr__(self, name):
+        return getattr(self._loader, name)
+
+    def create_module(self, spec):
+        return self._loader.create_module(spec)
+
+    def exec_module(self, module):
+        frames = getattr(_stack, "frames", None)
+        if frames is None:
+            frames = _stack.frames = []
+        frames.append(0.0)
+        started = time.perf_counter()
+        try:
+            self._loader.exec_module(module)
+        finally:
+            elapsed = time.perf_counter() - started
+            nested = frames.pop()
+            if frames:
+                frames[-1] += elapsed
+            with _lock:
+                _imports[module.__name__] = (elapsed, elapsed - nested)
+
+class _TimingFinder(MetaPathFinder):
+    def find_spec(self, fullname, path=None, target=None):
+        for finder in sys.meta_path:
+            if finder is self or not hasattr(finder, "find_spec"):
+                continue
+            spec = finder.find_spec(fullname, path, target)
+            if spec is not None:
+                if spec.loader is not None and hasattr(spec.loader, "exec_module"):
+                    spec.loader = _TimedLoader(spec.loader)
+                return spec
+        return None
+
+def install_import_timer():
+    """Time every module imported from now on. Costs a little on each import, so it's opt-in"""
+    if not any(isinstance(finder, _TimingFinder) for finder in sys.meta_path):
+        sys.meta_path.insert(0, _TimingFinder())
+
+def record_step(name: str, seconds: float):
+    with _lock:
+        _steps.append((name, seconds))
+
+def mark_ready():
+    global _ready_at
+    _ready_at = time.perf_counter()
+
+def startup_report(top: int = 10) -> dict:
+    with _lock:
+        steps = list(_steps)
+        imports = dict(_imports)
+    # Self time summed per top-level package, so nothing is counted twice
+    packages = defaultdict(float)
+    for module, (_, own) in imports.items():
+        packages[module.partition(".")[0]] += own
+    report = {
+        "ready_seconds": round(_ready_at - STARTED, 4) if _ready_at is not None else None,
+        "steps": [{"step": name, "seconds": round(seconds, 4)} for name, seconds in steps],
+    }
+    if imports:
+        report["slowest_packages"] = [
+            {"package": name, "seconds": round(seconds, 4)}
+            for name, seconds in sorted(packages.items(), key=lambda item: item[1], reverse=True)[:top]
+        ]
+        report["slowest_modules"] = [
+            {"module": name, "seconds": round(own, 4), "cumulative_seconds": round(cumulative, 4)}
+            for name, (cumulative, own) in sorted(imports.items(), key=lambda item: item[1][1], reverse=True)[:top]
+        ]
+    return report
+
+def print_startup_report(top: int = 5):
+    report = startup_report(top)
+    steps = ", ".join(f"{s['step']} {s['seconds'] * 1000:.0f}ms" for s in sorted(report["steps"], key=lambda s: s["seconds"], reverse=True)[:top])
+    print(f"🚀 Ready {report['ready_seconds']:.2f}s after the api package was imported. Slowest steps: {steps or 'none'}")
+    if "slowest_packages" in report:
+        packages = ", ".join(f"{p['package']} {p['seconds'] * 1000:.0f}ms" for p in report["slowest_packages"])
+        print(f"📦 Slowest imports: {packages}")
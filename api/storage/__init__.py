@@ -0,0 +1,24 @@
+from .base import StorageBackend, StoredFile, ObjectStat, upload_size, iter_chunks, receive_upload
+from ..config import STORAGE_BACKEND
+
+_backend = None
+
+def get_storage() -> StorageBackend:
+    """The configured storage backend, created on first use"""
+    global _backend
+    if _backend is None:
+        if STORAGE_BACKEND == "local":
+            from .local import LocalStorage
+            _backend = LocalStorage()
+        elif STORAGE_BACKEND == "supabase":
+            from .supabase_backend import SupabaseStorage
+            _backend = SupabaseStorage()
+        else:
+            raise ValueError(f"Unknown STORAGE_BACKEND '{STORAGE_BACKEND}', expected 'supabase' or 'local'")
+    return _backend
+
+async def close_storage():
+    global _backend
+    if _backend is not None:
+        await _backend.close()
+        _backend = None
@@ -0,0 +1,148 @@
+import hashlib
+import os
+from abc import ABC, abstractmethod
+from typing import AsyncIterator, List, NamedTuple, Optional, Tuple, Type, TypeVar
+from fastapi import HTTPException, Request, UploadFile, status
+from fastapi.exceptions import RequestValidationError
+from pydantic import BaseModel, ValidationError
+from starlette.datastructures import UploadFile as ParsedFile
+from starlette.formparsers import MultiPartException, MultiPartParser
+from ..config import PPT_MAX_UPLOAD_BYTES
+
+# Room for the form fields and multipart boundaries around the file itself
+MULTIPART_OVERHEAD_BYTES = 64 * 1024
+
+Form = TypeVar("Form", bound=BaseModel)
+
+class StoredFile(NamedTuple):
+    path: str
+    size: int
+    sha256: str
+
+class ObjectStat(NamedTuple):
+    size: int
+    content_type: Optional[str]
+
+class StorageBackend(ABC):
+    """Where PPT files are kept. Paths are relative to a bucket (the syllabus)."""
+
+    @abstractmethod
+    async def create_bucket(self, bucket: str) -> bool:
+        """Create the bucket; False if it already existed"""
+
+    @abstractmethod
+    async def upload(self, bucket: str, path: str, file: UploadFile) -> StoredFile:
+        """Stream the upload in constant memory; fails if the path is taken"""
+
+    @abstractmethod
+    async def put(self, bucket: str, path: str, data: bytes, content_type: str):
+        """Write a small generated object, replacing any existing one"""
+
+    @abstractmethod
+    async def remove(self, bucket: str, paths: List[str]):
+        """Delete the objects, ignoring ones that are already gone"""
+
+    @abstractmethod
+    def public_url(self, bucket: str, path: str) -> str:
+        pass
+
+    @abstractmethod
+    async def stat(self, bucket: str, path: str) -> Optional[ObjectStat]:
+        """Size and type of the object, or None if it doesn't exist"""
+
+    @abstractmethod
+    async def read_range(self, bucket: str, path: str, start: int, end: int) -> bytes:
+        """Bytes [start, end) of the object"""
+
+    async def close(self):
+        pass
+
+def upload_size(file: UploadFile) -> int:
+    """Size of the spooled upload, rejected up front when it is over the limit"""
+    size = file.size
+    if size is None:
+        file.file.seek(0, os.SEEK_END)
+        size = file.file.tell()
+    file.file.seek(0)
+    if size > PPT_MAX_UPLOAD_BYTES:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"File is {size} bytes, the limit is {PPT_MAX_UPLOAD_BYTES} bytes"
+        )
+    return size
+
+async def iter_chunks(file: UploadFile, chunk_size: int, hasher=None, limit: int = PPT_MAX_UPLOAD_BYTES) -> AsyncIterator[bytes]:
+    """Yield the upload in fixed-size chunks, hashing as we go and enforcing the size limit"""
+    total = 0
+    while chunk := await file.read(chunk_size):
+        total += len(chunk)
+        if total > limit:
+            raise HTTPException(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                detail=f"File is larger than the {limit} byte limit"
+            )
+        if hasher is not None:
+            hasher.update(chunk)
+        yield chunk
+
+class _FileTooLarge(MultiPartException):
+    pass
+
+class _HashingMultiPartParser(MultiPartParser):
+    """Starlette's multipart parser, hashing and counting the file part as it comes off the socket"""
+
+    def __init__(self, request: Request, limit: int):
+        super().__init__(request.headers, request.stream(), max_files=1, max_fields=20)
+        self.hasher = hashlib.sha256()
+        self.size = 0
+        self.limit = limit
+
+    def on_part_data(self, data: bytes, start: int, end: int) -> None:
+        if self._current_part.file is not None:
+            self.size += end - start
+            if self.size > self.limit:
+                # A MultiPartException, so the parser closes the spooled file
+                raise _FileTooLarge(f"File is larger than the {self.limit} byte limit")
+            self.hasher.update(data[start:end])
+        super().on_part_data(data, start, end)
+
+async def receive_upload(
+    request: Request, schema: Type[Form], field: str = "file", limit: int = PPT_MAX_UPLOAD_BYTES
+) -> Tuple[Form, UploadFile, StoredFile]:
+    """Read a multipart form with one file, hashing the file while the body streams in.
+
+    A body whose Content-Length already says it's too big is refused before any of it
+    is read, and a file that grows past the limit stops the read there. Returns the
+    other form fields as schema, the spooled file (rewound; the caller closes it) and
+    its size and SHA-256.
+    """
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > limit + MULTIPART_OVERHEAD_BYTES:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Request is {content_length} bytes, the file limit is {limit} bytes"
+        )
+    if not request.headers.get("content-type", "").startswith("multipart/form-data"):
+        raise HTTPException(status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE, detail="Expected a multipart/form-data upload")
+
+    parser = _HashingMultiPartParser(request, limit)
+    try:
+        form = await parser.parse()
+    except _FileTooLarge as e:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=str(e))
+    except MultiPartException as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=e.message)
+
+    file = form.get(field)
+    try:
+        # Starlette's parser makes starlette UploadFiles, which FastAPI's subclasses
+        if not isinstance(file, ParsedFile):
+            raise RequestValidationError([{"type": "missing", "loc": ("body", field), "msg": "Field required", "input": None}])
+        try:
+            fields = schema.model_validate({name: value for name, value in form.items() if isinstance(value, str)})
+        except ValidationError as e:
+            raise RequestValidationError([{**error, "loc": ("body", *error["loc"])} for error in e.errors()])
+    except RequestValidationError:
+        await form.close()
+        raise
+    return fields, file, StoredFile(path=file.filename, size=parser.size, sha256=parser.hasher.hexdigest())
@@ -0,0 +1,96 @@
+import hashlib
+import os
+import tempfile
+from typing import AsyncIterator, List, Optional
+from urllib.parse import quote
+import anyio
+from fastapi import HTTPException, UploadFile, status
+from .base import StorageBackend, StoredFile, ObjectStat, upload_size, iter_chunks
+from ..config import LOCAL_STORAGE_DIR, PUBLIC_BASE_URL, UPLOAD_CHUNK_SIZE
+
+class LocalStorage(StorageBackend):
+    """Files on this machine's disk, served by the API itself from /ppts/files"""
+
+    def __init__(self, root: str = LOCAL_STORAGE_DIR, base_url: str = PUBLIC_BASE_URL):
+        self.root = os.path.realpath(root)
+        self.base_url = base_url
+        os.makedirs(self.root, exist_ok=True)
+
+    def file_path(self, bucket: str, path: str) -> str:
+        """Absolute path of an object, refusing anything that escapes the storage root"""
+        full_path = os.path.realpath(os.path.join(self.root, bucket, path))
+        if not full_path.startswith(self.root + os.sep):
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid file path")
+        return full_path
+
+    def _temp_path(self, full_path: str) -> str:
+        # Written under a temporary name and renamed, so readers never see half a file
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(full_path), suffix=".part")
+        os.close(fd)
+        return tmp_path
+
+    async def _write(self, full_path: str, chunks: AsyncIterator[bytes]):
+        # Every filesystem call goes through a worker thread; none of them block the event loop
+        tmp_path = await anyio.to_thread.run_sync(self._temp_path, full_path)
+        try:
+            async with await anyio.open_file(tmp_path, "wb") as out:
+                async for chunk in chunks:
+                    await out.write(chunk)
+            await anyio.to_thread.run_sync(os.replace, tmp_path, full_path)
+        except BaseException:
+            with anyio.CancelScope(shield=True):
+                await anyio.to_thread.run_sync(os.unlink, tmp_path)
+            raise
+
+    async def create_bucket(self, bucket: str) -> bool:
+        def create() -> bool:
+            bucket_path = self.file_path(bucket, "")
+            if os.path.isdir(bucket_path):
+                return False
+            os.makedirs(bucket_path, exist_ok=True)
+            return True
+
+        return await anyio.to_thread.run_sync(create)
+
+    async def upload(self, bucket: str, path: str, file: UploadFile) -> StoredFile:
+        size = upload_size(file)
+        full_path = await anyio.to_thread.run_sync(self.file_path, bucket, path)
+        if await anyio.to_thread.run_sync(os.path.exists, full_path):
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=f"{bucket}/{path} already exists")
+        hasher = hashlib.sha256()
+        await self._write(full_path, iter_chunks(file, UPLOAD_CHUNK_SIZE, hasher))
+        return StoredFile(path=path, size=size, sha256=hasher.hexdigest())
+
+    async def put(self, bucket: str, path: str, data: bytes, content_type: str):
+        async def single():
+            yield data
+
+        await self._write(await anyio.to_thread.run_sync(self.file_path, bucket, path), single())
+
+    async def remove(self, bucket: str, paths: List[str]):
+        def remove_all():
+            for path in paths:
+                try:
+                    os.unlink(self.file_path(bucket, path))
+                except FileNotFoundError:
+                    pass
+
+        await anyio.to_thread.run_sync(remove_all)
+
+    def public_url(self, bucket: str, path: str) -> str:
+        return f"{self.base_url}/ppts/files/{bucket}/{quote(path)}"
+
+    async def stat(self, bucket: str, path: str) -> Optional[ObjectStat]:
+        full_path = await anyio.to_thread.run_sync(self.file_path, bucket, path)
+        try:
+            stat_result = await anyio.to_thread.run_sync(os.stat, full_path)
+        except FileNotFoundError:
+            return None
+        return ObjectStat(size=stat_result.st_size, content_type=None)
+
+    async def read_range(self, bucket: str, path: str, start: int, end: int) -> bytes:
+        full_path = await anyio.to_thread.run_sync(self.file_path, bucket, path)
+        async with await anyio.open_file(full_path, "rb") as source:
+            await source.seek(start)
+            return await source.read(max(end - start, 0))
@@ -0,0 +1,146 @@
+import base64
+import hashlib
+from typing import List, Optional
+from urllib.parse import quote
+import httpx
+from fastapi import HTTPException, UploadFile, status
+from .base import StorageBackend, StoredFile, ObjectStat, upload_size, iter_chunks
+from ..config import (
+    SUPABASE_URL, SUPABASE_KEY, UPLOAD_CHUNK_SIZE, STORAGE_MAX_CONNECTIONS,
+    RESUMABLE_UPLOAD_THRESHOLD, RESUMABLE_CHUNK_SIZE, RESUMABLE_MAX_RETRIES, STORAGE_TIMEOUT_SECONDS
+)
+
+def _raise_for_storage(response: httpx.Response, action: str):
+    if response.status_code >= 400:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to {action} in Supabase Storage: {response.status_code} {response.text}"
+        )
+
+def _tus_metadata(**values) -> str:
+    return ",".join(f"{key} {base64.b64encode(value.encode()).decode()}" for key, value in values.items())
+
+class SupabaseStorage(StorageBackend):
+    """Supabase Storage over its REST API with one pooled async HTTP client per worker"""
+
+    def __init__(self, url: str = SUPABASE_URL, key: str = SUPABASE_KEY):
+        self.url = url.rstrip("/")
+        self.client = httpx.AsyncClient(
+            base_url=f"{self.url}/storage/v1",
+            headers={"Authorization": f"Bearer {key}", "apikey": key},
+            timeout=httpx.Timeout(STORAGE_TIMEOUT_SECONDS, connect=10.0),
+            limits=httpx.Limits(max_connections=STORAGE_MAX_CONNECTIONS, max_keepalive_connections=STORAGE_MAX_CONNECTIONS)
+        )
+
+    async def create_bucket(self, bucket: str) -> bool:
+        response = await self.client.post("/bucket", json={"id": bucket, "name": bucket, "public": True})
+        if response.status_code >= 400 and "already exists" in response.text.lower():
+            return False
+        _raise_for_storage(response, f"create bucket {bucket}")
+        return True
+
+    async def upload(self, bucket: str, path: str, file: UploadFile) -> StoredFile:
+        size = upload_size(file)
+        content_type = file.content_type or "application/octet-stream"
+        hasher = hashlib.sha256()
+
+        if size > RESUMABLE_UPLOAD_THRESHOLD:
+            await self._upload_resumable(bucket, path, file, size, content_type, hasher)
+        else:
+            response = await self.client.post(
+                f"/object/{bucket}/{quote(path)}",
+                content=iter_chunks(file, UPLOAD_CHUNK_SIZE, hasher),
+                headers={"Content-Type": content_type, "Content-Length": str(size), "x-upsert": "false"}
+            )
+            _raise_for_storage(response, "upload file")
+
+        return StoredFile(path=path, size=size, sha256=hasher.hexdigest())
+
+    async def _hash_range(self, file: UploadFile, hasher, start: int, end: int):
+        await file.seek(start)
+        while start < end:
+            block = await file.read(min(UPLOAD_CHUNK_SIZE, end - start))
+            if not block:
+                break
+            hasher.update(block)
+            start += len(block)
+
+    async def _upload_resumable(self, bucket: str, path: str, file: UploadFile, size: int, content_type: str, hasher):
+        tus_headers = {"Tus-Resumable": "1.0.0"}
+        response = await self.client.post(
+            "/upload/resumable",
+            headers={
+                **tus_headers,
+                "Upload-Length": str(size),
+                "Upload-Metadata": _tus_metadata(bucketName=bucket, objectName=path, contentType=content_type),
+            }
+        )
+        _raise_for_storage(response, "start resumable upload")
+        location = response.headers["Location"]
+
+        offset = 0
+        hashed_up_to = 0
+        retries = 0
+        while offset < size:
+            await file.seek(offset)
+            chunk = await file.read(RESUMABLE_CHUNK_SIZE)
+            try:
+                response = await self.client.patch(
+                    location,
+                    content=chunk,
+                    headers={**tus_headers, "Upload-Offset": str(offset), "Content-Type": "application/offset+octet-stream"}
+                )
+                _raise_for_storage(response, "upload chunk")
+            except (httpx.TransportError, HTTPException):
+                retries += 1
+                if retries > RESUMABLE_MAX_RETRIES:
+                    raise
+                # Ask the server how much it kept and carry on from there
+                head = await self.client.head(location, headers=tus_headers)
+                _raise_for_storage(head, "resume upload")
+                new_offset = int(head.headers["Upload-Offset"])
+            else:
+                retries = 0
+                new_offset = int(response.headers.get("Upload-Offset", offset + len(chunk)))
+
+            # Hash each byte exactly once, in order, however the retries went
+            if new_offset > hashed_up_to:
+                if offset <= hashed_up_to and new_offset <= offset + len(chunk):
+                    hasher.update(chunk[hashed_up_to - offset:new_offset - offset])
+                else:
+                    await self._hash_range(file, hasher, hashed_up_to, new_offset)
+                hashed_up_to = new_offset
+            offset = new_offset
+
+    async def put(self, bucket: str, path: str, data: bytes, content_type: str):
+        response = await self.client.post(
+            f"/object/{bucket}/{quote(path)}",
+            content=data,
+            headers={"Content-Type": content_type, "x-upsert": "true"}
+        )
+        _raise_for_storage(response, "write file")
+
+    async def remove(self, bucket: str, paths: List[str]):
+        response = await self.client.request("DELETE", f"/object/{bucket}", json={"prefixes": paths})
+        _raise_for_storage(response, "remove files")
+
+    def public_url(self, bucket: str, path: str) -> str:
+        return f"{self.url}/storage/v1/object/public/{bucket}/{quote(path)}"
+
+    async def stat(self, bucket: str, path: str) -> Optional[ObjectStat]:
+        response = await self.client.head(f"/object/{bucket}/{quote(path)}")
+        if response.status_code in (400, 404):
+            return None
+        _raise_for_storage(response, "stat file")
+        return ObjectStat(size=int(response.headers.get("Content-Length", 0)), content_type=response.headers.get("Content-Type"))
+
+    async def read_range(self, bucket: str, path: str, start: int, end: int) -> bytes:
+        if end <= start:
+            return b""
+        response = await self.client.get(f"/object/{bucket}/{quote(path)}", headers={"Range": f"bytes={start}-{end - 1}"})
+        _raise_for_storage(response, "read file")
+        # A server that ignores Range sends the whole object
+        return response.content if response.status_code == 206 else response.content[start:end]
+
+    async def close(self):
+        await self.client.aclose()
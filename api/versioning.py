@@ -0,0 +1,92 @@
+from threading import Lock
+from hashlib import sha1
+from cachetools import TTLCache
+from fastapi import Request, Response, status
+from sqlalchemy import event, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+from .config import CONTENT_VERSION_CACHE_SIZE, CONTENT_VERSION_TTL_SECONDS
+from . import models
+
+# Versions are cached per worker so conditional GETs can be answered without
+# touching the database. Writes on this worker drop their scopes on commit;
+# writes on other workers are picked up once the entry expires.
+_versions = TTLCache(maxsize=CONTENT_VERSION_CACHE_SIZE, ttl=CONTENT_VERSION_TTL_SECONDS)
+_versions_lock = Lock()
+# Bumped whenever a commit drops a scope, so a read that started before the
+# commit can tell not to cache the version it got
+_generations = {}
+
+def courses_scope(standard: int) -> str:
+    return f"standard:{standard}"
+
+def chapters_scope(subject: str) -> str:
+    return f"chapters:{subject}"
+
+def quizzes_scope(subject: str, standard: int) -> str:
+    return f"quizzes:{subject}:{standard}"
+
+def _cached_version(scope: str):
+    """(cached version or None, the scope's current generation)"""
+    with _versions_lock:
+        return _versions.get(scope), _generations.get(scope, 0)
+
+def _remember_version(scope: str, version: int, generation: int):
+    with _versions_lock:
+        # A commit since the read began means the value may already be stale
+        if _generations.get(scope, 0) == generation:
+            _versions[scope] = version
+
+def _version_query(scope: str):
+    return select(models.ContentVersion.version).where(models.ContentVersion.scope == scope)
+
+async def get_version_async(db: AsyncSession, scope: str) -> int:
+    version, generation = _cached_version(scope)
+    if version is None:
+        version = (await db.execute(_version_query(scope))).scalar() or 0
+        _remember_version(scope, version, generation)
+    return version
+
+def bump_version(db: Session, scope: str):
+    """Increment the scope's version as part of the caller's transaction"""
+    stmt = insert(models.ContentVersion).values(scope=scope, version=1)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[models.ContentVersion.scope],
+        set_={"version": models.ContentVersion.version + 1}
+    )
+    db.execute(stmt)
+    db.info.setdefault("bumped_scopes", set()).add(scope)
+
+@event.listens_for(Session, "after_commit")
+def _forget_committed_versions(session):
+    scopes = session.info.pop("bumped_scopes", None)
+    if scopes:
+        with _versions_lock:
+            for scope in scopes:
+                _versions.pop(scope, None)
+                _generations[scope] = _generations.get(scope, 0) + 1
+
+@event.listens_for(Session, "after_rollback")
+def _discard_rolled_back_versions(session):
+    session.info.pop("bumped_scopes", None)
+
+def make_etag(scope: str, version: int) -> str:
+    return f'"{sha1(scope.encode()).hexdigest()[:16]}-{version}"'
+
+def is_not_modified(request: Request, etag: str) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # If-None-Match uses the weak comparison, so a W/ prefix still matches
+    candidates = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return etag in candidates
+
+def not_modified_response(etag: str) -> Response:
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=cache_headers(etag))
+
+def cache_headers(etag: str) -> dict:
+    # Clients may keep the payload but must revalidate it before every use
+    return {"ETag": etag, "Cache-Control": "no-cache"}
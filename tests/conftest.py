@@ -0,0 +1,8 @@
+import os
+
+# The api package reads its settings on import; these tests never connect to anything
+os.environ.setdefault("DATABASE_URL", "postgresql://localhost/tests")
+os.environ.setdefault("SECRET_KEY", "tests")
+os.environ.setdefault("JWT_ALGORITHM", "HS256")
+os.environ.setdefault("ACCESS_TOKEN_EXPIRE_DAYS", "1")
+os.environ.setdefault("STORAGE_BACKEND", "local")
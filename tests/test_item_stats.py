@@ -0,0 +1,99 @@
+import numpy as np
+import pandas as pd
+import pytest
+from api import models
+from api.grading import GradedAttempt
+from api.item_stats import OPTIONS, analyze_items, attempt_sums
+
+KEY = ["A", "B", "C", "D", "A", "C"]
+SKIPPED = 5  # index of a question some students leave unanswered
+MISLEADING = 2  # index of a question whose distractor B draws the stronger students
+
+def _answer_matrix(students=300, seed=7):
+    """Chosen options (students x questions, None when skipped), driven by a latent ability"""
+    rng = np.random.default_rng(seed)
+    ability = rng.normal(size=students)
+    chosen = []
+    for student in range(students):
+        row = []
+        for number, correct in enumerate(KEY):
+            if number == SKIPPED and rng.random() < 0.2:
+                row.append(None)
+            elif number == MISLEADING and ability[student] > 0.5:
+                row.append("B")
+            elif rng.random() < 1 / (1 + np.exp(-(ability[student] + 0.5 - 0.3 * number))):
+                row.append(correct)
+            else:
+                row.append(rng.choice([option for option in OPTIONS if option != correct]))
+        chosen.append(row)
+    return chosen
+
+def _attempts(chosen):
+    attempts = []
+    for row in chosen:
+        answers = [
+            {"question_id": number + 1, "selected_option": option, "is_correct": option == KEY[number]}
+            for number, option in enumerate(row) if option is not None
+        ]
+        attempts.append(GradedAttempt(
+            quiz_id=1, score=sum(answer["is_correct"] for answer in answers), total_questions=len(KEY),
+            answers=answers, chapter_id=1, subject_id=1
+        ))
+    return attempts
+
+def _analysis(chosen):
+    questions, quizzes = attempt_sums(_attempts(chosen))
+    stats = pd.DataFrame([
+        {**questions[question_id], "question_number": question_id, "correct_option": KEY[question_id - 1]}
+        for question_id in sorted(questions)
+    ])
+    return analyze_items(stats, models.QuizStats(**quizzes[1]))
+
+def test_matches_numpy_on_the_answer_matrix():
+    chosen = _answer_matrix()
+    result = _analysis(chosen)
+    answered = np.array([[option is not None for option in row] for row in chosen])
+    correct = np.array([[option == KEY[number] for number, option in enumerate(row)] for row in chosen], dtype=float)
+    scores = correct.sum(axis=1)
+
+    for number, item in enumerate(result["items"]):
+        responders = answered[:, number]
+        item_correct = correct[responders, number]
+        rest = scores[responders] - item_correct
+        assert item["responses"] == responders.sum()
+        assert item["difficulty"] == pytest.approx(item_correct.mean(), abs=1e-4)
+        assert item["discrimination"] == pytest.approx(np.corrcoef(item_correct, rest)[0, 1], abs=1e-4)
+        for option in item["options"]:
+            chose = np.array([row[number] == option["option"] for row in chosen])[responders].astype(float)
+            assert option["chosen"] == chose.sum()
+            assert option["share"] == pytest.approx(chose.mean(), abs=1e-4)
+            if 0 < chose.sum() < len(chose):
+                assert option["discrimination"] == pytest.approx(np.corrcoef(chose, rest)[0, 1], abs=1e-4)
+            else:
+                assert option["discrimination"] is None
+
+    difficulty = np.array([correct[answered[:, number], number].mean() for number in range(len(KEY))])
+    variance = scores.var()
+    kr20 = len(KEY) / (len(KEY) - 1) * (1 - (difficulty * (1 - difficulty)).sum() / variance)
+    assert result["attempts"] == len(chosen)
+    assert result["mean_score"] == pytest.approx(scores.mean(), abs=1e-4)
+    assert result["score_stddev"] == pytest.approx(scores.std(), abs=1e-4)
+    assert result["reliability"] == pytest.approx(kr20, abs=1e-4)
+
+def test_flags_a_distractor_the_stronger_students_choose():
+    result = _analysis(_answer_matrix())
+    assert "misleading_option_B" in result["items"][MISLEADING]["flags"]
+    assert not any(flag.startswith("misleading") for flag in result["items"][0]["flags"])
+
+def test_statistics_are_undefined_when_everyone_agrees():
+    chosen = [["A", "B", "C", "D", "A", "C"], ["A", "C", "C", "D", "B", "D"], ["A", "B", "A", "A", "A", "C"]]
+    first = _analysis(chosen)["items"][0]
+    assert first["difficulty"] == 1.0
+    assert first["discrimination"] is None
+    assert [option["discrimination"] for option in first["options"]] == [None, None, None, None]
+
+def test_no_attempts():
+    result = analyze_items(pd.DataFrame(columns=["question_id", "question_number", "correct_option"] + [
+        f"{prefix}_{option.lower()}" for prefix in ("chose", "score_sum") for option in OPTIONS
+    ] + ["score_sq_sum"]), None)
+    assert result == {"attempts": 0, "mean_score": None, "score_stddev": None, "reliability": None, "items": []}
@@ -0,0 +1,77 @@
+import asyncio
+from api.quiz_import import QUESTIONS_PER_QUIZ, iter_ndjson, quiz_frames, validate_quizzes
+from api.schemas import QuizCreate, QuizQuestion
+
+def _lines(chunks, max_line_bytes=10):
+    async def stream():
+        for chunk in chunks:
+            yield chunk
+
+    async def collect():
+        return [line async for line in iter_ndjson(stream(), max_line_bytes)]
+
+    return asyncio.run(collect())
+
+def test_line_split_across_chunks():
+    assert _lines([b"ab", b"c\nde", b"f\n"]) == [(1, b"abc"), (2, b"def")]
+
+def test_oversized_line_then_a_normal_one():
+    assert _lines([b"0123456", b"789abcdef", b"\nok\n"]) == [(1, None), (2, b"ok")]
+    assert _lines([b"0123456789abc\nok\n"]) == [(1, None), (2, b"ok")]
+
+def test_last_line_without_newline():
+    assert _lines([b"one\ntw", b"o"]) == [(1, b"one"), (2, b"two")]
+    assert _lines([b"one\n", b"0123456789abc"]) == [(1, b"one"), (2, None)]
+
+def test_blank_lines_are_skipped_but_counted():
+    assert _lines([b"\n  \nx\n"]) == [(3, b"x")]
+
+def _quiz(name, chapter="Algebra", subject="Maths", standard=9, questions=QUESTIONS_PER_QUIZ, correct="A"):
+    return QuizCreate(
+        quiz_name=name, syllabus="ncert", standard=standard, subject=subject, chapter=chapter,
+        questions=[
+            QuizQuestion(question_text=f"Q{number}", option_a="1", option_b="2", option_c="3", option_d="4", correct_option=correct)
+            for number in range(questions)
+        ]
+    )
+
+CHAPTERS = {("Maths", 9, "Algebra"): 11, ("Maths", 9, "Geometry"): 12}
+SUBJECTS = {("Maths", 9)}
+
+def _errors(quizzes, chapters=CHAPTERS, subjects=SUBJECTS, existing=(), seen=()):
+    frames = quiz_frames(list(enumerate(quizzes, start=1)))
+    return dict(validate_quizzes(*frames, chapters, subjects, set(existing), set(seen)))
+
+def test_valid_batch():
+    assert _errors([_quiz("One"), _quiz("Two", chapter="Geometry")]) == {}
+
+def test_question_count_and_options():
+    errors = _errors([_quiz("Short", questions=3), _quiz("Bad key", correct="E")])
+    assert errors[0] == [f"Quiz must have exactly {QUESTIONS_PER_QUIZ} questions. Received 3 questions."]
+    assert len(errors[1]) == QUESTIONS_PER_QUIZ
+    assert errors[1][0] == "Question 1: correct_option must be 'A', 'B', 'C', or 'D'. Got 'E'"
+
+def test_duplicate_within_a_batch():
+    errors = _errors([_quiz("One"), _quiz("One", chapter="Geometry"), _quiz("One")])
+    assert errors == {2: ["Quiz 'One' appears more than once for chapter 'Algebra' in this import"]}
+
+def test_duplicate_across_batches_and_in_the_database():
+    errors = _errors([_quiz("Earlier"), _quiz("Stored", chapter="Geometry")], seen={(11, "Earlier")}, existing={(12, "Stored")})
+    assert errors == {
+        0: ["Quiz 'Earlier' appears more than once for chapter 'Algebra' in this import"],
+        1: ["Quiz 'Stored' already exists for chapter 'Geometry'"],
+    }
+
+def test_unknown_chapter_and_subject():
+    errors = _errors([_quiz("One", chapter="Calculus"), _quiz("Two", subject="Art"), _quiz("Three")])
+    assert errors == {
+        0: ["Chapter 'Calculus' not found in subject 'Maths'"],
+        1: ["Subject 'Art' not found for standard 9"],
+    }
+
+def test_no_chapters_resolved():
+    errors = _errors([_quiz("One", questions=2), _quiz("Two")], chapters={}, subjects=set(), seen={(11, "Two")})
+    assert errors == {
+        0: [f"Quiz must have exactly {QUESTIONS_PER_QUIZ} questions. Received 2 questions.", "Subject 'Maths' not found for standard 9"],
+        1: ["Subject 'Maths' not found for standard 9"],
+    }